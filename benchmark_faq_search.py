@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки поиска FAQ
+
+Режимы:
+    fuzzy - нечеткий поиск: SequenceMatcher (прежняя реализация) против индекса триграмм
+            (--sizes 23 230 2300: триграммы быстрее в 24-28 раз, около 25x)
+    ann   - векторный поиск: полнота recall@k и задержка IVF-индекса против точного перебора (нужен numpy)
+    sharded - пропускная способность поиска по шардам в отдельных процессах против одного процесса
+              при одинаковом числе параллельных клиентов (--clients). Шарды окупаются только
+              при нескольких свободных ядрах и большой базе (десятки тысяч записей), где
+              нечеткий этап дороже пересылки запроса; на одном ядре при одном клиенте - 1.0x
+    relevance - качество и задержка движков поиска на размеченных запросах (data/faq_queries.json):
+                precision@1, recall@k, p50/p95/p99, запросов в секунду и память индекса,
+                результат - JSON для сравнения с предыдущим запуском
+
+Запуск:
+    python benchmark_faq_search.py --sizes 100 1000 5000
+    python benchmark_faq_search.py --mode ann --sizes 10000 30000
+    python benchmark_faq_search.py --mode sharded --sizes 20000 --shards 1 2 4
+    python benchmark_faq_search.py --mode relevance --output bench.json --compare baseline.json
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Dict, List, Sequence, Tuple
+
+# Добавляем src в путь для импортов
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from faq import backends
+from faq.enhanced_faq_manager import EnhancedFAQManager
+from faq.sharded import ShardedFAQSearch
+from faq.tokenizer import tokenize
+
+FAQ_FILE = os.path.join(os.path.dirname(__file__), "data", "faq_enhanced.json")
+QUERIES_FILE = os.path.join(os.path.dirname(__file__), "data", "faq_queries.json")
+
+QUERIES = [
+    "дотавка",
+    "гаранития",
+    "как доставить товар",
+    "сколько стоит",
+    "есть ли у вас скидки",
+    "связаться с менеджером",
+    "условия оплаты",
+    "возрат товара",
+]
+
+
+def generate_corpus(size: int) -> List[Dict]:
+    """
+    Синтетический корпус: записи базы FAQ, размноженные до нужного размера
+
+    Args:
+        size: Количество записей
+
+    Returns:
+        Список FAQ записей
+    """
+    with open(FAQ_FILE, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+
+    # Записи различаются ключевыми словами, позаимствованными у других вопросов
+    rng = random.Random(size)
+    corpus = []
+    for i in range(size):
+        faq = base[i % len(base)]
+        borrowed = rng.choice(base).get("keywords", [])
+        corpus.append({
+            "id": i + 1,
+            "question": f"{faq['question']} (вариант {i // len(base)})",
+            "answer": faq["answer"],
+            "keywords": list(faq.get("keywords", [])) + rng.sample(borrowed, min(2, len(borrowed))),
+        })
+    return corpus
+
+
+def corpus_sources(size: int) -> Dict[int, int]:
+    """
+    ID исходной записи базы для каждой записи generate_corpus(size)
+
+    Args:
+        size: Количество записей корпуса
+
+    Returns:
+        Словарь {ID записи корпуса: ID записи базы}
+    """
+    with open(FAQ_FILE, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    return {i + 1: base[i % len(base)]["id"] for i in range(size)}
+
+
+def legacy_similarity_scores(faq_data: List[Dict], query: str) -> Dict[int, float]:
+    """Прежний нечеткий поиск: SequenceMatcher по каждому вопросу и каждой паре слово/ключ"""
+    query_words = tokenize(query)
+    scores = {}
+    for faq in faq_data:
+        question_score = SequenceMatcher(None, query, faq["question"].lower()).ratio()
+        keywords = faq.get("keywords", [])
+        matches = 0
+        for keyword in keywords:
+            keyword_lower = keyword.lower()
+            for word in query_words:
+                if (keyword_lower in word or word in keyword_lower or
+                        SequenceMatcher(None, keyword_lower, word).ratio() > 0.8):
+                    matches += 1
+                    break
+        keyword_score = matches / len(keywords) if keywords else 0.0
+        scores[faq["id"]] = question_score * 0.6 + keyword_score * 0.4
+    return scores
+
+
+def time_per_query(func, queries: List[str], repeat: int) -> float:
+    """Среднее время одного запроса в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(queries))
+
+
+def run_fuzzy(sizes: List[int], repeat: int):
+    """Бенчмарк нечеткого поиска для нескольких размеров корпуса"""
+    print(f"{'FAQ':>8} {'SequenceMatcher, мс':>22} {'Триграммы, мс':>16} {'Ускорение':>10} {'Совпадение top-1':>18}")
+
+    for size in sizes:
+        corpus = generate_corpus(size)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            faq_file = os.path.join(tmp_dir, "faq.json")
+            with open(faq_file, 'w', encoding='utf-8') as f:
+                json.dump(corpus, f, ensure_ascii=False)
+            manager = EnhancedFAQManager(faq_file)
+
+        def trigram_search(query):
+            return manager.backend._similarity_scores(query, tokenize(query))
+
+        def legacy_search(query):
+            return legacy_similarity_scores(corpus, query)
+
+        # Совпадение лучшего результата по вопросу (без учета номера варианта)
+        agreement = 0
+        for query in QUERIES:
+            legacy = legacy_search(query)
+            trigram = trigram_search(query)
+            legacy_best = corpus[max(legacy, key=legacy.get) - 1]["question"].split(" (")[0]
+            trigram_best = corpus[max(trigram, key=trigram.get) - 1]["question"].split(" (")[0] if trigram else None
+            agreement += legacy_best == trigram_best
+
+        legacy_ms = time_per_query(legacy_search, QUERIES, repeat)
+        trigram_ms = time_per_query(trigram_search, QUERIES, repeat)
+        print(f"{size:>8} {legacy_ms:>22.2f} {trigram_ms:>16.2f} {legacy_ms / trigram_ms:>9.1f}x "
+              f"{agreement:>10}/{len(QUERIES)}")
+
+
+def run_ann(sizes: List[int], repeat: int, k: int = 10, n_probes: List[int] = (1, 2, 4, 8, 16, 32)):
+    """Бенчмарк IVF-индекса: recall@k относительно точного поиска и задержка"""
+    from faq.ann import IVFIndex
+    from faq.semantic import SemanticIndex
+
+    for size in sizes:
+        corpus = generate_corpus(size)
+        exact = SemanticIndex(ann_min_size=size + 1)
+        exact.build([(faq["id"], " ".join([faq["question"], *faq["keywords"]])) for faq in corpus])
+
+        start = time.perf_counter()
+        ivf = IVFIndex()
+        ivf.build(exact.doc_ids, exact.vectors)
+        build_s = time.perf_counter() - start
+
+        # Запросы: тестовые фразы и ключевые слова случайных записей
+        rng = random.Random(0)
+        queries = QUERIES + [" ".join(rng.sample(faq["keywords"], 2)) for faq in rng.sample(corpus, 42)]
+        query_vectors = exact.embedder.embed(queries)
+        truth = [{doc_id for doc_id, _ in exact.search(query, k)} for query in queries]
+
+        exact_ms = time_per_query(lambda query: exact.search(query, k), queries, repeat)
+        print(f"\nFAQ: {size}, кластеров: {len(ivf.centroids)}, построение IVF: {build_s:.2f} с, "
+              f"точный поиск: {exact_ms:.2f} мс/запрос (с векторизацией запроса)")
+        print(f"{'n_probe':>8} {'recall@' + str(k):>10} {'IVF, мс':>10} {'точный, мс':>11}")
+
+        for n_probe in n_probes:
+            recall = sum(
+                len(expected & {doc_id for doc_id, _ in ivf.search(vector, k, n_probe)}) / max(len(expected), 1)
+                for vector, expected in zip(query_vectors, truth)
+            ) / len(queries)
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for vector in query_vectors:
+                    ivf.search(vector, k, n_probe)
+            ivf_ms = (time.perf_counter() - start) * 1000 / (repeat * len(queries))
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for vector in query_vectors:
+                    exact.vectors @ vector
+            brute_ms = (time.perf_counter() - start) * 1000 / (repeat * len(queries))
+            print(f"{n_probe:>8} {recall:>10.3f} {ivf_ms:>10.3f} {brute_ms:>11.3f}")
+
+
+def concurrent_qps(search, queries: List[str], clients: int) -> Tuple[float, List]:
+    """Запросов в секунду при clients параллельных клиентах и результаты в порядке запросов"""
+    with ThreadPoolExecutor(clients) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(search, queries))
+        return len(queries) / (time.perf_counter() - start), results
+
+
+def run_sharded(sizes: List[int], shard_counts: List[int], repeat: int, clients: int = 8):
+    """
+    Бенчмарк шардированного поиска: запросов в секунду при параллельных клиентах
+
+    Один процесс и шарды получают запросы от одинакового числа клиентов-потоков.
+    """
+    print(f"Клиентов: {clients}")
+    print(f"{'FAQ':>8} {'Шардов':>7} {'Запросов/с':>11} {'Ускорение':>10} {'Совпадение top-1':>18}")
+
+    for size in sizes:
+        corpus = generate_corpus(size)
+        # Запросы без кэша: каждый проходит все этапы поиска
+        queries = QUERIES * repeat
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            faq_file = os.path.join(tmp_dir, "faq.json")
+            with open(faq_file, 'w', encoding='utf-8') as f:
+                json.dump(corpus, f, ensure_ascii=False)
+
+            manager = EnhancedFAQManager(faq_file, cache_size=0)
+            single_qps, expected = concurrent_qps(lambda query: manager.search(query, k=1), queries, clients)
+            print(f"{size:>8} {'-':>7} {single_qps:>11.1f} {1:>9.1f}x {'(один процесс)':>18}")
+
+            for n_shards in shard_counts:
+                sharded = ShardedFAQSearch(faq_file, n_shards, cache_size=0)
+                qps, results = concurrent_qps(lambda query: sharded.search(query, k=1), queries, clients)
+                sharded.close()
+
+                # Совпадение лучшего результата по вопросу (без учета номера варианта)
+                agreement = sum(
+                    [hit["faq"]["question"].split(" (")[0] for hit in hits] ==
+                    [hit["faq"]["question"].split(" (")[0] for hit in single]
+                    for hits, single in zip(results, expected)
+                )
+                print(f"{size:>8} {n_shards:>7} {qps:>11.1f} {qps / single_qps:>9.1f}x "
+                      f"{agreement:>10}/{len(queries)}")
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Перцентиль q (0-100) методом ближайшего ранга"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def evaluate(manager: EnhancedFAQManager, labeled: List[Dict], sources: Dict[int, int],
+             k: int, repeat: int) -> Dict:
+    """
+    Качество и задержка поиска по размеченным запросам
+
+    Запросы с непустым expected оцениваются по precision@1 (первый результат -
+    одна из ожидаемых записей) и recall@k (доля ожидаемых записей в top-k);
+    запросы с пустым expected (вне тематики) - по доле отказов is_answer.
+    Записи синтетического корпуса сопоставляются записям базы через sources.
+
+    Args:
+        manager: Менеджер без кэша запросов
+        labeled: Размеченные запросы {"query", "expected"}
+        sources: ID записи корпуса -> ID записи базы
+        k: Глубина выдачи
+        repeat: Проходов по запросам для замера задержки
+
+    Returns:
+        Метрики запуска
+    """
+    positives = [item for item in labeled if item["expected"]]
+    negatives = [item for item in labeled if not item["expected"]]
+    precision = recall = answered = rejected = 0.0
+
+    # Первый проход - оценка качества и прогрев ленивых структур (словарь опечаток, векторы)
+    for item in labeled:
+        hits = manager.search(item["query"], k)
+        found = [sources[hit["faq"]["id"]] for hit in hits]
+        is_answer = bool(hits) and manager.is_answer(hits[0])
+        expected = set(item["expected"])
+        if expected:
+            precision += bool(found) and found[0] in expected
+            recall += len(expected & set(found)) / len(expected)
+            answered += is_answer
+        else:
+            rejected += not is_answer
+
+    latencies = []
+    for _ in range(repeat):
+        for item in labeled:
+            start = time.perf_counter()
+            manager.search(item["query"], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "precision_at_1": round(precision / max(len(positives), 1), 4),
+        f"recall_at_{k}": round(recall / max(len(positives), 1), 4),
+        "answer_rate": round(answered / max(len(positives), 1), 4),
+        "rejection_rate": round(rejected / max(len(negatives), 1), 4),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(sum(latencies) / len(latencies), 3),
+        },
+        "qps": round(len(latencies) / (sum(latencies) / 1000), 1),
+    }
+
+
+def run_relevance(sizes: List[int], backend_names: List[str], repeat: int, k: int = 3,
+                  queries_file: str = QUERIES_FILE) -> Dict:
+    """
+    Бенчмарк движков поиска на размеченных запросах и синтетических корпусах
+
+    Args:
+        sizes: Размеры корпуса (0 - исходная база без размножения)
+        backend_names: Движки поиска
+        repeat: Проходов по запросам для замера задержки
+        k: Глубина выдачи для recall@k
+        queries_file: JSON файл размеченных запросов [{"query", "expected": [ID]}]
+
+    Returns:
+        Отчет для сохранения в JSON
+    """
+    with open(queries_file, 'r', encoding='utf-8') as f:
+        labeled = json.load(f)
+
+    print(f"{'Движок':>9} {'FAQ':>8} {'P@1':>6} {'R@' + str(k):>6} {'Отказы':>7} {'p50, мс':>8} "
+          f"{'p95, мс':>8} {'p99, мс':>8} {'Запросов/с':>11} {'Память, МБ':>11} {'Построение, с':>14}")
+    results = []
+    for size in sizes:
+        if size:
+            corpus, sources = generate_corpus(size), corpus_sources(size)
+        else:
+            with open(FAQ_FILE, 'r', encoding='utf-8') as f:
+                corpus = json.load(f)
+            sources = {faq["id"]: faq["id"] for faq in corpus}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            faq_file = os.path.join(tmp_dir, "faq.json")
+            with open(faq_file, 'w', encoding='utf-8') as f:
+                json.dump(corpus, f, ensure_ascii=False)
+
+            for name in backend_names:
+                options = dict(backend=name, cache_size=0, use_compiled_index=False, search_workers=0)
+                start = time.perf_counter()
+                manager = EnhancedFAQManager(faq_file, **options)
+                build_s = time.perf_counter() - start
+
+                # Память - отдельное построение под tracemalloc (он замедляет построение);
+                # проход по запросам достраивает ленивые структуры (векторы, словарь опечаток)
+                del manager
+                tracemalloc.start()
+                manager = EnhancedFAQManager(faq_file, **options)
+                for item in labeled:
+                    manager.search(item["query"], k)
+                memory_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+                tracemalloc.stop()
+
+                result = {"backend": manager.backend_name, "size": len(corpus), "k": k,
+                          "build_s": round(build_s, 3), "memory_mb": round(memory_mb, 1)}
+                result.update(evaluate(manager, labeled, sources, k, repeat))
+                results.append(result)
+                print(f"{result['backend']:>9} {result['size']:>8} {result['precision_at_1']:>6.3f} "
+                      f"{result[f'recall_at_{k}']:>6.3f} {result['rejection_rate']:>7.2f} "
+                      f"{result['latency_ms']['p50']:>8.3f} {result['latency_ms']['p95']:>8.3f} "
+                      f"{result['latency_ms']['p99']:>8.3f} {result['qps']:>11.1f} "
+                      f"{result['memory_mb']:>11.1f} {result['build_s']:>14.2f}")
+                del manager
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "queries": len(labeled),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare_reports(report: Dict, baseline: Dict):
+    """Изменение качества и задержки относительно предыдущего отчета (по движку и размеру)"""
+    previous = {(result["backend"], result["size"]): result for result in baseline.get("results", [])}
+    print(f"\nСравнение с отчетом от {baseline.get('created')}:")
+    print(f"{'Движок':>9} {'FAQ':>8} {'ΔP@1':>7} {'p95, было':>10} {'p95, стало':>11} {'Память, было':>13} "
+          f"{'Память, стало':>14}")
+    for result in report["results"]:
+        before = previous.get((result["backend"], result["size"]))
+        if before is None:
+            continue
+        print(f"{result['backend']:>9} {result['size']:>8} "
+              f"{result['precision_at_1'] - before['precision_at_1']:>+7.3f} "
+              f"{before['latency_ms']['p95']:>10.3f} {result['latency_ms']['p95']:>11.3f} "
+              f"{before['memory_mb']:>13.1f} {result['memory_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарки поиска FAQ")
+    parser.add_argument("--mode", choices=["fuzzy", "ann", "sharded", "relevance"], default="fuzzy",
+                        help="Что измерять")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Размеры корпуса")
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов каждого запроса")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4], help="Количество шардов (режим sharded)")
+    parser.add_argument("--clients", type=int, default=8, help="Параллельных клиентов (режим sharded)")
+    parser.add_argument("--backends", nargs="+", choices=sorted(backends.BACKENDS),
+                        help="Движки поиска (режим relevance, по умолчанию все доступные)")
+    parser.add_argument("--k", type=int, default=3, help="Глубина выдачи для recall@k (режим relevance)")
+    parser.add_argument("--queries", default=QUERIES_FILE, help="Размеченные запросы (режим relevance)")
+    parser.add_argument("--output", help="JSON файл отчета (режим relevance)")
+    parser.add_argument("--compare", help="Предыдущий JSON отчет для сравнения (режим relevance)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.mode == "ann":
+        run_ann(args.sizes or [10000, 30000], args.repeat)
+    elif args.mode == "sharded":
+        run_sharded(args.sizes or [20000], args.shards, args.repeat, args.clients)
+    elif args.mode == "relevance":
+        names = args.backends or [name for name, cls in backends.BACKENDS.items() if cls.is_available()]
+        report = run_relevance(args.sizes or [0, 1000, 10000, 100000], names, args.repeat, args.k, args.queries)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\nОтчет сохранен в {args.output}")
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                compare_reports(report, json.load(f))
+    else:
+        run_fuzzy(args.sizes or [23, 230, 2300], args.repeat)
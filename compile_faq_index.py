@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Компиляция базы FAQ в бинарный снимок индекса
+
+Менеджер FAQ загружает снимок при запуске вместо разбора JSON и индексации,
+пока хэш JSON файла совпадает с сохраненным в снимке.
+
+Запуск:
+    python compile_faq_index.py
+    python compile_faq_index.py --faq-file data/faq_enhanced.json --index-file data/faq_enhanced.index.pkl
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+# Добавляем src в путь для импортов
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from faq.enhanced_faq_manager import EnhancedFAQManager
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Перестроение индекса и сохранение снимка"""
+    parser = argparse.ArgumentParser(description="Компиляция индекса FAQ")
+    parser.add_argument("--faq-file", default="data/faq_enhanced.json", help="JSON файл FAQ")
+    parser.add_argument("--index-file", help="Файл снимка (по умолчанию рядом с файлом FAQ)")
+    args = parser.parse_args()
+
+    # Менеджер без снимка строит индекс из JSON один раз; снимок сохраняется из этого индекса
+    start = time.perf_counter()
+    manager = EnhancedFAQManager(args.faq_file, index_file=args.index_file, use_compiled_index=False)
+    manager.use_compiled_index = True
+    index_file = manager.compile_index(rebuild=False)
+    logger.info(f"Индекс {len(manager.faq_data)} FAQ скомпилирован в {index_file} "
+                f"за {time.perf_counter() - start:.2f} с")
+
+    start = time.perf_counter()
+    EnhancedFAQManager(args.faq_file, index_file=args.index_file)
+    logger.info(f"Запуск со снимком: {time.perf_counter() - start:.3f} с")
+
+
+if __name__ == "__main__":
+    main()
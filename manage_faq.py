@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Массовый импорт и экспорт базы FAQ
+
+Форматы: JSON Lines (.jsonl) и Markdown в макете data/faq_combined.md (.md).
+
+Запуск:
+    python manage_faq.py import data/faq_combined.md
+    python manage_faq.py import faq.jsonl --replace
+    python manage_faq.py export faq.jsonl
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Добавляем src в путь для импортов
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from faq.enhanced_faq_manager import EnhancedFAQManager
+from faq.exchange import read_records
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def detect_format(path: str) -> str:
+    """Формат файла по расширению"""
+    return "markdown" if path.endswith(".md") else "jsonl"
+
+
+def main():
+    """Импорт или экспорт FAQ"""
+    parser = argparse.ArgumentParser(description="Импорт и экспорт FAQ")
+    parser.add_argument("action", choices=["import", "export"], help="Действие")
+    parser.add_argument("path", help="Файл для импорта или экспорта")
+    parser.add_argument("--format", choices=["jsonl", "markdown"], help="Формат (по умолчанию по расширению)")
+    parser.add_argument("--faq-file", default="data/faq_enhanced.json", help="JSON файл базы FAQ")
+    parser.add_argument("--replace", action="store_true", help="Заменить всю базу импортируемыми записями")
+    args = parser.parse_args()
+
+    file_format = args.format or detect_format(args.path)
+    manager = EnhancedFAQManager(args.faq_file)
+
+    if args.action == "import":
+        with open(args.path, 'r', encoding='utf-8') as f:
+            try:
+                stats = manager.import_faq(read_records(f, file_format), replace=args.replace)
+            except ValueError as e:
+                logger.error(str(e))
+                sys.exit(1)
+        manager.flush()
+        logger.info(f"Импортировано из {args.path}: {stats}")
+    else:
+        with open(args.path, 'w', encoding='utf-8') as f:
+            count = manager.export_faq(f, file_format)
+        logger.info(f"Выгружено {count} записей в {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -46,7 +46,9 @@ async def main():
         
         # Создаем и запускаем бота
         logger.info("Запуск OptFM AI Bot...")
-        bot = OptFMBot(Config.TELEGRAM_BOT_TOKEN, Config.DATABASE_URL)
+        bot = OptFMBot(Config.TELEGRAM_BOT_TOKEN, Config.DATABASE_URL, Config.FAQ_RELOAD_INTERVAL,
+                       Config.FAQ_SEARCH_WORKERS, Config.FAQ_SEARCH_TIMEOUT, Config.FAQ_SEARCH_BACKEND,
+                       Config.FAQ_ANSWER_THRESHOLD, Config.FAQ_SUGGEST_THRESHOLD)
         
         # Запускаем бота
         await bot.start_polling()
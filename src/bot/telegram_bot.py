@@ -8,7 +8,10 @@ from telegram.ext import Application, CommandHandler, MessageHandler, filters, C
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from faq import intents
 from faq.enhanced_faq_manager import EnhancedFAQManager
+from faq.intents import IntentClassifier
+from faq.watcher import FAQFileWatcher
 from forms.request_form import RequestFormManager
 from db.database import init_database, get_db
 from db.repository import UserRepository, RequestRepository, DialogRepository
@@ -19,17 +22,30 @@ logger = logging.getLogger(__name__)
 class OptFMBot:
     """Основной класс Telegram бота для OptFM"""
     
-    def __init__(self, token: str, database_url: str = None):
+    def __init__(self, token: str, database_url: str = None, faq_reload_interval: float = 5.0,
+                 faq_search_workers: int = 4, faq_search_timeout: float = 2.0, faq_search_backend: str = "index",
+                 faq_answer_threshold: float = 0.4, faq_suggest_threshold: float = 0.2):
         """
         Инициализация бота
         
         Args:
             token: Telegram Bot Token
             database_url: URL базы данных
+            faq_reload_interval: Период проверки файла FAQ для горячей перезагрузки, секунды (0 - отключено)
+            faq_search_workers: Размер пула потоков поиска по FAQ (0 - поиск в цикле событий)
+            faq_search_timeout: Предельное время поиска по FAQ, секунды
+            faq_search_backend: Движок поиска по FAQ ("index", "linear", "tfidf" или "semantic")
+            faq_answer_threshold: Минимальная уверенность результата поиска для ответа из FAQ
+            faq_suggest_threshold: Минимальная уверенность подсказки похожего вопроса
         """
         self.token = token
         self.application = Application.builder().token(token).build()
-        self.faq_manager = EnhancedFAQManager()
+        self.faq_manager = EnhancedFAQManager(search_workers=faq_search_workers, search_timeout=faq_search_timeout,
+                                              backend=faq_search_backend, answer_threshold=faq_answer_threshold,
+                                              suggest_threshold=faq_suggest_threshold)
+        # Словари намерений компилируются один раз при запуске
+        self.intent_classifier = IntentClassifier()
+        self.faq_watcher = FAQFileWatcher(self.faq_manager, faq_reload_interval) if faq_reload_interval > 0 else None
         
         # Инициализация базы данных
         self.db_manager = init_database(database_url)
@@ -102,6 +118,7 @@ class OptFMBot:
             "/start - Начать работу с ботом\n"
             "/help - Показать эту справку\n"
             "/faq - Показать FAQ с интерактивными кнопками\n"
+            "/faq <категория> - Вопросы одной категории (например, /faq доставка)\n"
             "/request - Создать заявку менеджеру\n"
             "/my_requests - Просмотр ваших заявок\n"
             "/cancel - Отменить заполнение заявки\n\n"
@@ -127,11 +144,23 @@ class OptFMBot:
         """
         Обработчик команды /faq - показывает FAQ с интерактивными кнопками (пагинация по 10)
         
+        "/faq <категория>" показывает вопросы одной категории (например, /faq доставка).
+        
         Args:
             update: Объект обновления от Telegram
             context: Контекст бота
         """
-        faq_list = self.faq_manager.get_all_faq()
+        category = " ".join(context.args) if context.args else None
+        if category:
+            faq_list = self.faq_manager.get_faq_by_category(category)
+            if not faq_list:
+                categories = "\n".join(f"• {name} ({count})" for name, count in self.faq_manager.get_categories().items())
+                await update.message.reply_text(
+                    f"Категория «{category}» не найдена.\n\nДоступные категории:\n{categories}"
+                )
+                return
+        else:
+            faq_list = self.faq_manager.get_all_faq()
         
         if not faq_list:
             await update.message.reply_text("К сожалению, база FAQ пуста.")
@@ -166,17 +195,22 @@ class OptFMBot:
             # Добавляем по 1 кнопке в ряд для лучшей читаемости
             keyboard.append([button])
         
-        # Добавляем кнопку "Показать ещё" если есть ещё вопросы
-        if len(faq_list) > 10:
+        # Добавляем кнопку "Показать ещё" если есть ещё вопросы (пагинация - по всей базе)
+        if len(faq_list) > 10 and not category:
             keyboard.append([InlineKeyboardButton("📄 Показать ещё", callback_data="faq_show_more_10")])
         
         reply_markup = InlineKeyboardMarkup(keyboard)
         
+        title = f"Часто задаваемые вопросы OptFM: {category}" if category else "Часто задаваемые вопросы OptFM:"
         faq_text = (
-            "📚 **Часто задаваемые вопросы OptFM:**\n\n"
+            f"📚 **{title}**\n\n"
             "Нажмите на интересующий вас вопрос, чтобы получить ответ:\n\n"
             f"Показано: **{len(current_faq_list)}** из **{len(faq_list)}** вопросов"
         )
+        # Кнопка "Показать ещё" листает всю базу, поэтому остаток категории называем явно
+        remaining = len(faq_list) - len(current_faq_list)
+        if category and remaining > 0:
+            faq_text += f"\n\n…и ещё {remaining}: задайте вопрос текстом, чтобы найти нужный"
         
         await update.message.reply_text(faq_text, parse_mode='Markdown', reply_markup=reply_markup)
         logger.info(f"User {update.effective_user.id} requested FAQ list with buttons (page 1)")
@@ -199,19 +233,12 @@ class OptFMBot:
             await self._handle_form_input(update, context)
             return
         
-        # Проверяем, является ли сообщение приветствием
-        greetings = ["привет", "здравствуйте", "добрый день", "добрый вечер", "доброе утро", "hi", "hello"]
-        is_greeting = any(greeting in user_message.lower() for greeting in greetings)
+        # Приветствие, прощание или вопрос - за один проход по словам сообщения;
+        # разбор на слова кэшируется и повторно не выполняется при поиске в FAQ
+        message_intent = self.intent_classifier.classify(user_message)
+        is_question = message_intent.is_question
         
-        # Проверяем, является ли сообщение прощанием
-        farewells = ["пока", "до свидания", "до встречи", "спасибо", "благодарю", "bye", "goodbye"]
-        is_farewell = any(farewell in user_message.lower() for farewell in farewells)
-        
-        # Проверяем, является ли сообщение вопросом
-        question_words = ["что", "как", "где", "когда", "почему", "зачем", "какой", "какая", "какие", "сколько", "?"]
-        is_question = any(word in user_message.lower() for word in question_words) or user_message.endswith("?")
-        
-        if is_greeting:
+        if message_intent.intent == intents.GREETING:
             response = (
                 f"👋 Привет, {user.first_name}! Рад вас видеть!\n\n"
                 "Я бот компании OptFM и готов помочь вам с любыми вопросами о наших продуктах и услугах.\n\n"
@@ -222,13 +249,13 @@ class OptFMBot:
                 "• Использовать /request для создания заявки менеджеру"
             )
             logger.info(f"Приветствие от пользователя {user.id}: {user_message}")
-        elif is_farewell:
+        elif message_intent.intent == intents.FAREWELL:
             response = (
                 f"👋 До свидания, {user.first_name}! Было приятно пообщаться!\n\n"
                 "Если у вас появятся вопросы, обращайтесь в любое время. Удачи!"
             )
             logger.info(f"Прощание от пользователя {user.id}: {user_message}")
-        elif not is_question and len(user_message.split()) < 3:
+        elif message_intent.intent == intents.UNCLEAR:
             # Короткое сообщение без вопроса - предлагаем задать вопрос
             response = (
                 f"🤔 {user.first_name}, я не совсем понял ваш запрос.\n\n"
@@ -241,13 +268,22 @@ class OptFMBot:
             )
             logger.info(f"Короткое сообщение от пользователя {user.id}: {user_message}")
         else:
-            # Поиск ответа в FAQ
-            faq_answer = self.faq_manager.search_faq(user_message)
-            
-            if faq_answer:
+            # Поиск ответа в FAQ: основной ответ и альтернативы за один проход.
+            # Нечеткий поиск выполняется в пуле потоков и не задерживает других пользователей
+            hits = await self.faq_manager.asearch(message_intent.text, k=3)
+
+            if hits and self.faq_manager.is_answer(hits[0]):
                 # Найден ответ в FAQ
+                faq_answer = hits[0]["faq"]
                 response = f"🤖 {faq_answer['answer']}\n\nЕсли у вас есть дополнительные вопросы, не стесняйтесь спрашивать!"
-                logger.info(f"FAQ ответ для пользователя {user.id}: {faq_answer['id']}")
+                corrections = hits[0]["corrections"]
+                if corrections:
+                    corrected = ", ".join(f"{word} → {fixed}" for word, fixed in corrections.items())
+                    response = f"🔤 Исправлено: {corrected}\n\n" + response
+                alternatives = [hit["faq"]["question"] for hit in hits[1:]]
+                if alternatives:
+                    response += "\n\nВозможно, вас также интересует:\n" + "\n".join(f"• {q}" for q in alternatives)
+                logger.info(f"FAQ ответ для пользователя {user.id}: {faq_answer['id']} ({hits[0]['stage']})")
             else:
                 # Ответ не найден - предлагаем оставить заявку
                 response = (
@@ -256,6 +292,8 @@ class OptFMBot:
                     "Для получения подробной информации оставьте заявку, и наш менеджер свяжется с вами.\n\n"
                     "Используйте команду /request для создания заявки или попробуйте переформулировать вопрос."
                 )
+                if hits:
+                    response += "\n\nВозможно, вы имели в виду:\n" + "\n".join(f"• {hit['faq']['question']}" for hit in hits)
                 logger.info(f"FAQ ответ не найден для пользователя {user.id}: {user_message[:50]}...")
         
         # Сохраняем диалог в базу данных
@@ -278,9 +316,16 @@ class OptFMBot:
             f"• Всего вопросов: {stats['total_faq']}\n"
             f"• Всего ключевых слов: {stats['total_keywords']}\n"
             f"• Среднее количество ключевых слов на вопрос: {stats['average_keywords_per_faq']}\n"
-            f"• Размер поискового индекса: {stats['search_index_size']}\n\n"
-            f"Используйте /faq для просмотра всех вопросов"
+            f"• Движок поиска: {stats['search_backend']}\n"
+            f"• Размер поискового индекса: {stats['search_index_size']}\n"
+            f"• Кэш запросов: попаданий {stats['cache_hits']}, промахов {stats['cache_misses']}\n"
         )
+        if stats['last_reload']:
+            stats_message += (
+                f"• Последняя перезагрузка базы: {stats['last_reload']['total_faq']} вопросов "
+                f"за {stats['last_reload']['duration']} с\n"
+            )
+        stats_message += "\nИспользуйте /faq для просмотра всех вопросов"
         
         await update.message.reply_text(stats_message, parse_mode='Markdown')
         logger.info(f"User {update.effective_user.id} requested FAQ statistics")
@@ -587,10 +632,15 @@ class OptFMBot:
         await self.application.initialize()
         await self.application.start()
         await self.application.updater.start_polling()
+        if self.faq_watcher:
+            self.faq_watcher.start()
         
     async def stop_polling(self):
         """Остановка бота"""
         logger.info("Stopping Telegram bot...")
+        if self.faq_watcher:
+            await self.faq_watcher.stop()
+        self.faq_manager.close()
         await self.application.updater.stop()
         await self.application.stop()
         await self.application.shutdown()
@@ -23,6 +23,18 @@ class Config:
     LOG_FILE: str = os.getenv("LOG_FILE", "logs/app.log")
     API_LOG_FILE: str = os.getenv("API_LOG_FILE", "logs/api.log")
     
+    # База FAQ: период проверки файла для горячей перезагрузки, секунды (0 - отключено)
+    FAQ_RELOAD_INTERVAL: float = float(os.getenv("FAQ_RELOAD_INTERVAL", "5"))
+    # Пул потоков поиска по FAQ (0 - поиск в цикле событий) и предельное время поиска, секунды
+    FAQ_SEARCH_WORKERS: int = int(os.getenv("FAQ_SEARCH_WORKERS", "4"))
+    FAQ_SEARCH_TIMEOUT: float = float(os.getenv("FAQ_SEARCH_TIMEOUT", "2"))
+    # Движок поиска по FAQ: index, linear, tfidf или semantic (два последних требуют numpy)
+    FAQ_SEARCH_BACKEND: str = os.getenv("FAQ_SEARCH_BACKEND", "index")
+    # Пороги калиброванной уверенности (0-1): ответ из FAQ и подсказка "Возможно, вы имели в виду"
+    # (подбираются tune_faq_thresholds.py по размеченным запросам)
+    FAQ_ANSWER_THRESHOLD: float = float(os.getenv("FAQ_ANSWER_THRESHOLD", "0.4"))
+    FAQ_SUGGEST_THRESHOLD: float = float(os.getenv("FAQ_SUGGEST_THRESHOLD", "0.2"))
+    
     # База данных
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
     
@@ -68,3 +80,6 @@ class Config:
         print(f"  • LOG_LEVEL: {cls.LOG_LEVEL}")
         print(f"  • TELEGRAM_BOT_TOKEN: {'УСТАНОВЛЕН' if cls.TELEGRAM_BOT_TOKEN else 'ОТСУТСТВУЕТ'}")
         print(f"  • DATABASE_URL: {'УСТАНОВЛЕН' if cls.DATABASE_URL else 'ОТСУТСТВУЕТ'}")
+        print(f"  • FAQ_SEARCH_BACKEND: {cls.FAQ_SEARCH_BACKEND}")
+        print(f"  • FAQ_ANSWER_THRESHOLD: {cls.FAQ_ANSWER_THRESHOLD}")
+        print(f"  • FAQ_SUGGEST_THRESHOLD: {cls.FAQ_SUGGEST_THRESHOLD}")
@@ -0,0 +1,179 @@
+"""
+Approximate nearest neighbour module for OptFM AI Bot
+IVF-индекс (кластеризация k-means) для быстрого векторного поиска по большому корпусу (требует numpy)
+"""
+import logging
+import math
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Инвертированный файл векторов (IVF)
+
+    Векторы разбиваются на кластеры сферическим k-means; запрос сравнивается
+    только с векторами из n_probe ближайших кластеров. Чем больше n_probe,
+    тем выше полнота (recall) и дольше поиск.
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, iterations: int = 10, seed: int = 0):
+        """
+        Инициализация индекса
+
+        Args:
+            n_lists: Количество кластеров (по умолчанию sqrt от числа векторов)
+            n_probe: Количество просматриваемых кластеров при поиске
+            iterations: Количество итераций k-means
+            seed: Seed генератора случайных чисел (для воспроизводимости)
+        """
+        if np is None:
+            raise ImportError("Для IVF-индекса требуется numpy")
+
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.seed = seed
+        self.key = ""
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    @staticmethod
+    def _assign(vectors: "np.ndarray", centroids: "np.ndarray", chunk_size: int = 8192) -> "np.ndarray":
+        """Номер ближайшего центроида для каждого вектора (по частям, чтобы ограничить память)"""
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk_size)
+        ])
+
+    def build(self, doc_ids: "np.ndarray", vectors: "np.ndarray", key: str = ""):
+        """
+        Кластеризация векторов и построение инвертированных списков
+
+        Args:
+            doc_ids: ID документов
+            vectors: L2-нормализованные векторы документов
+            key: Ключ исходных данных (для проверки актуальности сохраненного индекса)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_vectors = len(vectors)
+        n_lists = min(self.n_lists or max(1, int(math.sqrt(n_vectors))), max(n_vectors, 1))
+        rng = np.random.default_rng(self.seed)
+
+        # Центроиды обучаются на подвыборке: для k-means достаточно ~256 точек на кластер
+        sample_size = min(n_vectors, 256 * n_lists)
+        sample = vectors[rng.choice(n_vectors, sample_size, replace=False)] if n_vectors else vectors
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy() if n_vectors else \
+            np.zeros((0, vectors.shape[1]), dtype=np.float32)
+
+        for _ in range(self.iterations if n_vectors else 0):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+
+            # Пустые кластеры переинициализируем случайными точками
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        assignment = self._assign(vectors, centroids) if n_vectors else np.zeros(0, dtype=np.int64)
+        order = np.argsort(assignment, kind="stable")
+
+        self.key = key
+        self.centroids = centroids.astype(np.float32)
+        self.vectors = vectors[order]
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+        logger.info(f"IVF-индекс: {n_vectors} векторов, {n_lists} кластеров")
+
+    def search(self, query_vector: "np.ndarray", k: int = 10, n_probe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Приближенный поиск top-k документов
+
+        Args:
+            query_vector: L2-нормализованный вектор запроса
+            k: Количество результатов
+            n_probe: Количество просматриваемых кластеров (по умолчанию self.n_probe)
+
+        Returns:
+            Список пар (ID документа, скор), отсортированный по убыванию скора
+        """
+        n_lists = len(self.centroids)
+        if not n_lists:
+            return []
+
+        n_probe = min(n_probe or self.n_probe, n_lists)
+        centroid_scores = self.centroids @ query_vector
+        if n_probe < n_lists:
+            probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        else:
+            probe = np.arange(n_lists)
+
+        score_parts, id_parts = [], []
+        for cluster in probe:
+            start, end = self.offsets[cluster], self.offsets[cluster + 1]
+            if start < end:
+                score_parts.append(self.vectors[start:end] @ query_vector)
+                id_parts.append(self.doc_ids[start:end])
+        if not score_parts:
+            return []
+
+        scores = np.concatenate(score_parts)
+        ids = np.concatenate(id_parts)
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self, path: Path):
+        """
+        Сохранение индекса в .npz файл (через временный файл)
+
+        Args:
+            path: Путь к файлу
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, key=np.array(self.key), centroids=self.centroids, vectors=self.vectors,
+                     doc_ids=self.doc_ids, offsets=self.offsets)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, n_probe: int = 8) -> "IVFIndex":
+        """
+        Загрузка индекса из .npz файла
+
+        Args:
+            path: Путь к файлу
+            n_probe: Количество просматриваемых кластеров при поиске
+
+        Returns:
+            Загруженный индекс
+        """
+        index = cls(n_probe=n_probe)
+        with np.load(path) as data:
+            index.key = str(data["key"])
+            index.centroids = data["centroids"]
+            index.vectors = data["vectors"]
+            index.doc_ids = data["doc_ids"]
+            index.offsets = data["offsets"]
+        index.n_lists = len(index.centroids)
+        return index
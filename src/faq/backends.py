@@ -0,0 +1,381 @@
+"""
+Search backends module for OptFM AI Bot
+Единый интерфейс движков поиска по FAQ и реестр движков, выбираемых по имени
+"""
+import heapq
+import logging
+import sys
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Set, Tuple, Type
+
+from . import semantic, tfidf
+from .confidence import calibrate
+from .index_backend import InvertedIndexBackend, full_text, make_hit
+from .tokenizer import normalize_phrase, normalize_query, normalize_tokens, tokenize, tokenize_query
+
+logger = logging.getLogger(__name__)
+
+# Движок по умолчанию и движок, заменяющий недоступные (без numpy)
+DEFAULT_BACKEND = "index"
+
+
+class SearchBackend(Protocol):
+    """
+    Интерфейс движка поиска по FAQ
+
+    Движок хранит только поисковые структуры: данные, категории, кэш и
+    сохранение базы остаются в менеджере. Результаты search - словари
+    make_hit {"faq", "score", "confidence", "stage", "matched_terms", "corrections"}:
+    по калиброванной уверенности менеджер решает, ответ это, подсказка или отказ.
+    """
+
+    def build(self, faq_data: Iterable[Dict]):
+        """Построение индекса с нуля по записям в порядке базы"""
+
+    def add(self, faq: Dict):
+        """Добавление записи (запись с существующим ID заменяется на своем месте)"""
+
+    def remove(self, faq_id: int):
+        """Удаление записи"""
+
+    def get_state(self) -> Dict[str, Any]:
+        """Структуры индекса для скомпилированного снимка"""
+
+    def set_state(self, state: Dict[str, Any], faq_data: Iterable[Dict]) -> bool:
+        """Восстановление из снимка (False - снимок не подходит, нужна перестройка)"""
+
+    def search(self, query: str, k: int, doc_ids: Optional[Set[int]] = None, fuzzy: bool = True) -> List[Dict]:
+        """Top-k результатов по запросу normalize_query (fuzzy=False - только дешевые этапы; без них - [])"""
+
+    def similar(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """Похожие вопросы: пары (ID FAQ, скор) по убыванию скора"""
+
+    def term_ids(self, term: str) -> Set[int]:
+        """ID FAQ с нормализованным термином (ключевой фразой или словом вопроса)"""
+
+    def statistics(self) -> Dict[str, Any]:
+        """Статистика движка (обязательно "search_index_size")"""
+
+
+# Имя движка -> класс; конструктор принимает все параметры менеджера как ключевые
+# аргументы и использует только нужные
+BACKENDS: Dict[str, Type] = {}
+
+
+def register_backend(name: str, available: Callable[[], bool] = lambda: True):
+    """
+    Декоратор регистрации класса движка под именем
+
+    Args:
+        name: Имя движка (значение FAQ_SEARCH_BACKEND)
+        available: Проверка наличия зависимостей движка
+
+    Returns:
+        Декоратор класса
+    """
+    def decorator(cls):
+        cls.name = name
+        cls.is_available = staticmethod(available)
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def resolve_backend(name: str) -> str:
+    """
+    Проверка имени движка
+
+    Args:
+        name: Имя движка
+
+    Returns:
+        То же имя или DEFAULT_BACKEND, если зависимости движка не установлены
+
+    Raises:
+        ValueError: Движок с таким именем не зарегистрирован
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный движок поиска FAQ: {name} (доступны: {', '.join(BACKENDS)})")
+    if not BACKENDS[name].is_available():
+        logger.warning(f"Движок поиска FAQ {name} недоступен (нет numpy), используется {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return name
+
+
+def create_backend(name: str, **options) -> SearchBackend:
+    """
+    Создание пустого движка по имени
+
+    Args:
+        name: Имя движка (resolve_backend)
+        **options: Параметры менеджера (ranker, similarity_backend, embedder, ...)
+
+    Returns:
+        Движок поиска
+    """
+    return BACKENDS[resolve_backend(name)](**options)
+
+
+register_backend("index")(InvertedIndexBackend)
+
+
+class _DocumentBackend:
+    """Общая часть движков без инкрементального индекса: записи в порядке базы"""
+
+    def __init__(self, **options):
+        """Инициализация пустого движка (параметры других движков не используются)"""
+        self.build(())
+
+    def build(self, faq_data: Iterable[Dict]):
+        """Построение движка с нуля"""
+        self._faq_by_id = {faq["id"]: faq for faq in faq_data}
+        self._on_changed()
+
+    def add(self, faq: Dict):
+        """Добавление или замена записи"""
+        self._faq_by_id[faq["id"]] = faq
+        self._on_changed()
+
+    def remove(self, faq_id: int):
+        """Удаление записи"""
+        self._faq_by_id.pop(faq_id, None)
+        self._on_changed()
+
+    def _on_changed(self):
+        """Учет изменения записей"""
+
+    def get_state(self) -> Dict[str, Any]:
+        """Движок строится из записей при загрузке, снимок ему не нужен"""
+        return {}
+
+    def set_state(self, state: Dict[str, Any], faq_data: Iterable[Dict]) -> bool:
+        """Построение движка по записям из снимка менеджера"""
+        self.build(faq_data)
+        return True
+
+    def term_ids(self, term: str) -> Set[int]:
+        """ID FAQ с нормализованным термином (перебором записей)"""
+        return {
+            faq_id for faq_id, faq in self._faq_by_id.items()
+            if term in {normalize_phrase(keyword) for keyword in faq.get("keywords", [])}
+            or term in normalize_tokens(tokenize(faq["question"]))
+        }
+
+
+@register_backend("linear")
+class LinearBackend(_DocumentBackend):
+    """
+    Прежний линейный поиск FAQManager
+
+    Точное вхождение запроса в вопрос, затем доля ключевых слов записи,
+    совпавших со словами запроса (как подстрока или префикс). Каждый запрос
+    проверяет все записи; ключевые слова приводятся к нижнему регистру заранее.
+    """
+
+    # Минимальная доля совпавших ключевых слов; как и прежде, она достаточна
+    # для ответа (соответствует уверенности 0.5)
+    MIN_SCORE = 0.1
+
+    def _on_changed(self):
+        """Вопросы и ключевые слова в нижнем регистре (одинаковые слова записей - один объект)"""
+        self._documents = [
+            (faq, faq["question"].lower(), tuple(sys.intern(keyword.lower()) for keyword in faq.get("keywords", [])))
+            for faq in self._faq_by_id.values()
+        ]
+
+    def _keyword_score(self, query_words: List[str], keywords: Tuple[str, ...]) -> float:
+        """
+        Доля ключевых слов, совпавших хотя бы с одним словом запроса
+
+        Args:
+            query_words: Слова из запроса
+            keywords: Ключевые слова записи в нижнем регистре
+
+        Returns:
+            Оценка релевантности от 0 до 1
+        """
+        if not keywords or not query_words:
+            return 0.0
+
+        matches = 0
+        for keyword in keywords:
+            for word in query_words:
+                # Префиксы покрываются проверкой вхождения
+                if keyword in word or word in keyword:
+                    matches += 1
+                    break
+        return matches / len(keywords)
+
+    def _scores(self, query_words: List[str],
+                doc_ids: Optional[Set[int]] = None) -> Iterable[Tuple[Dict, Tuple[str, ...], float]]:
+        """Записи с оценкой не ниже MIN_SCORE: (запись, ключевые слова, оценка)"""
+        for faq, _, keywords in self._documents:
+            if doc_ids is not None and faq["id"] not in doc_ids:
+                continue
+            score = self._keyword_score(query_words, keywords)
+            if score >= self.MIN_SCORE:
+                yield faq, keywords, score
+
+    def search(self, query: str, k: int, doc_ids: Optional[Set[int]] = None, fuzzy: bool = True) -> List[Dict]:
+        """
+        Точное совпадение и лучшие по доле ключевых слов записи
+
+        Args:
+            query: Поисковый запрос, нормализованный normalize_query
+            k: Максимальное количество результатов
+            doc_ids: Искать только среди этих FAQ
+            fuzzy: False - пропустить поиск: перебор всей базы не бывает дешевым,
+                и asearch выполняет его целиком в пуле потоков
+
+        Returns:
+            Список результатов поиска
+        """
+        if not fuzzy:
+            return []
+
+        query_words = tokenize_query(query)
+        logger.info(f"Поиск FAQ для запроса: '{query}' (слова: {query_words})")
+
+        hits = []
+        for faq, question, _ in self._documents:
+            if query in question and (doc_ids is None or faq["id"] in doc_ids):
+                logger.info(f"Найдено точное совпадение: {faq['id']}")
+                hits.append(make_hit(faq, 1.0, "exact", query_words, 1.0))
+                break
+
+        seen = {hit["faq"]["id"] for hit in hits}
+        # nlargest сохраняет порядок базы среди равных оценок, как прежний перебор
+        top = heapq.nlargest(k + len(seen), self._scores(query_words, doc_ids), key=lambda item: item[2])
+        for faq, keywords, score in top:
+            if len(hits) >= k:
+                break
+            if faq["id"] not in seen:
+                matched = [word for word in query_words if any(keyword in word or word in keyword for keyword in keywords)]
+                hits.append(make_hit(faq, score, "keyword", matched, calibrate(score, self.MIN_SCORE)))
+
+        if not hits:
+            logger.info("Совпадений не найдено")
+        elif hits[0]["stage"] == "keyword":
+            logger.info(f"Найдено совпадение по ключевым словам: {hits[0]['faq']['id']} (score: {hits[0]['score']:.2f})")
+        return hits
+
+    def similar(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """Записи с наибольшей долей совпавших ключевых слов"""
+        scores = self._scores(tokenize_query(normalize_query(query)))
+        return [(faq["id"], score) for faq, _, score in heapq.nlargest(limit, scores, key=lambda item: item[2])]
+
+    def statistics(self) -> Dict[str, Any]:
+        """Линейный поиск не строит индекс"""
+        return {"search_index_size": 0}
+
+
+class _VectorBackend(_DocumentBackend, ABC):
+    """
+    Общая часть векторных движков: top-k по косинусному сходству
+
+    Все результаты - этап "fuzzy"; сходство ANSWER_THRESHOLD соответствует
+    уверенности 0.5, результаты не выше SUGGESTION_THRESHOLD отбрасываются.
+    Векторы перестраиваются при первом поиске после изменения записей.
+    """
+
+    ANSWER_THRESHOLD = 0.3
+    SUGGESTION_THRESHOLD = 0.05
+
+    def _on_changed(self):
+        """Векторы перестраиваются лениво"""
+        self._dirty = True
+
+    @abstractmethod
+    def _build_vectors(self):
+        """Построение векторов записей"""
+
+    @abstractmethod
+    def _vector_search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k пар (ID FAQ, сходство) по убыванию сходства"""
+
+    def _top(self, query: str, k: int, doc_ids: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """Top-k выше SUGGESTION_THRESHOLD по запросу normalize_query (среди doc_ids, если они заданы)"""
+        if self._dirty:
+            self._build_vectors()
+            self._dirty = False
+        top = self._vector_search(query, k if doc_ids is None else len(self._faq_by_id))
+        if doc_ids is not None:
+            top = [(faq_id, score) for faq_id, score in top if faq_id in doc_ids][:k]
+        return [(faq_id, score) for faq_id, score in top if score > self.SUGGESTION_THRESHOLD]
+
+    def search(self, query: str, k: int, doc_ids: Optional[Set[int]] = None, fuzzy: bool = True) -> List[Dict]:
+        """Ближайшие записи по косинусному сходству (fuzzy=False - [], дешевых этапов нет)"""
+        if not fuzzy:
+            return []
+        logger.info(f"Поиск FAQ ({self.name}) для запроса: '{query}'")
+        return [
+            make_hit(self._faq_by_id[faq_id], score, "fuzzy", [], calibrate(score, self.ANSWER_THRESHOLD))
+            for faq_id, score in self._top(query, k, doc_ids)
+        ]
+
+    def similar(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """Ближайшие записи"""
+        return self._top(normalize_query(query), limit)
+
+
+@register_backend("tfidf", available=tfidf.is_available)
+class TfidfBackend(_VectorBackend):
+    """Поиск по матрице TF-IDF вопросов, ключевых слов и ответов (требует numpy)"""
+
+    # Текст ответа разбавляет вектор записи, поэтому сходство ниже, чем у векторов вопросов
+    ANSWER_THRESHOLD = 0.2
+
+    def __init__(self, **options):
+        """Инициализация пустой матрицы"""
+        self.tfidf_matrix = tfidf.TfidfMatrix()
+        super().__init__(**options)
+
+    def _build_vectors(self):
+        """Построение матрицы TF-IDF"""
+        self.tfidf_matrix.build(
+            (faq_id, normalize_tokens(tokenize(full_text(faq)))) for faq_id, faq in self._faq_by_id.items()
+        )
+
+    def _vector_search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Одно умножение разреженной матрицы на вектор запроса"""
+        return self.tfidf_matrix.search(normalize_tokens(tokenize_query(query)), k=k)
+
+    def statistics(self) -> Dict[str, Any]:
+        """Размер словаря матрицы"""
+        return {"search_index_size": len(self.tfidf_matrix.vocabulary)}
+
+
+@register_backend("semantic", available=semantic.is_available)
+class SemanticBackend(_VectorBackend):
+    """Поиск по векторам вопросов и ключевых слов (требует numpy)"""
+
+    def __init__(self, embedder=None, vector_cache_file: Optional[str] = None,
+                 ann_min_size: int = 10000, ann_n_probe: int = 8, **options):
+        """
+        Инициализация пустого векторного индекса
+
+        Args:
+            embedder: Эмбеддер (по умолчанию HashingEmbedder)
+            vector_cache_file: Путь к .npy кэшу векторов (None - без кэша)
+            ann_min_size: Размер базы, начиная с которого используется IVF-индекс
+            ann_n_probe: Количество просматриваемых кластеров IVF
+            **options: Параметры других движков (не используются)
+        """
+        self.semantic_index = semantic.SemanticIndex(
+            embedder, vector_cache_file, ann_min_size=ann_min_size, ann_n_probe=ann_n_probe
+        )
+        super().__init__(**options)
+
+    def _build_vectors(self):
+        """Векторизация записей (неизмененные записи берутся из кэша)"""
+        self.semantic_index.build([
+            (faq_id, " ".join([faq["question"], *faq.get("keywords", [])])) for faq_id, faq in self._faq_by_id.items()
+        ])
+
+    def _vector_search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Ближайшие векторы"""
+        return self.semantic_index.search(query, k=k)
+
+    def statistics(self) -> Dict[str, Any]:
+        """Количество векторов"""
+        return {"search_index_size": len(self.semantic_index.doc_ids)}
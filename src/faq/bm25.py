@@ -0,0 +1,184 @@
+"""
+BM25 ranking module for OptFM AI Bot
+Инвертированный индекс с ранжированием Okapi BM25 для поиска по FAQ
+"""
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+from .postings import TYPECODE, find_posting, new_postings
+
+# Постинг-лист BM25: отсортированные ID документов и частоты термина в них
+Postings = Tuple[array, array]
+
+
+class BM25Index:
+    """
+    Инвертированный индекс с постинг-листами и ранжированием Okapi BM25
+
+    Постинг-лист термина - пара параллельных массивов array('I'): ID документов
+    по возрастанию и частоты термина в них.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Инициализация индекса
+
+        Args:
+            k1: Параметр насыщения частоты термина
+            b: Параметр нормализации по длине документа
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Postings] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.idf: Dict[str, float] = {}
+        self.total_length = 0
+        self.avg_doc_length = 0.0
+
+    def build(self, documents: Iterable[Tuple[int, List[str]]]):
+        """
+        Построение индекса с нуля
+
+        Args:
+            documents: Пары (ID документа, список терминов документа)
+        """
+        frequencies: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths = {}
+
+        for doc_id, terms in documents:
+            self.doc_lengths[doc_id] = len(terms)
+            for term, tf in Counter(terms).items():
+                frequencies.setdefault(term, {})[doc_id] = tf
+
+        self.postings = {}
+        for term, doc_tfs in frequencies.items():
+            doc_ids = new_postings(doc_tfs)
+            self.postings[term] = (doc_ids, array(TYPECODE, (doc_tfs[doc_id] for doc_id in doc_ids)))
+
+        self._compute_statistics()
+
+    def add_document(self, doc_id: int, terms: List[str]):
+        """
+        Добавление одного документа без перестройки индекса
+
+        Args:
+            doc_id: ID документа (не должен присутствовать в индексе)
+            terms: Термины документа
+        """
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+        for term, tf in Counter(terms).items():
+            doc_ids, tfs = self.postings.setdefault(term, (new_postings(), array(TYPECODE)))
+            position = bisect_left(doc_ids, doc_id)
+            doc_ids.insert(position, doc_id)
+            tfs.insert(position, tf)
+        self._invalidate_statistics()
+
+    def remove_document(self, doc_id: int, terms: List[str]):
+        """
+        Удаление одного документа без перестройки индекса
+
+        Опустевшие постинг-листы остаются до вызова compact().
+
+        Args:
+            doc_id: ID документа
+            terms: Термины документа (те же, что были переданы при добавлении)
+        """
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if postings:
+                doc_ids, tfs = postings
+                position = find_posting(doc_ids, doc_id)
+                if position != -1:
+                    del doc_ids[position], tfs[position]
+        self._invalidate_statistics()
+
+    def compact(self):
+        """Удаление опустевших постинг-листов"""
+        self.postings = {term: postings for term, postings in self.postings.items() if postings[0]}
+        self.idf = {term: idf for term, idf in self.idf.items() if term in self.postings}
+
+    def _compute_statistics(self):
+        """Предварительный расчет IDF и средней длины документа"""
+        total_docs = len(self.doc_lengths)
+        self.total_length = sum(self.doc_lengths.values())
+        self.avg_doc_length = self.total_length / total_docs if total_docs else 0.0
+        self.idf = {term: self._compute_idf(len(doc_ids)) for term, (doc_ids, _) in self.postings.items()}
+
+    def _invalidate_statistics(self):
+        """Пересчет средней длины; IDF пересчитываются лениво при поиске"""
+        total_docs = len(self.doc_lengths)
+        self.avg_doc_length = self.total_length / total_docs if total_docs else 0.0
+        self.idf = {}
+
+    def _compute_idf(self, doc_freq: int) -> float:
+        """IDF термина по числу содержащих его документов"""
+        # Вариант IDF из Lucene: всегда положительный, даже для частых терминов
+        return math.log(1 + (len(self.doc_lengths) - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def score(self, terms: Iterable[str], doc_ids: Optional[Collection[int]] = None) -> Dict[int, float]:
+        """
+        Вычисление BM25 скоров документов, содержащих термины запроса
+
+        Args:
+            terms: Термины запроса
+            doc_ids: Оценивать только эти документы (например, одну категорию)
+
+        Returns:
+            Словарь {ID документа: скор}
+        """
+        scores: Dict[int, float] = {}
+        if not self.avg_doc_length:
+            return scores
+
+        k1 = self.k1
+        length_norm = k1 * self.b / self.avg_doc_length
+        base_norm = k1 * (1 - self.b)
+        doc_lengths = self.doc_lengths
+
+        # Повторы терминов в запросе не увеличивают скор
+        for term in dict.fromkeys(terms):
+            postings = self.postings.get(term)
+            if not postings or not postings[0]:
+                continue
+            term_doc_ids, tfs = postings
+            idf = self.idf.get(term)
+            if idf is None:
+                idf = self.idf[term] = self._compute_idf(len(term_doc_ids))
+            if doc_ids is None:
+                matches = zip(term_doc_ids, tfs)
+            elif len(doc_ids) < len(term_doc_ids):
+                # Перебираем меньшее из двух: подмножество документов (двоичным поиском) или постинг-лист
+                positions = (find_posting(term_doc_ids, doc_id) for doc_id in doc_ids)
+                matches = [(term_doc_ids[position], tfs[position]) for position in positions if position != -1]
+            else:
+                matches = [(doc_id, tf) for doc_id, tf in zip(term_doc_ids, tfs) if doc_id in doc_ids]
+            for doc_id, tf in matches:
+                norm = base_norm + length_norm * doc_lengths[doc_id]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        return scores
+
+    def search(self, terms: Iterable[str], k: int = 10,
+               doc_ids: Optional[Collection[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Поиск top-k документов по запросу
+
+        Args:
+            terms: Термины запроса
+            k: Количество результатов
+            doc_ids: Искать только среди этих документов
+
+        Returns:
+            Список пар (ID документа, скор), отсортированный по убыванию скора
+        """
+        scores = self.score(terms, doc_ids)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
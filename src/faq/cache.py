@@ -0,0 +1,83 @@
+"""
+Query cache module for OptFM AI Bot
+LRU-кэш результатов поиска с ограничением времени жизни записей
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+
+class QueryCache:
+    """LRU-кэш с TTL и счетчиками попаданий/промахов (потокобезопасный)"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        """
+        Инициализация кэша
+
+        Args:
+            max_size: Максимальное количество записей (0 - кэш отключен)
+            ttl: Время жизни записи в секундах
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # Поиск может выполняться в пуле потоков
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Получение значения из кэша
+
+        Args:
+            key: Ключ запроса
+
+        Returns:
+            Пара (найдено ли значение, значение)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Сохранение значения (None тоже кэшируется: "ничего не найдено")
+
+        Args:
+            key: Ключ запроса
+            value: Результат поиска
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Очистка кэша (счетчики сохраняются)"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
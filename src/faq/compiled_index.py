@@ -0,0 +1,110 @@
+"""
+Compiled index module for OptFM AI Bot
+Скомпилированный снимок поискового индекса FAQ для быстрого запуска
+"""
+import gc
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Версия формата: увеличивается при любом изменении структур индекса
+FORMAT_VERSION = 4
+
+
+def content_hash(content: bytes, *params: Any) -> str:
+    """
+    Хэш содержимого файла FAQ, версии формата и параметров индексации
+
+    Args:
+        content: Содержимое JSON файла FAQ
+        params: Параметры, от которых зависит индекс
+
+    Returns:
+        Hex-строка sha256
+    """
+    digest = hashlib.sha256(content)
+    digest.update(repr((FORMAT_VERSION, params)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def source_hash(faq_file: Path, *params: Any) -> Optional[str]:
+    """
+    Хэш исходного JSON файла FAQ, версии формата и параметров индексации
+
+    Args:
+        faq_file: Путь к JSON файлу FAQ
+        params: Параметры, от которых зависит индекс (например, настройки ранжирования)
+
+    Returns:
+        Hex-строка sha256 или None, если файл недоступен
+    """
+    try:
+        content = Path(faq_file).read_bytes()
+    except OSError:
+        return None
+    return content_hash(content, *params)
+
+
+def save_compiled_index(path: Path, key: str, state: Dict[str, Any]):
+    """
+    Сохранение снимка индекса через временный файл
+
+    Args:
+        path: Путь к файлу снимка
+        key: Хэш исходных данных (source_hash)
+        state: Структуры индекса
+    """
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"version": FORMAT_VERSION, "key": key, "state": state}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logger.info(f"Скомпилированный индекс FAQ сохранен в {path}")
+    except Exception as e:
+        logger.error(f"Ошибка сохранения скомпилированного индекса {path}: {e}")
+
+
+def load_compiled_index(path: Path, key: str) -> Optional[Dict[str, Any]]:
+    """
+    Загрузка снимка индекса, если он построен по тем же исходным данным
+
+    Снимок создается самим приложением рядом с файлом FAQ; pickle-файлы из
+    недоверенных источников загружать нельзя.
+
+    Args:
+        path: Путь к файлу снимка
+        key: Ожидаемый хэш исходных данных
+
+    Returns:
+        Структуры индекса или None, если снимка нет или он устарел
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    # Сборщик мусора на время загрузки отключается: снимок состоит из сотен тысяч
+    # мелких контейнеров, и повторные проходы GC по ним замедляют загрузку в разы
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, 'rb') as f:
+            compiled = pickle.load(f)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки скомпилированного индекса {path}: {e}")
+        return None
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if compiled.get("version") != FORMAT_VERSION or compiled.get("key") != key:
+        logger.info(f"Скомпилированный индекс {path} устарел, индекс будет перестроен")
+        return None
+    return compiled["state"]
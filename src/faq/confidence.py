@@ -0,0 +1,91 @@
+"""
+Answer confidence module for OptFM AI Bot
+Калиброванная уверенность результатов поиска и пороги ответа, подсказки и отказа
+"""
+from typing import Dict, List
+
+# Порог ответа подобран tune_faq_thresholds.py на data/faq_queries.json. Порог
+# подсказки ниже предложенного им 0.25: иначе отбрасываются верные подсказки на
+# запросы с посторонними словами ("доставка до Мурманска" - уверенность 0.23)
+ANSWER_THRESHOLD = 0.4
+SUGGEST_THRESHOLD = 0.2
+
+# Решения по результату поиска
+ANSWER = "answer"
+SUGGEST = "suggest"
+REJECT = "reject"
+
+
+def calibrate(score: float, pivot: float) -> float:
+    """
+    Приведение скора этапа поиска к общей шкале уверенности от 0 до 1
+
+    Скор этапа переводится кусочно-линейно: pivot (порог, начиная с которого
+    скор этапа надежен для ответа) соответствует уверенности 0.5, 0 и 1 -
+    крайним значениям. После приведения скоры разных этапов и движков
+    сравнимы с одними порогами.
+
+    Args:
+        score: Скор этапа от 0 до 1
+        pivot: Скор этапа, соответствующий уверенности 0.5 (от 0 до 1, не включая)
+
+    Returns:
+        Уверенность от 0 до 1
+    """
+    score = min(max(score, 0.0), 1.0)
+    if score <= pivot:
+        return 0.5 * score / pivot
+    return 0.5 + 0.5 * (score - pivot) / (1 - pivot)
+
+
+class AnswerPolicy:
+    """
+    Пороги уверенности: ответ, подсказка или отказ
+
+    Результат с уверенностью не ниже answer_threshold используется как ответ,
+    не ниже suggest_threshold - как подсказка "Возможно, вы имели в виду",
+    остальные результаты отбрасываются.
+    """
+
+    def __init__(self, answer_threshold: float = ANSWER_THRESHOLD, suggest_threshold: float = SUGGEST_THRESHOLD):
+        """
+        Инициализация порогов
+
+        Args:
+            answer_threshold: Минимальная уверенность ответа
+            suggest_threshold: Минимальная уверенность подсказки
+
+        Raises:
+            ValueError: Пороги вне диапазона 0 <= suggest_threshold <= answer_threshold <= 1
+        """
+        if not 0.0 <= suggest_threshold <= answer_threshold <= 1.0:
+            raise ValueError(
+                f"Пороги уверенности должны удовлетворять 0 <= подсказка <= ответ <= 1: "
+                f"{suggest_threshold}, {answer_threshold}"
+            )
+        self.answer_threshold = answer_threshold
+        self.suggest_threshold = suggest_threshold
+
+    def decide(self, hit: Dict) -> str:
+        """
+        Решение по результату поиска
+
+        Args:
+            hit: Результат поиска с полем "confidence"
+
+        Returns:
+            ANSWER, SUGGEST или REJECT
+        """
+        if hit["confidence"] >= self.answer_threshold:
+            return ANSWER
+        if hit["confidence"] >= self.suggest_threshold:
+            return SUGGEST
+        return REJECT
+
+    def is_answer(self, hit: Dict) -> bool:
+        """Достаточно ли уверенности, чтобы отвечать результатом на вопрос"""
+        return self.decide(hit) == ANSWER
+
+    def filter(self, hits: List[Dict]) -> List[Dict]:
+        """Результаты не ниже порога подсказки (порядок сохраняется)"""
+        return [hit for hit in hits if hit["confidence"] >= self.suggest_threshold]
@@ -2,31 +2,129 @@
 Enhanced FAQ Manager Module for OptFM AI Bot
 Улучшенная версия с более умным поиском и обработкой запросов
 """
+import asyncio
+import copy
 import json
 import logging
-import re
-from typing import List, Dict, Optional, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Iterable, List, Dict, Optional, Set, TextIO, Tuple
 from pathlib import Path
-from difflib import SequenceMatcher
+
+from . import backends, compiled_index, confidence, exchange
+from .backends import SearchBackend
+from .bm25 import BM25Index
+from .cache import QueryCache
+from .persistence import FAQWriter
+from .postings import MAX_ID
+from .snapshot import FAQSnapshot
+from .tokenizer import normalize_phrase, normalize_query, normalize_tokens, tokenize
 
 logger = logging.getLogger(__name__)
 
 class EnhancedFAQManager:
-    """Улучшенный менеджер для работы с часто задаваемыми вопросами"""
+    """
+    Улучшенный менеджер для работы с часто задаваемыми вопросами
+    
+    Менеджер хранит базу, категории, кэш и отвечает за сохранение и
+    перезагрузку; поиск выполняет движок из реестра backends (по умолчанию
+    "index" - инвертированный индекс).
+    """
+    
+    # Сколько раз asearch повторяет поиск в пуле, если база изменилась во время поиска
+    SEARCH_ATTEMPTS = 3
     
-    def __init__(self, faq_file: str = "data/faq_enhanced.json"):
+    def __init__(self, faq_file: str = "data/faq_enhanced.json", ranker: Optional[BM25Index] = None,
+                 similarity_backend: str = "trigram", embedder=None, vector_cache_file: Optional[str] = None,
+                 ann_min_size: int = 10000, ann_n_probe: int = 8,
+                 cache_size: int = 1024, cache_ttl: float = 300.0,
+                 index_file: Optional[str] = None, use_compiled_index: bool = True,
+                 save_delay: float = 1.0, compact_json: bool = False,
+                 search_workers: int = 4, search_timeout: float = 2.0, spell_distance: int = 2,
+                 transliterate: bool = True, backend: str = backends.DEFAULT_BACKEND,
+                 answer_threshold: float = confidence.ANSWER_THRESHOLD,
+                 suggest_threshold: float = confidence.SUGGEST_THRESHOLD):
         """
         Инициализация улучшенного FAQ менеджера
         
         Args:
             faq_file: Путь к файлу с FAQ данными
+            ranker: Движок ранжирования по ключевым словам (по умолчанию BM25Index).
+                Должен реализовывать методы build(documents), search(terms, k, doc_ids=None),
+                add_document(doc_id, terms), remove_document(doc_id, terms) и compact()
+            similarity_backend: Движок поиска похожих вопросов: "trigram" (по умолчанию),
+                "tfidf" (матрица TF-IDF) или "semantic" (векторный поиск); два последних требуют numpy
+            embedder: Эмбеддер для режима "semantic" (по умолчанию HashingEmbedder)
+            vector_cache_file: Путь к .npy кэшу векторов для режима "semantic"
+                (по умолчанию рядом с файлом FAQ)
+            ann_min_size: Размер базы, начиная с которого режим "semantic" использует
+                приближенный IVF-индекс вместо полного перебора
+            ann_n_probe: Количество просматриваемых кластеров IVF: больше - выше полнота, медленнее поиск
+            cache_size: Размер кэша результатов search_faq (0 - без кэша)
+            cache_ttl: Время жизни результата в кэше, секунды
+            index_file: Путь к скомпилированному индексу (по умолчанию рядом с файлом FAQ,
+                для движков кроме "index" - с именем движка в названии файла)
+            use_compiled_index: Загружать индекс из снимка, если JSON не изменился
+            save_delay: Задержка фоновой записи файла FAQ после изменения, секунды
+                (изменения за это время сохраняются одной записью; 0 - запись сразу)
+            compact_json: Сохранять файл FAQ без отступов
+            search_workers: Размер пула потоков asearch (0 - поиск в вызывающем потоке)
+            search_timeout: Предельное время поиска asearch в пуле, секунды
+            spell_distance: Максимальное расстояние исправления опечаток в словах
+                запроса перед поиском по ключевым словам (0 - без исправления)
+            transliterate: Искать слова запроса, набранные в другой раскладке
+                клавиатуры или латиницей ("ljcnfdrf", "dostavka" -> "доставка")
+            backend: Движок поиска: "index" (по умолчанию), "linear" (прежний
+                линейный поиск), "tfidf" или "semantic" (два последних требуют numpy)
+            answer_threshold: Минимальная калиброванная уверенность результата для ответа
+            suggest_threshold: Минимальная уверенность подсказки; результаты ниже отбрасываются
+            
+        Raises:
+            ValueError: Неизвестный движок поиска или пороги вне 0 <= подсказка <= ответ <= 1
         """
         self.faq_file = Path(faq_file)
         self.faq_data = []
-        self._load_faq()
+        # Поиск записи и ее позиции в faq_data по ID за O(1)
+        self._faq_by_id: Dict[int, Dict] = {}
+        self._faq_positions: Dict[int, int] = {}
+        self._snapshot: Optional[FAQSnapshot] = None
+        # Движок создается заново при каждой полной перестройке индекса
+        self.backend_name = backends.resolve_backend(backend)
+        self._backend_options = {
+            "ranker": ranker or BM25Index(),
+            "similarity_backend": similarity_backend,
+            "embedder": embedder,
+            "vector_cache_file": vector_cache_file or str(self.faq_file.with_suffix(".vectors.npy")),
+            "ann_min_size": ann_min_size,
+            "ann_n_probe": ann_n_probe,
+            "spell_distance": spell_distance,
+            "transliterate": transliterate,
+        }
+        self.backend: Optional[SearchBackend] = None
+        self.answer_policy = confidence.AnswerPolicy(answer_threshold, suggest_threshold)
+        self.query_cache = QueryCache(cache_size, cache_ttl)
+        # Поколение индекса: меняется при каждой перестройке и входит в ключ кэша
+        self._index_generation = 0
+        # У каждого движка свой снимок: процессы с разными движками не перезаписывают его друг у друга
+        index_suffix = ".index.pkl" if self.backend_name == backends.DEFAULT_BACKEND else f".{self.backend_name}.index.pkl"
+        self.index_file = Path(index_file) if index_file else self.faq_file.with_suffix(index_suffix)
+        self.use_compiled_index = use_compiled_index
+        # Хэш содержимого файла FAQ, из которого построен текущий индекс
+        self._source_key = self._compiled_index_key()
+        self.last_reload: Optional[Dict[str, Any]] = None
+        self._writer = FAQWriter(self.faq_file, save_delay, compact_json, on_saved=self._on_faq_saved)
+        self.search_workers = search_workers
+        self.search_timeout = search_timeout
+        self._search_pool: Optional[ThreadPoolExecutor] = None
         
-        # Создаем индекс для быстрого поиска
-        self._build_search_index()
+        # Скомпилированный индекс избавляет от разбора JSON и индексации при запуске
+        if not self._load_compiled_index(self._source_key):
+            self._load_faq()
+            
+            # Создаем индекс для быстрого поиска
+            self._build_search_index()
+            self._save_compiled_index(self._source_key)
         
     def _load_faq(self):
         """Загрузка FAQ данных из файла"""
@@ -41,27 +139,291 @@ class EnhancedFAQManager:
         except Exception as e:
             logger.error(f"Ошибка загрузки FAQ: {e}")
             self.faq_data = self._get_default_faq()
+        
+        self._build_id_map()
+    
+    # Структуры менеджера, которые сохраняются в скомпилированном индексе (вместе с состоянием движка)
+    _COMPILED_FIELDS = (
+        "faq_data", "_faq_by_id", "_faq_positions", "category_index", "_category_members", "_document_categories",
+    )
+    
+    def _index_params(self) -> Tuple:
+        """Движок и параметры ранжирования, от которых зависит скомпилированный индекс"""
+        ranker = self._backend_options["ranker"]
+        return self.backend_name, type(ranker).__qualname__, getattr(ranker, "k1", None), getattr(ranker, "b", None)
+    
+    def _compiled_index_key(self) -> Optional[str]:
+        """Хэш файла FAQ и параметров ранжирования для проверки актуальности снимка"""
+        return compiled_index.source_hash(self.faq_file, *self._index_params())
+    
+    def _load_compiled_index(self, key: Optional[str]) -> bool:
+        """
+        Загрузка индекса из скомпилированного снимка
+        
+        Args:
+            key: Хэш текущего файла FAQ
+            
+        Returns:
+            True если снимок актуален и загружен
+        """
+        if not self.use_compiled_index or key is None:
+            return False
+        state = compiled_index.load_compiled_index(self.index_file, key)
+        if state is None:
+            return False
+        missing = [field for field in (*self._COMPILED_FIELDS, "backend") if field not in state]
+        if missing:
+            logger.warning(f"В скомпилированном индексе нет полей {missing}, индекс будет перестроен")
+            return False
+        backend = self._new_backend()
+        if not backend.set_state(state["backend"], state["_faq_by_id"].values()):
+            logger.warning("Скомпилированный индекс не подходит движку поиска, индекс будет перестроен")
+            return False
+        
+        for field in self._COMPILED_FIELDS:
+            setattr(self, field, state[field])
+        self.backend = backend
+        self._index_generation += 1
+        self._max_id = max(self._faq_by_id, default=0)
+        self._snapshot = None
+        logger.info(f"Загружено {len(self.faq_data)} FAQ записей из скомпилированного индекса {self.index_file}")
+        return True
+    
+    def _save_compiled_index(self, key: Optional[str]):
+        """
+        Сохранение текущего индекса в скомпилированный снимок
+        
+        Args:
+            key: Хэш файла FAQ, из которого построен индекс
+        """
+        if not self.use_compiled_index or key is None:
+            return
+        state = {field: getattr(self, field) for field in self._COMPILED_FIELDS}
+        state["backend"] = self.backend.get_state()
+        compiled_index.save_compiled_index(self.index_file, key, state)
+    
+    def compile_index(self, rebuild: bool = True) -> Path:
+        """
+        Перестроение индекса из JSON и сохранение скомпилированного снимка
+        
+        Args:
+            rebuild: Перечитать JSON и перестроить индекс; False - сохранить
+                текущий индекс (например, только что построенный при создании менеджера)
+        
+        Returns:
+            Путь к файлу снимка
+        """
+        if rebuild:
+            self._source_key = self._compiled_index_key()
+            self._load_faq()
+            self._build_search_index()
+        self._save_compiled_index(self._source_key)
+        return self.index_file
+    
+    def _read_faq_file(self) -> List[Dict]:
+        """
+        Строгое чтение файла FAQ для горячей перезагрузки
+        
+        В отличие от _load_faq, ошибки не заменяются базовым набором FAQ:
+        недописанный или поврежденный файл не должен подменить рабочую базу.
+        
+        Returns:
+            Список FAQ записей
+            
+        Raises:
+            OSError, ValueError: Файл недоступен или имеет неверный формат
+        """
+        with open(self.faq_file, 'r', encoding='utf-8') as f:
+            faq_data = json.load(f)
+        if not isinstance(faq_data, list) or not all(
+            isinstance(faq, dict) and {"id", "question", "answer"} <= faq.keys() for faq in faq_data
+        ):
+            raise ValueError("ожидается список записей с полями id, question и answer")
+        return faq_data
+    
+    def prepare_reload(self) -> Optional[Dict[str, Any]]:
+        """
+        Построение нового индекса из файла FAQ без изменения текущего
+        
+        Безопасно вызывать в фоновом потоке: новое состояние строится в копии
+        менеджера, текущий индекс продолжает обслуживать поиск.
+        
+        Returns:
+            Новое состояние для apply_reload или None, если содержимое файла
+            не изменилось или файл содержит ошибки
+        """
+        # Несохраненные изменения из бота имеют приоритет: они перезапишут файл
+        if self._writer.dirty:
+            logger.info("Перезагрузка FAQ отложена: есть несохраненные изменения")
+            return None
+        key = self._compiled_index_key()
+        if key is None or key == self._source_key:
+            return None
+        
+        start = time.perf_counter()
+        # Копия получает новый движок: текущий индекс продолжает обслуживать поиск
+        fresh = copy.copy(self)
+        fresh._source_key = key
+        fresh._reload_base_generation = self._index_generation
+        
+        source = "compiled"
+        if not fresh._load_compiled_index(key):
+            source = "json"
+            try:
+                fresh.faq_data = fresh._read_faq_file()
+            except Exception as e:
+                logger.error(f"Ошибка перезагрузки FAQ из {self.faq_file}: {e}")
+                return None
+            fresh._build_id_map()
+            fresh._build_search_index()
+            fresh._save_compiled_index(key)
+        
+        fresh.last_reload = {
+            "total_faq": len(fresh.faq_data),
+            "duration": round(time.perf_counter() - start, 3),
+            "source": source,
+        }
+        return vars(fresh)
+    
+    def apply_reload(self, state: Dict[str, Any]) -> bool:
+        """
+        Атомарная замена индекса состоянием из prepare_reload
+        
+        Все структуры заменяются одним обновлением словаря атрибутов, поэтому
+        поиск видит либо старый, либо новый индекс целиком. Вызывается из
+        потока, в котором выполняется поиск (цикла событий бота).
+        
+        Args:
+            state: Состояние, построенное prepare_reload
+            
+        Returns:
+            True если индекс заменен (False - база изменилась во время построения)
+        """
+        state = dict(state)
+        # Пул поиска не относится к индексу и мог быть создан во время построения
+        state.pop("_search_pool", None)
+        if state.pop("_reload_base_generation", None) != self._index_generation:
+            logger.warning("Перезагрузка FAQ отменена: база изменилась во время построения индекса")
+            return False
+        state["_index_generation"] = self._index_generation + 1
+        self.__dict__.update(state)
+        self.query_cache.clear()
+        logger.info(f"База FAQ перезагружена: {self.last_reload['total_faq']} записей "
+                    f"за {self.last_reload['duration']:.3f} с ({self.last_reload['source']})")
+        return True
+    
+    def reload(self) -> bool:
+        """
+        Перезагрузка FAQ из файла, если его содержимое изменилось
+        
+        Returns:
+            True если индекс заменен
+        """
+        state = self.prepare_reload()
+        if state is None:
+            return False
+        return self.apply_reload(state)
+    
+    def _build_id_map(self):
+        """Построение словарей ID -> запись и ID -> позиция в faq_data"""
+        self._faq_by_id = {}
+        self._faq_positions = {}
+        for position, faq in enumerate(self.faq_data):
+            if type(faq["id"]) is not int or not 0 < faq["id"] <= MAX_ID:
+                # Такой ID не помещается в постинг-листы индекса: запись не индексируется
+                logger.warning(f"Недопустимый ID FAQ (ожидается целое от 1 до {MAX_ID}): {faq['id']!r}")
+                continue
+            if faq["id"] in self._faq_by_id:
+                # Как и при линейном поиске, по ID находится первая запись
+                logger.warning(f"Повторяющийся ID FAQ: {faq['id']}")
+                continue
+            self._faq_by_id[faq["id"]] = faq
+            self._faq_positions[faq["id"]] = position
+        self._max_id = max(self._faq_by_id, default=0)
+        self._snapshot = None
+    
+    def _new_backend(self) -> SearchBackend:
+        """Пустой движок поиска с параметрами менеджера"""
+        return backends.create_backend(self.backend_name, **self._backend_options)
     
     def _build_search_index(self):
-        """Создание индекса для быстрого поиска"""
-        self.search_index = {}
-        
-        for faq in self.faq_data:
-            # Индексируем по ключевым словам
-            for keyword in faq.get("keywords", []):
-                keyword_lower = keyword.lower()
-                if keyword_lower not in self.search_index:
-                    self.search_index[keyword_lower] = []
-                self.search_index[keyword_lower].append(faq["id"])
+        """Создание индекса для быстрого поиска (полная перестройка)"""
+        self._index_generation += 1
+        backend = self._new_backend()
+        backend.build(self._faq_by_id.values())
+        self.backend = backend
+        
+        self.category_index = {}
+        self._category_members = {}
+        self._document_categories = {}
+        for faq in self._faq_by_id.values():
+            self._index_category(faq)
+    
+    def _index_category(self, faq: Dict):
+        """Добавление записи в индекс категорий"""
+        category = faq.get("category")
+        if category:
+            faq_id = faq["id"]
+            self._document_categories[faq_id] = category
+            members = self._category_members.setdefault(category, set())
+            if not members:
+                for key in self._category_keys(category):
+                    self.category_index.setdefault(key, set()).add(category)
+            members.add(faq_id)
+    
+    def _unindex_category(self, faq_id: int):
+        """Удаление записи из индекса категорий"""
+        category = self._document_categories.pop(faq_id, None)
+        members = self._category_members.get(category)
+        if members is not None:
+            members.discard(faq_id)
+            if not members:
+                # Опустевшая категория больше не находится ни по одному ключу
+                del self._category_members[category]
+                for key in self._category_keys(category):
+                    names = self.category_index.get(key)
+                    if names:
+                        names.discard(category)
+                        if not names:
+                            del self.category_index[key]
+    
+    def _category_keys(self, category: str) -> Set[str]:
+        """
+        Ключи индекса категорий: нормализованное название целиком и основы его слов
+        
+        Например, "Доставка и самовывоз" находится по запросам "доставка",
+        "самовывоз" и "доставка и самовывоз".
+        """
+        words = normalize_tokens(tokenize(category))
+        keys = {word for word in words if len(word) > 2}
+        keys.add(" ".join(words))
+        return keys
+    
+    def _add_to_index(self, faq: Dict):
+        """Инкрементальное добавление (или замена) записи в движке поиска и индексе категорий"""
+        self.backend.add(faq)
+        self._unindex_category(faq["id"])
+        self._index_category(faq)
+        self._index_generation += 1
+    
+    def _remove_from_index(self, faq_id: int):
+        """Инкрементальное удаление записи из движка поиска и индекса категорий"""
+        self.backend.remove(faq_id)
+        self._unindex_category(faq_id)
+        self._index_generation += 1
+    
+    def get_phrase_matches(self, query: str) -> Dict[str, List[int]]:
+        """
+        Ключевые фразы FAQ, найденные в запросе, и ID содержащих их FAQ
+        
+        Args:
+            query: Текст запроса
             
-            # Индексируем по словам из вопроса
-            question_words = re.findall(r'\w+', faq["question"].lower())
-            for word in question_words:
-                if len(word) > 2:  # Игнорируем короткие слова
-                    if word not in self.search_index:
-                        self.search_index[word] = []
-                    if faq["id"] not in self.search_index[word]:
-                        self.search_index[word].append(faq["id"])
+        Returns:
+            Словарь {фраза запроса: список ID FAQ} (пустой, если движок не ищет фразы)
+        """
+        phrase_matches = getattr(self.backend, "phrase_matches", None)
+        return phrase_matches(query) if phrase_matches else {}
     
     def _get_default_faq(self) -> List[Dict]:
         """Возвращает базовый набор FAQ для OptFM (fallback)"""
@@ -69,6 +431,7 @@ class EnhancedFAQManager:
             {
                 "id": 1,
                 "question": "Что такое OptFM?",
+                "category": "О компании",
                 "keywords": ["компания", "optfm", "fashion mobile", "чем занимаетесь"],
                 "answer": "OptFM (Fashion Mobile) — это оптовая платформа с аксессуарами и комплектующими для мобильной и компьютерной электроники. Мы работаем на рынке уже 22 года."
             }
@@ -84,119 +447,157 @@ class EnhancedFAQManager:
         Returns:
             Dict с найденным FAQ или None
         """
-        if not query or not self.faq_data:
-            return None
+        hits = self.search(query, k=1)
+        if hits and self.is_answer(hits[0]):
+            return hits[0]["faq"]
+        return None
+    
+    def search(self, query: str, k: int = 3, category: Optional[str] = None) -> List[Dict]:
+        """
+        Ранжированный поиск: основной ответ и альтернативы за один проход
         
-        # Нормализация запроса
-        query_lower = query.lower().strip()
-        query_words = re.findall(r'\w+', query_lower)
+        У движка "index" этапы идут по приоритету (точное совпадение, ключевые
+        слова, сходство), каждый следующий этап дополняет список до k результатов.
         
-        logger.info(f"Поиск FAQ для запроса: '{query}' (слова: {query_words})")
+        Args:
+            query: Поисковый запрос пользователя
+            k: Максимальное количество результатов
+            category: Искать только в этой категории (как в get_faq_by_category)
+            
+        Returns:
+            Список результатов {"faq", "score", "confidence", "stage", "matched_terms", "corrections"},
+            где confidence - калиброванная уверенность от 0 до 1 (не ниже порога подсказки),
+            stage - "exact", "keyword" или "fuzzy", matched_terms - слова запроса
+            (для "fuzzy" - ключевые слова FAQ), объясняющие совпадение, а corrections -
+            исправленные опечатки среди них {слово запроса: исправление}
+        """
+        return self._search(normalize_query(query), k, category)[0]
+    
+    def _search(self, query: str, k: int, category: Optional[str] = None,
+                fuzzy: bool = True, lookup: bool = True) -> Tuple[List[Dict], bool]:
+        """
+        Поиск с возможностью пропустить дорогой этап нечеткого поиска
         
-        # 1. Поиск по точному совпадению вопроса
-        exact_match = self._find_exact_match(query_lower)
-        if exact_match:
-            logger.info(f"Найдено точное совпадение: {exact_match['id']}")
-            return exact_match
+        Args:
+            query: Поисковый запрос, нормализованный normalize_query (один раз на вызов
+                search/asearch; его же получает движок)
+            k: Максимальное количество результатов
+            category: Искать только в этой категории
+            fuzzy: Выполнять этап нечеткого поиска
+            lookup: Искать ответ в кэше (False - кэш уже проверен дешевыми этапами asearch,
+                повторная проверка удвоила бы счетчик промахов)
+            
+        Returns:
+            Пара (результаты, окончательны ли они): без нечеткого этапа результат
+            окончателен, если найден в кэше или дешевые этапы дали k результатов
+        """
+        if not query or not self.faq_data or k <= 0:
+            return [], True
         
-        # 2. Поиск по индексу ключевых слов
-        keyword_match = self._find_by_keywords(query_words)
-        if keyword_match:
-            logger.info(f"Найдено совпадение по ключевым словам: {keyword_match['id']}")
-            return keyword_match
+        doc_ids = None
+        if category is not None:
+            doc_ids = self._category_ids(category)
+            if not doc_ids:
+                return [], True
         
-        # 3. Поиск по сходству (fuzzy search)
-        similarity_match = self._find_by_similarity(query_lower, query_words)
-        if similarity_match:
-            logger.info(f"Найдено совпадение по сходству: {similarity_match['id']}")
-            return similarity_match
+        # Повторяющиеся вопросы отвечаются из кэша без прохода по этапам поиска.
+        # Ключ - та же строка, по которой движок ищет точное совпадение:
+        # пунктуация и словоформы меняют результат
+        cache_key = (self._index_generation, k, query,
+                     None if category is None else normalize_phrase(category))
+        found, cached = self.query_cache.get(cache_key) if lookup else (False, None)
+        if found:
+            logger.debug(f"Ответ на запрос '{query}' взят из кэша")
+            return self._copy_hits(cached), True
         
-        logger.info("Совпадений не найдено")
-        return None
+        hits = self.backend.search(query, k, doc_ids, fuzzy)
+        complete = fuzzy or len(hits) >= k
+        hits = self.answer_policy.filter(hits)
+        if complete:
+            self.query_cache.put(cache_key, tuple(self._copy_hits(hits)))
+        return hits, complete
     
-    def _find_exact_match(self, query: str) -> Optional[Dict]:
-        """Поиск точного совпадения"""
-        for faq in self.faq_data:
-            if query in faq["question"].lower():
-                return faq
-        return None
+    @staticmethod
+    def _copy_hits(hits: Iterable[Dict]) -> List[Dict]:
+        """Копии результатов поиска: изменения у вызывающего не попадают в кэш"""
+        return [
+            dict(hit, matched_terms=list(hit["matched_terms"]), corrections=dict(hit["corrections"]))
+            for hit in hits
+        ]
     
-    def _find_by_keywords(self, query_words: List[str]) -> Optional[Dict]:
-        """Поиск по ключевым словам с использованием индекса"""
-        if not query_words:
-            return None
-        
-        # Подсчитываем совпадения для каждого FAQ
-        faq_scores = {}
+    async def asearch(self, query: str, k: int = 3, category: Optional[str] = None,
+                      timeout: Optional[float] = None) -> List[Dict]:
+        """
+        Асинхронный поиск для обработчиков бота: нечеткий поиск не блокирует цикл событий
         
-        for word in query_words:
-            if word in self.search_index:
-                for faq_id in self.search_index[word]:
-                    if faq_id not in faq_scores:
-                        faq_scores[faq_id] = 0
-                    faq_scores[faq_id] += 1
+        Дешевые этапы (кэш, точное совпадение, ключевые слова) выполняются сразу;
+        если они дали k результатов, пул не используется. Иначе поиск выполняется
+        в ограниченном пуле потоков, и долгий запрос одного пользователя не
+        задерживает ответы остальным. У движков без дешевых этапов (linear, tfidf,
+        semantic) сразу проверяется только кэш.
         
-        # Находим FAQ с максимальным количеством совпадений
-        if faq_scores:
-            best_faq_id = max(faq_scores, key=faq_scores.get)
-            best_score = faq_scores[best_faq_id]
+        Args:
+            query: Поисковый запрос пользователя
+            k: Максимальное количество результатов
+            category: Искать только в этой категории
+            timeout: Предельное время поиска в пуле, секунды (по умолчанию search_timeout)
             
-            # Порог релевантности: минимум 1 совпадение
-            if best_score >= 1:
-                return self._get_faq_by_id(best_faq_id)
+        Returns:
+            Список результатов как у search; по истечении времени - результаты дешевых этапов
+        """
+        text = normalize_query(query)
+        hits, complete = self._search(text, k, category, fuzzy=False)
+        if complete:
+            return hits
+        if self.search_workers <= 0:
+            return self._search(text, k, category, lookup=False)[0]
         
-        return None
+        timeout = self.search_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        for _ in range(self.SEARCH_ATTEMPTS):
+            # Изменения базы выполняются в цикле событий: если поколение индекса
+            # сменилось во время поиска, результат мог быть собран из двух версий
+            generation = self._index_generation
+            future = loop.run_in_executor(self._get_search_pool(), partial(self._search, lookup=False), text, k, category)
+            try:
+                result, _ = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Поиск FAQ по запросу '{query}' не уложился в {timeout} с")
+                return hits
+            except Exception:
+                if generation == self._index_generation:
+                    raise
+                continue
+            if generation == self._index_generation:
+                return result
+        
+        logger.warning(f"База FAQ менялась во время поиска '{query}', поиск выполнен в цикле событий")
+        return self._search(text, k, category)[0]
+    
+    def _get_search_pool(self) -> ThreadPoolExecutor:
+        """Пул потоков asearch (создается при первом обращении)"""
+        if self._search_pool is None:
+            self._search_pool = ThreadPoolExecutor(self.search_workers, thread_name_prefix="faq-search")
+        return self._search_pool
     
-    def _find_by_similarity(self, query: str, query_words: List[str]) -> Optional[Dict]:
-        """Поиск по сходству текста"""
-        best_match = None
-        best_score = 0
+    def is_answer(self, hit: Dict) -> bool:
+        """
+        Достаточно ли результат поиска надежен, чтобы отвечать им на вопрос
         
-        for faq in self.faq_data:
-            # Сравниваем с вопросом
-            question_score = SequenceMatcher(None, query, faq["question"].lower()).ratio()
-            
-            # Сравниваем с ключевыми словами
-            keyword_score = self._calculate_keyword_similarity(query_words, faq.get("keywords", []))
-            
-            # Общий скор
-            total_score = (question_score * 0.6) + (keyword_score * 0.4)
+        Калиброванная уверенность сравнивается с порогом answer_threshold:
+        результаты ниже порога годятся только как подсказки.
+        
+        Args:
+            hit: Результат метода search
             
-            if total_score > best_score and total_score > 0.3:  # Порог сходства
-                best_score = total_score
-                best_match = faq
-        
-        return best_match
-    
-    def _calculate_keyword_similarity(self, query_words: List[str], keywords: List[str]) -> float:
-        """Вычисление сходства по ключевым словам"""
-        if not keywords or not query_words:
-            return 0.0
-        
-        matches = 0
-        total_keywords = len(keywords)
-        
-        for keyword in keywords:
-            keyword_lower = keyword.lower()
-            for word in query_words:
-                # Проверяем различные варианты совпадений
-                if (keyword_lower == word or 
-                    keyword_lower in word or 
-                    word in keyword_lower or
-                    keyword_lower.startswith(word) or
-                    word.startswith(keyword_lower) or
-                    SequenceMatcher(None, keyword_lower, word).ratio() > 0.8):
-                    matches += 1
-                    break
-        
-        return matches / total_keywords if total_keywords > 0 else 0.0
+        Returns:
+            True если результат можно использовать как ответ
+        """
+        return self.answer_policy.is_answer(hit)
     
     def _get_faq_by_id(self, faq_id: int) -> Optional[Dict]:
         """Получение FAQ по ID (приватный метод)"""
-        for faq in self.faq_data:
-            if faq["id"] == faq_id:
-                return faq
-        return None
+        return self._faq_by_id.get(faq_id)
     
     def get_faq_by_id(self, faq_id: int) -> Optional[Dict]:
         """
@@ -210,9 +611,46 @@ class EnhancedFAQManager:
         """
         return self._get_faq_by_id(faq_id)
     
-    def get_all_faq(self) -> List[Dict]:
-        """Возвращает все FAQ записи"""
-        return self.faq_data.copy()
+    def get_all_faq(self) -> FAQSnapshot:
+        """
+        Возвращает все FAQ записи
+        
+        Returns:
+            Неизменяемый снимок базы; создается заново только после изменения FAQ
+        """
+        if self._snapshot is None:
+            self._snapshot = FAQSnapshot(self.faq_data)
+        return self._snapshot
+    
+    def get_categories(self) -> Dict[str, int]:
+        """
+        Категории FAQ и количество записей в каждой
+        
+        Returns:
+            Словарь {категория: количество FAQ} в порядке появления категорий
+        """
+        return {category: len(members) for category, members in self._category_members.items()}
+    
+    def _category_ids(self, category: str) -> Set[int]:
+        """
+        ID FAQ категории по индексу категорий
+        
+        Если категории с таким названием нет, используются постинги ключевого
+        слова (например, "опт"), как в прежнем поиске категории по ключевым словам.
+        
+        Args:
+            category: Название категории или его часть
+            
+        Returns:
+            Множество ID FAQ
+        """
+        key = normalize_phrase(category)
+        names = self.category_index.get(key)
+        if names:
+            if len(names) == 1:
+                return self._category_members[next(iter(names))]
+            return set().union(*(self._category_members[name] for name in names))
+        return self.backend.term_ids(key)
     
     def get_faq_by_category(self, category: str) -> List[Dict]:
         """
@@ -222,18 +660,10 @@ class EnhancedFAQManager:
             category: Категория (например, 'доставка', 'оплата', 'контакты')
             
         Returns:
-            Список FAQ в указанной категории
+            Список FAQ в указанной категории в порядке базы
         """
-        category_lower = category.lower()
-        result = []
-        
-        for faq in self.faq_data:
-            # Проверяем ключевые слова на принадлежность к категории
-            keywords_lower = [kw.lower() for kw in faq.get("keywords", [])]
-            if any(category_lower in kw or kw in category_lower for kw in keywords_lower):
-                result.append(faq)
-        
-        return result
+        ids = self._category_ids(category)
+        return [self._faq_by_id[faq_id] for faq_id in sorted(ids, key=self._faq_positions.__getitem__)]
     
     def search_similar_questions(self, query: str, limit: int = 3) -> List[Dict]:
         """
@@ -246,24 +676,9 @@ class EnhancedFAQManager:
         Returns:
             Список похожих FAQ
         """
-        query_lower = query.lower()
-        query_words = re.findall(r'\w+', query_lower)
-        
-        # Вычисляем сходство для всех FAQ
-        similarities = []
-        for faq in self.faq_data:
-            question_score = SequenceMatcher(None, query_lower, faq["question"].lower()).ratio()
-            keyword_score = self._calculate_keyword_similarity(query_words, faq.get("keywords", []))
-            total_score = (question_score * 0.6) + (keyword_score * 0.4)
-            
-            if total_score > 0.1:  # Минимальный порог
-                similarities.append((faq, total_score))
-        
-        # Сортируем по сходству и возвращаем топ результаты
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [faq for faq, score in similarities[:limit]]
+        return [self._get_faq_by_id(faq_id) for faq_id, _ in self.backend.similar(query, limit)]
     
-    def add_faq(self, question: str, answer: str, keywords: List[str] = None) -> bool:
+    def add_faq(self, question: str, answer: str, keywords: List[str] = None, category: str = None) -> bool:
         """
         Добавление нового FAQ
         
@@ -271,21 +686,31 @@ class EnhancedFAQManager:
             question: Вопрос
             answer: Ответ
             keywords: Ключевые слова
+            category: Категория (опционально)
             
         Returns:
             True если добавлено успешно
         """
         try:
-            new_id = max([faq["id"] for faq in self.faq_data], default=0) + 1
+            new_id = self._max_id + 1
+            if new_id > MAX_ID:
+                logger.error(f"Ошибка добавления FAQ: исчерпаны ID (наибольший {MAX_ID})")
+                return False
+            self._max_id = new_id
             new_faq = {
                 "id": new_id,
                 "question": question,
                 "answer": answer,
                 "keywords": keywords or []
             }
+            if category:
+                new_faq["category"] = category
             
+            self._faq_positions[new_id] = len(self.faq_data)
+            self._faq_by_id[new_id] = new_faq
             self.faq_data.append(new_faq)
-            self._build_search_index()  # Перестраиваем индекс
+            self._snapshot = None
+            self._add_to_index(new_faq)  # Индексируем только новую запись
             self._save_faq()
             logger.info(f"Добавлен новый FAQ: {new_id}")
             return True
@@ -294,7 +719,8 @@ class EnhancedFAQManager:
             logger.error(f"Ошибка добавления FAQ: {e}")
             return False
     
-    def update_faq(self, faq_id: int, question: str = None, answer: str = None, keywords: List[str] = None) -> bool:
+    def update_faq(self, faq_id: int, question: str = None, answer: str = None, keywords: List[str] = None,
+                   category: str = None) -> bool:
         """
         Обновление существующего FAQ
         
@@ -303,6 +729,7 @@ class EnhancedFAQManager:
             question: Новый вопрос (опционально)
             answer: Новый ответ (опционально)
             keywords: Новые ключевые слова (опционально)
+            category: Новая категория (опционально)
             
         Returns:
             True если обновлено успешно
@@ -313,14 +740,22 @@ class EnhancedFAQManager:
                 logger.error(f"FAQ с ID {faq_id} не найден")
                 return False
             
+            # Изменяем копию записи: выданные ранее снимки остаются неизменными
+            faq = dict(faq)
             if question:
                 faq["question"] = question
             if answer:
                 faq["answer"] = answer
             if keywords:
                 faq["keywords"] = keywords
+            if category:
+                faq["category"] = category
+            
+            self.faq_data[self._faq_positions[faq_id]] = faq
+            self._faq_by_id[faq_id] = faq
+            self._snapshot = None
             
-            self._build_search_index()  # Перестраиваем индекс
+            self._add_to_index(faq)  # Индексируем только измененную запись
             self._save_faq()
             logger.info(f"Обновлен FAQ: {faq_id}")
             return True
@@ -345,8 +780,15 @@ class EnhancedFAQManager:
                 logger.error(f"FAQ с ID {faq_id} не найден")
                 return False
             
-            self.faq_data = [f for f in self.faq_data if f["id"] != faq_id]
-            self._build_search_index()  # Перестраиваем индекс
+            # Удаляем по позиции и сдвигаем позиции последующих записей
+            position = self._faq_positions.pop(faq_id)
+            del self._faq_by_id[faq_id]
+            del self.faq_data[position]
+            for later in self.faq_data[position:]:
+                if self._faq_positions.get(later["id"], -1) > position:
+                    self._faq_positions[later["id"]] -= 1
+            self._snapshot = None
+            self._remove_from_index(faq_id)  # Удаляем только термины этой записи
             self._save_faq()
             logger.info(f"Удален FAQ: {faq_id}")
             return True
@@ -355,19 +797,130 @@ class EnhancedFAQManager:
             logger.error(f"Ошибка удаления FAQ: {e}")
             return False
     
-    def _save_faq(self):
-        """Сохранение FAQ в файл"""
-        try:
-            # Создаем директорию если не существует
-            self.faq_file.parent.mkdir(parents=True, exist_ok=True)
+    def import_faq(self, records: Iterable[Dict], replace: bool = False) -> Dict[str, int]:
+        """
+        Массовый импорт FAQ с одной перестройкой индекса и одной записью файла
+        
+        Записи проверяются за один проход до изменения базы, новый индекс
+        строится в копии менеджера и заменяет текущий одним обновлением: при
+        любой ошибке база остается прежней. Запись с существующим ID заменяет
+        прежнюю, записи без ID получают новые ID.
+        
+        Args:
+            records: FAQ записи (question, answer, необязательные id, keywords и category),
+                например из exchange.read_records
+            replace: Заменить всю базу импортируемыми записями
             
-            with open(self.faq_file, 'w', encoding='utf-8') as f:
-                json.dump(self.faq_data, f, ensure_ascii=False, indent=2)
-                
-            logger.info(f"FAQ сохранен в {self.faq_file}")
+        Returns:
+            Статистика {"added", "updated", "total"}
             
-        except Exception as e:
-            logger.error(f"Ошибка сохранения FAQ: {e}")
+        Raises:
+            ValueError: Записи не прошли проверку
+        """
+        imported = []
+        seen_ids = set()
+        errors = []
+        
+        for number, record in enumerate(records, 1):
+            error = self._validate_record(record)
+            if error is None and "id" in record:
+                if record["id"] in seen_ids:
+                    error = f"повторяющийся ID {record['id']}"
+                seen_ids.add(record["id"])
+            if error:
+                errors.append(f"запись {number}: {error}")
+                continue
+            faq = dict(record)
+            faq["keywords"] = list(record.get("keywords", []))
+            imported.append(faq)
+        
+        if errors:
+            raise ValueError(f"Импорт FAQ отклонен ({len(errors)} ошибок): " + "; ".join(errors[:10]))
+        
+        # Новые ID выдаются после всех явных, чтобы не пересечься с ними
+        next_id = max(max(seen_ids, default=0), 0 if replace else self._max_id)
+        for faq in imported:
+            if "id" not in faq:
+                next_id += 1
+                faq["id"] = next_id
+        if next_id > MAX_ID:
+            raise ValueError(f"Импорт FAQ отклонен: новые ID превышают {MAX_ID}")
+        
+        existing = {} if replace else self._faq_by_id
+        updates = {faq["id"]: faq for faq in imported if faq["id"] in existing}
+        # Индекс строится в копии: пока он не готов, поиск и данные менеджера прежние
+        fresh = copy.copy(self)
+        if replace:
+            fresh.faq_data = imported
+        else:
+            fresh.faq_data = [updates.get(faq["id"], faq) for faq in self.faq_data] + \
+                [faq for faq in imported if faq["id"] not in existing]
+        fresh._build_id_map()
+        fresh._build_search_index()
+        self.__dict__.update(vars(fresh))
+        self._save_faq()
+        
+        stats = {"added": len(imported) - len(updates), "updated": len(updates), "total": len(self.faq_data)}
+        logger.info(f"Импорт FAQ: добавлено {stats['added']}, обновлено {stats['updated']}, всего {stats['total']}")
+        return stats
+    
+    def _validate_record(self, record: Any) -> Optional[str]:
+        """
+        Проверка импортируемой FAQ записи
+        
+        Returns:
+            Описание ошибки или None, если запись корректна
+        """
+        if not isinstance(record, dict):
+            return "ожидается объект"
+        for field in ("question", "answer"):
+            if not isinstance(record.get(field), str) or not record[field].strip():
+                return f"поле {field} должно быть непустой строкой"
+        if "id" in record and (type(record["id"]) is not int or not 0 < record["id"] <= MAX_ID):
+            return f"ID должен быть целым числом от 1 до {MAX_ID}"
+        keywords = record.get("keywords", [])
+        if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+            return "keywords должно быть списком строк"
+        if "category" in record and (not isinstance(record["category"], str) or not record["category"].strip()):
+            return "category должно быть непустой строкой"
+        return None
+    
+    def export_faq(self, stream: TextIO, format: str = "jsonl") -> int:
+        """
+        Потоковый экспорт FAQ
+        
+        Args:
+            stream: Текстовый поток
+            format: "jsonl" или "markdown" (макет data/faq_combined.md)
+            
+        Returns:
+            Количество выгруженных записей
+        """
+        return exchange.write_records(self.get_all_faq(), stream, format)
+    
+    def _save_faq(self):
+        """Отложенное сохранение FAQ в файл (изменения записываются в фоне одной записью)"""
+        self._writer.schedule(self.get_all_faq())
+    
+    def _on_faq_saved(self, content: bytes):
+        """Запоминание хэша записанного файла: собственная запись не вызывает горячую перезагрузку"""
+        self._source_key = compiled_index.content_hash(content, *self._index_params())
+    
+    def flush(self) -> bool:
+        """
+        Немедленная запись несохраненных изменений FAQ
+        
+        Returns:
+            True если файл актуален
+        """
+        return self._writer.flush()
+    
+    def close(self):
+        """Запись несохраненных изменений и остановка пула поиска"""
+        self.flush()
+        if self._search_pool is not None:
+            self._search_pool.shutdown(wait=False, cancel_futures=True)
+            self._search_pool = None
     
     def get_statistics(self) -> Dict:
         """Получение статистики FAQ"""
@@ -379,5 +932,10 @@ class EnhancedFAQManager:
             "total_faq": total_faq,
             "total_keywords": total_keywords,
             "average_keywords_per_faq": round(avg_keywords, 2),
-            "search_index_size": len(self.search_index)
+            "total_categories": len(self._category_members),
+            "search_backend": self.backend_name,
+            **self.backend.statistics(),
+            "cache_hits": self.query_cache.hits,
+            "cache_misses": self.query_cache.misses,
+            "last_reload": self.last_reload
         }
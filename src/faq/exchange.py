@@ -0,0 +1,168 @@
+"""
+FAQ exchange module for OptFM AI Bot
+Потоковое чтение и запись FAQ в форматах JSON Lines и Markdown (макет data/faq_combined.md)
+"""
+import json
+import re
+from typing import Dict, Iterable, Iterator, TextIO
+
+FORMATS = ("jsonl", "markdown")
+
+_ID_PATTERN = re.compile(r"^\*\*ID:\*\*\s*(\d+)")
+_KEYWORDS_PATTERN = re.compile(r"^\*\*Ключевые слова:\*\*\s*(.*)$")
+_ANSWER_MARKER = "**Ответ:**"
+# Раздел "## 🚚 4. Доставка и самовывоз": эмодзи и номер не входят в название категории
+_SECTION_PATTERN = re.compile(r"^##\s+(?:[^\w\s]+\s*)?(?:\d+\.\s*)?(.*)$")
+# Раздел для записей без категории (нужен, чтобы они не попали в предыдущий раздел)
+UNCATEGORIZED = "Без категории"
+
+
+def read_jsonl(stream: TextIO) -> Iterator[Dict]:
+    """
+    Чтение FAQ записей из JSON Lines (одна запись на строку)
+
+    Args:
+        stream: Текстовый поток
+
+    Yields:
+        FAQ записи
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Строка {line_number}: неверный JSON ({e})") from e
+
+
+def write_jsonl(records: Iterable[Dict], stream: TextIO) -> int:
+    """
+    Запись FAQ записей в JSON Lines
+
+    Args:
+        records: FAQ записи
+        stream: Текстовый поток
+
+    Returns:
+        Количество записанных записей
+    """
+    count = 0
+    for faq in records:
+        stream.write(json.dumps(faq, ensure_ascii=False))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def read_markdown(stream: TextIO) -> Iterator[Dict]:
+    """
+    Чтение FAQ записей из Markdown в макете faq_combined.md
+
+    Запись - заголовок "### Вопрос", строки "**ID:**" и "**Ключевые слова:**"
+    и текст после "**Ответ:**" до разделителя "---" или следующего заголовка.
+    Категория записи - название раздела "## ", в котором она находится.
+    Заголовки без ответа (сценарии, статистика) пропускаются, текст ответа
+    сохраняется как есть (вместе с разметкой).
+
+    Args:
+        stream: Текстовый поток
+
+    Yields:
+        FAQ записи (без "id", если в записи нет строки "**ID:**")
+    """
+    faq = None
+    answer_lines = None
+    category = None
+
+    def finish():
+        if faq is not None and answer_lines is not None:
+            faq["answer"] = "\n".join(answer_lines).strip()
+            return faq
+        return None
+
+    for line in stream:
+        line = line.rstrip("\n").rstrip()
+        if line.startswith("#") or line == "---":
+            record = finish()
+            if record:
+                yield record
+            faq, answer_lines = None, None
+            section_match = _SECTION_PATTERN.match(line)
+            if section_match:
+                category = section_match.group(1).strip()
+                if category == UNCATEGORIZED:
+                    category = None
+            elif line.startswith("### "):
+                faq = {"question": line[4:].strip()}
+                if category:
+                    faq["category"] = category
+            continue
+
+        if faq is None:
+            continue
+        if answer_lines is not None:
+            answer_lines.append(line)
+            continue
+
+        id_match = _ID_PATTERN.match(line)
+        keywords_match = _KEYWORDS_PATTERN.match(line)
+        if id_match:
+            faq["id"] = int(id_match.group(1))
+        elif keywords_match:
+            faq["keywords"] = [kw.strip() for kw in keywords_match.group(1).split(",") if kw.strip()]
+        elif line.startswith(_ANSWER_MARKER):
+            answer_lines = [line[len(_ANSWER_MARKER):].strip()]
+
+    record = finish()
+    if record:
+        yield record
+
+
+def write_markdown(records: Iterable[Dict], stream: TextIO) -> int:
+    """
+    Запись FAQ записей в Markdown в макете faq_combined.md
+
+    Записи выводятся в исходном порядке, раздел "## Категория" начинается
+    при каждой смене категории.
+
+    Args:
+        records: FAQ записи
+        stream: Текстовый поток
+
+    Returns:
+        Количество записанных записей
+    """
+    stream.write("# 📖 База FAQ для OptFM AI Bot\n\n---\n")
+    count = 0
+    section = None
+    for faq in records:
+        category = faq.get("category") or UNCATEGORIZED
+        if category != section and (section is not None or category != UNCATEGORIZED):
+            stream.write(f"\n## {category}\n\n---\n")
+        section = category
+        stream.write(f"\n### {faq['question']}\n")
+        stream.write(f"**ID:** {faq['id']}  \n")
+        stream.write(f"**Ключевые слова:** {', '.join(faq.get('keywords', []))}\n\n")
+        stream.write(f"{_ANSWER_MARKER}\n{faq['answer']}\n\n---\n")
+        count += 1
+    return count
+
+
+def read_records(stream: TextIO, format: str) -> Iterator[Dict]:
+    """Чтение FAQ записей в формате "jsonl" или "markdown\""""
+    if format == "jsonl":
+        return read_jsonl(stream)
+    if format == "markdown":
+        return read_markdown(stream)
+    raise ValueError(f"Неизвестный формат FAQ: {format}")
+
+
+def write_records(records: Iterable[Dict], stream: TextIO, format: str) -> int:
+    """Запись FAQ записей в формате "jsonl" или "markdown\""""
+    if format == "jsonl":
+        return write_jsonl(records, stream)
+    if format == "markdown":
+        return write_markdown(records, stream)
+    raise ValueError(f"Неизвестный формат FAQ: {format}")
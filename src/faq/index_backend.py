@@ -0,0 +1,901 @@
+"""
+Inverted index search backend for OptFM AI Bot
+Поиск по FAQ по инвертированному индексу: точное совпадение, ключевые слова (BM25), сходство
+"""
+import copy
+import heapq
+import logging
+import math
+import re
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from . import semantic, tfidf
+from .bm25 import BM25Index
+from .confidence import calibrate
+from .intents import QUESTION_WORDS
+from .phrase_matcher import PhraseMatcher
+from .postings import TermIndex
+from .spelling import SymSpell
+from .tokenizer import normalize_phrase, normalize_tokens, normalize_query, tokenize, tokenize_query
+from .transliteration import LAYOUT_PUNCTUATION, layout_word, token_variants
+from .trigram import TrigramIndex
+
+logger = logging.getLogger(__name__)
+
+# Фрагмент запроса между пробелами (слово вместе со знаками препинания)
+_FRAGMENT_PATTERN = re.compile(r"\S+")
+
+
+def make_hit(faq: Dict, score: float, stage: str, matched_terms: List[str], confidence: float) -> Dict:
+    """
+    Результат поиска с объяснением совпадения
+
+    Args:
+        faq: FAQ запись
+        score: Скор совпадения в шкале этапа (BM25, сходство и т.п.)
+        stage: Этап поиска: "exact", "keyword" или "fuzzy"
+        matched_terms: Слова, объясняющие совпадение
+        confidence: Калиброванная уверенность от 0 до 1, общая для этапов и движков
+
+    Returns:
+        Словарь {"faq", "score", "confidence", "stage", "matched_terms", "corrections"}
+    """
+    return {
+        "faq": faq,
+        "score": round(score, 4),
+        "confidence": round(confidence, 4),
+        "stage": stage,
+        "matched_terms": matched_terms,
+        "corrections": {}
+    }
+
+
+def full_text(faq: Dict) -> str:
+    """Полный текст FAQ: вопрос, ключевые слова и ответ"""
+    return " ".join([faq["question"], *faq.get("keywords", []), faq["answer"]])
+
+
+class InvertedIndexBackend:
+    """
+    Движок поиска по инвертированному индексу
+
+    Этапы идут по приоритету: точное совпадение вопроса (одним str.find по
+    склеенным вопросам), ключевые слова (BM25 с ключевыми фразами, исправлением
+    опечаток, раскладки и транслитерации) и нечеткое сходство по триграммам.
+    Записи добавляются и удаляются инкрементально.
+
+    Термины и n-граммы документов хранятся целочисленными ID в массивах
+    array('I'), постинг-листы - отсортированными массивами; ключевые слова
+    записи - кортежем пар (слово в нижнем регистре, его триграммы), общих
+    для всех записей с этим словом.
+    """
+
+    # Разделитель вопросов в склеенной строке для поиска точного совпадения
+    _QUESTION_SEPARATOR = "\x00"
+
+    # Нечеткое сходство, соответствующее уверенности 0.5 (calibrate), и минимальное
+    # сходство результата и похожего вопроса. Коэффициент Дайса по триграммам почти
+    # не дает "шумового" сходства у несвязанных строк, поэтому пороги ниже, чем были у SequenceMatcher
+    SIMILARITY_THRESHOLD = 0.15
+    SUGGESTION_THRESHOLD = 0.05
+
+    # Уверенность этапа ключевых слов - доля веса (IDF) слов запроса, найденных
+    # в записи; слова короче KEYWORD_MIN_LENGTH не индексируются и не учитываются
+    KEYWORD_MIN_LENGTH = 3
+
+    # Служебные и вопросительные слова (QUESTION_WORDS классификатора намерений) не
+    # подтверждают ответ: их вес 0. В маленькой базе IDF не отличает их от значимых
+    # слов ("где" встречается в одном вопросе)
+    CONFIDENCE_STOP_WORDS = frozenset(QUESTION_WORDS) | frozenset((
+        "какое", "каких", "такое", "есть", "вас", "вам", "нас", "нам", "это", "или", "для", "при", "все",
+    ))
+
+    # Сумма весов слов запроса, достаточная для полной уверенности: запрос из
+    # одних частых слов получает уверенность пропорционально меньше
+    KEYWORD_MIN_WEIGHT = 1.5
+
+    # Порог сходства триграмм слова запроса и ключевого слова (опечатки)
+    KEYWORD_SIMILARITY_THRESHOLD = 0.6
+
+    # Через сколько инкрементальных изменений удалять опустевшие постинг-листы
+    COMPACTION_INTERVAL = 100
+
+    # Доступные движки поиска похожих вопросов
+    SIMILARITY_BACKENDS = ("trigram", "tfidf", "semantic")
+
+    # Исправляются только основы не короче SPELLING_MIN_LENGTH; основы короче
+    # SPELLING_LONG_WORD - не дальше чем на одну букву, иначе почти любое короткое
+    # слово "исправляется" в какое-нибудь слово словаря
+    SPELLING_MIN_LENGTH = 4
+    SPELLING_LONG_WORD = 7
+
+    # Слова короче VARIANT_MIN_LENGTH не исправляются; опечатки ищутся и в первых
+    # SPELLING_VARIANTS вариантах слова в другой раскладке или транслитерации
+    VARIANT_MIN_LENGTH = 3
+    SPELLING_VARIANTS = 3
+
+    # Структуры, которые сохраняются в скомпилированном индексе
+    _STATE_FIELDS = (
+        "_faq_by_id", "search_index", "ranker", "trigram_index", "_document_terms", "_question_grams",
+        "_keyword_grams", "_keyword_gram_pairs", "phrase_matcher", "_questions_text", "_question_offsets",
+        "_question_faqs", "_question_positions",
+    )
+
+    def __init__(self, ranker: Optional[BM25Index] = None, similarity_backend: str = "trigram",
+                 embedder=None, vector_cache_file: Optional[str] = None,
+                 ann_min_size: int = 10000, ann_n_probe: int = 8,
+                 spell_distance: int = 2, transliterate: bool = True, **options):
+        """
+        Инициализация пустого индекса
+
+        Args:
+            ranker: Движок ранжирования по ключевым словам (по умолчанию BM25Index);
+                используется копия, поэтому один объект может служить шаблоном.
+                Должен реализовывать методы build(documents), search(terms, k, doc_ids=None),
+                add_document(doc_id, terms), remove_document(doc_id, terms) и compact()
+            similarity_backend: Движок поиска похожих вопросов: "trigram" (по умолчанию),
+                "tfidf" (матрица TF-IDF) или "semantic" (векторный поиск); два последних требуют numpy
+            embedder: Эмбеддер для режима "semantic" (по умолчанию HashingEmbedder)
+            vector_cache_file: Путь к .npy кэшу векторов для режима "semantic" (None - без кэша)
+            ann_min_size: Размер базы, начиная с которого режим "semantic" использует
+                приближенный IVF-индекс вместо полного перебора
+            ann_n_probe: Количество просматриваемых кластеров IVF: больше - выше полнота, медленнее поиск
+            spell_distance: Максимальное расстояние исправления опечаток в словах
+                запроса перед поиском по ключевым словам (0 - без исправления)
+            transliterate: Искать слова запроса, набранные в другой раскладке
+                клавиатуры или латиницей ("ljcnfdrf", "dostavka" -> "доставка")
+            **options: Параметры других движков (не используются)
+        """
+        if similarity_backend not in self.SIMILARITY_BACKENDS:
+            raise ValueError(f"Неизвестный движок поиска похожих вопросов: {similarity_backend}")
+        optional_backends = {"tfidf": tfidf, "semantic": semantic}
+        if similarity_backend in optional_backends and not optional_backends[similarity_backend].is_available():
+            logger.warning("numpy не установлен, поиск похожих вопросов использует триграммы")
+            similarity_backend = "trigram"
+
+        self.ranker = copy.copy(ranker) if ranker is not None else BM25Index()
+        self.similarity_backend = similarity_backend
+        self.tfidf_matrix = None
+        self.semantic_index = None
+        if similarity_backend == "semantic":
+            self.semantic_index = semantic.SemanticIndex(
+                embedder, vector_cache_file, ann_min_size=ann_min_size, ann_n_probe=ann_n_probe
+            )
+        self.spell_distance = spell_distance
+        self.transliterate = transliterate
+        self._reset()
+
+    def _reset(self):
+        """Пустые структуры индекса"""
+        self._faq_by_id: Dict[int, Dict] = {}
+        self.search_index = TermIndex()
+        self.trigram_index = TrigramIndex()
+        self._document_terms: Dict[int, array] = {}
+        self._question_grams: Dict[int, array] = {}
+        self._keyword_grams: Dict[int, Tuple[Tuple[str, array], ...]] = {}
+        self._keyword_gram_pairs: Dict[str, Tuple[str, array]] = {}
+        self.speller = SymSpell(self.spell_distance)
+        self._pending_compaction = 0
+        self._questions_text, self._question_offsets, self._question_faqs = "", [], []
+        self._question_positions: Dict[int, int] = {}
+        self._reset_exact_overlay()
+        self.phrase_matcher = PhraseMatcher()
+        self._phrase_matcher_stale = False
+        self._vector_indexes_dirty = True
+
+    def build(self, faq_data: Iterable[Dict]):
+        """
+        Построение индекса с нуля
+
+        Args:
+            faq_data: FAQ записи в порядке базы
+        """
+        self._reset()
+
+        # Постинг-листы с частотами, длины документов и IDF для BM25
+        documents = []
+        for faq in faq_data:
+            self._faq_by_id[faq["id"]] = faq
+            documents.append((faq["id"], self._index_document(faq)))
+        self.ranker.build(documents)
+
+        self._build_exact_index()
+        self._build_phrase_matcher()
+        self._build_speller()
+        self._build_vector_indexes()
+
+    def get_state(self) -> Dict[str, Any]:
+        """Структуры индекса для скомпилированного снимка"""
+        # Правки поверх строки точного совпадения и автомата фраз в снимок не входят
+        if self._exact_index_stale:
+            self._build_exact_index()
+        if self._phrase_matcher_stale:
+            self._build_phrase_matcher()
+        return {field: getattr(self, field) for field in self._STATE_FIELDS}
+
+    def set_state(self, state: Dict[str, Any], faq_data: Iterable[Dict]) -> bool:
+        """
+        Восстановление индекса из скомпилированного снимка
+
+        Args:
+            state: Результат get_state
+            faq_data: FAQ записи (не используются: записи сохранены в снимке)
+
+        Returns:
+            True если снимок содержит все структуры индекса
+        """
+        missing = [field for field in self._STATE_FIELDS if field not in state]
+        if missing:
+            logger.warning(f"В скомпилированном индексе нет полей {missing}")
+            return False
+        for field in self._STATE_FIELDS:
+            setattr(self, field, state[field])
+        self._pending_compaction = 0
+        self._reset_exact_overlay()
+        self._phrase_matcher_stale = False
+        # Словарь опечаток строится здесь, а не при первом запросе: загрузка и перезагрузка
+        # выполняются вне цикла событий, а первый запрос - в нем (быстрый путь asearch)
+        self._build_speller()
+        # Матрица TF-IDF и векторы строятся при первом поиске похожих вопросов
+        self._vector_indexes_dirty = True
+        return True
+
+    def _index_document(self, faq: Dict) -> List[str]:
+        """
+        Добавление одной записи в словарный и триграммный индексы
+
+        Args:
+            faq: FAQ запись
+
+        Returns:
+            Термины документа для ранжирования
+        """
+        faq_id = faq["id"]
+        terms = self._get_document_terms(faq)
+
+        # Индексируем по нормализованным ключевым словам и словам вопроса
+        term_ids = self.search_index.encode(terms)
+        self._document_terms[faq_id] = term_ids
+        self.search_index.add(faq_id, term_ids)
+
+        # Триграммы вопросов и ключевых слов для нечеткого поиска
+        question_grams = self.trigram_index.encode(faq["question"].lower(), register=True)
+        self._question_grams[faq_id] = self.trigram_index.pack(question_grams)
+        self._keyword_grams[faq_id] = tuple(self._encode_keyword(keyword.lower())
+                                            for keyword in faq.get("keywords", []))
+        self.trigram_index.add(faq_id, self._get_document_grams(faq_id))
+        return terms
+
+    def _unindex_document(self, faq_id: int) -> List[str]:
+        """
+        Удаление одной записи из словарного и триграммного индексов
+
+        Args:
+            faq_id: ID FAQ
+
+        Returns:
+            Термины, с которыми документ был проиндексирован
+        """
+        term_ids = self._document_terms.pop(faq_id, ())
+        self.search_index.remove(faq_id, term_ids)
+
+        if faq_id in self._question_grams:
+            self.trigram_index.remove(faq_id, self._get_document_grams(faq_id))
+            del self._question_grams[faq_id]
+            del self._keyword_grams[faq_id]
+        return self.search_index.decode(term_ids)
+
+    def _encode_keyword(self, keyword_lower: str) -> Tuple[str, array]:
+        """
+        Ключевое слово и его триграммы, общие для всех записей с этим словом
+
+        Одинаковые ключевые слова у разных записей ссылаются на один объект:
+        это экономит память и размер скомпилированного индекса.
+        """
+        pair = self._keyword_gram_pairs.get(keyword_lower)
+        if pair is None:
+            pair = (keyword_lower, self.trigram_index.pack(self.trigram_index.encode(keyword_lower, register=True)))
+            self._keyword_gram_pairs[keyword_lower] = pair
+        return pair
+
+    def _get_document_grams(self, faq_id: int) -> FrozenSet[int]:
+        """Все триграммы записи: вопрос и ключевые слова"""
+        return frozenset(self._question_grams[faq_id]).union(*(grams for _, grams in self._keyword_grams[faq_id]))
+
+    def add(self, faq: Dict):
+        """
+        Инкрементальное добавление записи во все индексы
+
+        Запись с существующим ID заменяет прежнюю и сохраняет ее место в порядке базы.
+
+        Args:
+            faq: FAQ запись
+        """
+        faq_id = faq["id"]
+        replaced = faq_id in self._faq_by_id
+        if replaced:
+            self.ranker.remove_document(faq_id, self._unindex_document(faq_id))
+        self._faq_by_id[faq_id] = faq
+        terms = self._index_document(faq)
+        self.ranker.add_document(faq_id, terms)
+        self._add_exact_question(faq, replaced)
+        # Новые фразы записи добавляются в автомат без его перестройки
+        for term in terms:
+            if " " in term:
+                self.phrase_matcher.add(term.split(), term)
+        self._add_spelling_words(self.speller, faq)
+        self._on_index_changed()
+
+    def remove(self, faq_id: int):
+        """
+        Инкрементальное удаление записи из всех индексов
+
+        Args:
+            faq_id: ID FAQ
+        """
+        self._faq_by_id.pop(faq_id, None)
+        self.ranker.remove_document(faq_id, self._unindex_document(faq_id))
+        if faq_id in self._exact_overlay:
+            self._exact_overlay = {key: value for key, value in self._exact_overlay.items() if key != faq_id}
+        self._exact_index_stale = True
+        self._on_index_changed()
+
+    def _on_index_changed(self):
+        """
+        Учет инкрементального изменения индекса
+
+        Матрицы TF-IDF и векторы перестраиваются лениво при первом обращении.
+        Раз в COMPACTION_INTERVAL изменений удаляются опустевшие постинг-листы,
+        строка точного совпадения и автомат фраз перестраиваются с учетом
+        накопленных правок.
+        """
+        self._phrase_matcher_stale = True
+        self._vector_indexes_dirty = True
+
+        self._pending_compaction += 1
+        if self._pending_compaction >= self.COMPACTION_INTERVAL:
+            self._compact_index()
+
+    def _compact_index(self):
+        """Удаление опустевших постинг-листов из всех индексов"""
+        self.ranker.compact()
+        self.trigram_index.compact()
+        if self._exact_index_stale:
+            self._build_exact_index()
+        if self._phrase_matcher_stale:
+            self._build_phrase_matcher()
+        self._pending_compaction = 0
+        logger.debug(f"Индекс FAQ уплотнен: {len(self.search_index)} терминов")
+
+    def _build_exact_index(self):
+        """Все вопросы в одной строке: точное совпадение ищется одним вызовом str.find"""
+        faqs = list(self._faq_by_id.values())
+        questions = [faq["question"].lower() for faq in faqs]
+        offsets = []
+        offset = 0
+        for question in questions:
+            offsets.append(offset)
+            offset += len(question) + len(self._QUESTION_SEPARATOR)
+        # Строка, смещения и записи заменяются вместе: поиск из пула потоков не видит их частично
+        self._questions_text, self._question_offsets, self._question_faqs = \
+            self._QUESTION_SEPARATOR.join(questions), offsets, faqs
+        self._question_positions = {faq["id"]: position for position, faq in enumerate(faqs)}
+        self._reset_exact_overlay()
+
+    def _reset_exact_overlay(self):
+        """Строка точного совпадения соответствует записям индекса, правок поверх нее нет"""
+        # ID записи -> (порядок в базе, вопрос в нижнем регистре, запись) для добавленных
+        # и измененных после построения строки записей; словарь заменяется целиком
+        self._exact_overlay: Dict[int, Tuple[int, str, Dict]] = {}
+        self._next_exact_order = len(self._question_faqs)
+        # В строке есть удаленные или замененные записи
+        self._exact_index_stale = False
+
+    def _add_exact_question(self, faq: Dict, replaced: bool):
+        """
+        Учет добавленной или измененной записи без перестройки строки вопросов
+
+        Args:
+            faq: FAQ запись
+            replaced: Запись заменила прежнюю с тем же ID (место в порядке базы сохраняется)
+        """
+        faq_id = faq["id"]
+        if faq_id in self._exact_overlay and replaced:
+            order = self._exact_overlay[faq_id][0]
+        elif faq_id in self._question_positions and replaced:
+            order = self._question_positions[faq_id]
+        else:
+            order = self._next_exact_order
+            self._next_exact_order += 1
+        self._exact_overlay = {**self._exact_overlay, faq_id: (order, faq["question"].lower(), faq)}
+        self._exact_index_stale = True
+
+    def _build_phrase_matcher(self):
+        """Автомат Ахо-Корасик по всем многословным ключевым фразам индекса"""
+        self.phrase_matcher = PhraseMatcher()
+        self.phrase_matcher.build(
+            (term.split(), term) for term, _ in self.search_index.items() if " " in term
+        )
+        self._phrase_matcher_stale = False
+
+    def _match_phrases(self, query_terms: List[str]) -> List[Tuple[int, int, str]]:
+        """
+        Многословные ключевые фразы, входящие в запрос
+
+        Args:
+            query_terms: Нормализованные слова запроса
+
+        Returns:
+            Список (начало, конец, фраза) - границы в словах запроса
+        """
+        # Фразы удаленных записей остаются в автомате до уплотнения и отбрасываются здесь
+        search_index = self.search_index
+        return [match for match in self.phrase_matcher.find(query_terms) if search_index.get(match[2])]
+
+    def phrase_matches(self, query: str) -> Dict[str, List[int]]:
+        """
+        Ключевые фразы FAQ, найденные в запросе, и ID содержащих их FAQ
+
+        Args:
+            query: Текст запроса
+
+        Returns:
+            Словарь {фраза запроса: список ID FAQ}
+        """
+        query_words = tokenize(query)
+        return {
+            " ".join(query_words[start:end]): list(self.search_index.get(phrase))
+            for start, end, phrase in self._match_phrases(normalize_tokens(query_words))
+        }
+
+    def _build_speller(self):
+        """Словарь исправления опечаток (строится вместе с индексом)"""
+        speller = SymSpell(self.spell_distance)
+        for faq in self._faq_by_id.values():
+            self._add_spelling_words(speller, faq)
+        self.speller = speller
+
+    def _add_spelling_words(self, speller: SymSpell, faq: Dict):
+        """Основы слов ключевых слов и вопроса записи (с исходной формой слова для отчета)"""
+        words = [word for keyword in faq.get("keywords", []) for word in tokenize(keyword)]
+        words.extend(tokenize(faq["question"]))
+        for word, term in zip(words, normalize_tokens(words)):
+            if len(term) >= self.SPELLING_MIN_LENGTH and word.isalpha() and self.search_index.get(term):
+                speller.add(term, word)
+
+    def _correct_terms(self, query_words: List[str], query_terms: List[str]) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Исправление слов запроса, которых нет в индексе: раскладка, транслитерация, опечатки
+
+        Args:
+            query_words: Слова запроса
+            query_terms: Нормализованные слова запроса
+
+        Returns:
+            Пара (исправленные нормализованные слова, {слово запроса: исправление})
+        """
+        corrected = list(query_terms)
+        corrections = {}
+        for position, (word, term) in enumerate(zip(query_words, query_terms)):
+            if len(word) < self.VARIANT_MIN_LENGTH or not word.isalpha() or self.search_index.get(term):
+                continue
+            match = self._correct_term(word, term)
+            if match:
+                corrected[position], corrections[word] = match
+
+        if corrections:
+            logger.info(f"Исправлены слова запроса: {corrections}")
+        return corrected, corrections
+
+    def _correct_term(self, word: str, term: str) -> Optional[Tuple[str, str]]:
+        """
+        Исправление одного слова запроса
+
+        Сначала по индексу проверяются варианты слова в другой раскладке и
+        в транслитерации (варианты слова кэшируются), затем ищется ближайшее
+        слово словаря опечаток - для самого слова и его первых вариантов.
+
+        Args:
+            word: Слово запроса
+            term: Нормализованное слово запроса
+
+        Returns:
+            Пара (термин индекса, форма для отчета) или None
+        """
+        variants = token_variants(word) if self.transliterate else ()
+        variant_terms = normalize_tokens(variants)
+        for variant, variant_term in zip(variants, variant_terms):
+            if self.search_index.get(variant_term):
+                # В отчете - форма слова из базы ("garantia" -> "гарантия", а не "гарантя")
+                return variant_term, self.speller.words.get(variant_term, variant)
+
+        if self.spell_distance <= 0:
+            return None
+        best = None
+        for candidate in (term, *variant_terms[:self.SPELLING_VARIANTS]):
+            if len(candidate) < self.SPELLING_MIN_LENGTH:
+                continue
+            distance = 1 if len(candidate) < self.SPELLING_LONG_WORD else self.spell_distance
+            # Среди равноудаленных слов выбирается встречающееся в большем числе FAQ
+            match = self.speller.lookup(
+                candidate, distance, weight=lambda known: len(self.search_index.get(known))
+            )
+            if match and (best is None or match[1] < best[1]):
+                best = match
+        if best is None:
+            return None
+        return best[0], self.speller.words[best[0]]
+
+    def _build_vector_indexes(self):
+        """Построение матрицы TF-IDF или векторного индекса (если выбраны)"""
+        # Матрица TF-IDF по вопросам, ключевым словам и ответам
+        if self.similarity_backend == "tfidf":
+            self.tfidf_matrix = tfidf.TfidfMatrix()
+            self.tfidf_matrix.build(
+                (faq["id"], normalize_tokens(tokenize(full_text(faq)))) for faq in self._faq_by_id.values()
+            )
+
+        # Векторы вопросов и ключевых слов (неизмененные записи берутся из кэша)
+        if self.semantic_index is not None:
+            self.semantic_index.build([
+                (faq["id"], " ".join([faq["question"], *faq.get("keywords", [])]))
+                for faq in self._faq_by_id.values()
+            ])
+        self._vector_indexes_dirty = False
+
+    def _get_document_terms(self, faq: Dict) -> List[str]:
+        """
+        Термины документа для ранжирования: основы ключевых слов и слов вопроса
+
+        Args:
+            faq: FAQ запись
+
+        Returns:
+            Список терминов (с повторами, для подсчета частот)
+        """
+        terms = [normalize_phrase(keyword) for keyword in faq.get("keywords", [])]
+        # Короткие слова вопроса игнорируем
+        terms.extend(normalize_tokens(word for word in tokenize(faq["question"]) if len(word) > 2))
+        return terms
+
+    def term_ids(self, term: str) -> Set[int]:
+        """
+        ID FAQ с нормализованным термином (ключевой фразой или словом вопроса)
+
+        Args:
+            term: Нормализованный термин (normalize_phrase)
+
+        Returns:
+            Множество ID FAQ
+        """
+        return set(self.search_index.get(term))
+
+    def search(self, query: str, k: int, doc_ids: Optional[Set[int]] = None, fuzzy: bool = True) -> List[Dict]:
+        """
+        Последовательные этапы поиска: точное совпадение, ключевые слова, сходство
+
+        Каждый следующий этап дополняет список до k результатов.
+
+        Args:
+            query: Поисковый запрос, нормализованный normalize_query
+            k: Максимальное количество результатов
+            doc_ids: Искать только среди этих FAQ (None - по всей базе)
+            fuzzy: Выполнять этап нечеткого поиска
+
+        Returns:
+            Список результатов поиска (make_hit)
+        """
+        # Слова в другой раскладке с клавишами знаков препинания ("j,hfnyj")
+        # исправляются до разбиения на слова, иначе tokenize их разрежет
+        query_lower = query
+        layout_fixes = {}
+        if self.transliterate and not LAYOUT_PUNCTUATION.isdisjoint(query):
+            query_lower, layout_fixes = self._fix_layout(query)
+        query_words = tokenize_query(query_lower)
+        query_terms = normalize_tokens(query_words)
+
+        logger.info(f"Поиск FAQ для запроса: '{query}' (слова: {query_words})")
+        hits = []
+        seen = set()
+
+        # 1. Поиск по точному совпадению вопроса (целыми словами). Полная уверенность -
+        # у запроса, совпавшего со всем вопросом, у части вопроса она зависит от веса слов
+        exact_match, whole_question = self._find_exact_match(query_lower, doc_ids)
+        if exact_match:
+            logger.info(f"Найдено точное совпадение: {exact_match['id']}")
+            confidence = 1.0 if whole_question else self._weight_factor(self._query_weights(query_words, query_terms))
+            hit = make_hit(exact_match, 1.0, "exact", query_words, confidence)
+            hit["corrections"] = {layout_fixes[word]: word for word in query_words if word in layout_fixes}
+            hits.append(hit)
+            seen.add(exact_match["id"])
+
+        # 2. Поиск по индексу ключевых слов (top-k по BM25 через кучу).
+        # Многословные ключевые фразы находятся автоматом Ахо-Корасик за один
+        # проход по запросу и добавляются к словам как отдельные термины
+        if len(hits) < k and query_terms:
+            # Опечатки исправляются по словарю удалений до поиска по индексу
+            corrected_terms, corrections = self._correct_terms(query_words, query_terms)
+            term_words = dict(zip(corrected_terms, query_words))
+            phrases = self._match_phrases(corrected_terms)
+            for start, end, phrase in phrases:
+                term_words[phrase] = " ".join(query_words[start:end])
+            if doc_ids is None:
+                ranked = self.ranker.search(list(term_words), k=k + len(seen))
+            else:
+                ranked = self.ranker.search(list(term_words), k=k + len(seen), doc_ids=doc_ids)
+            weights = self._query_weights(query_words, corrected_terms)
+            for faq_id, score in ranked:
+                if len(hits) >= k:
+                    break
+                if faq_id in seen:
+                    continue
+                document_terms = set(self.search_index.decode(self._document_terms.get(faq_id, ())))
+                matched = [word for term, word in term_words.items() if term in document_terms]
+                confidence = self._keyword_confidence(weights, corrected_terms, phrases, document_terms)
+                hit = make_hit(self._faq_by_id[faq_id], score, "keyword", matched, confidence)
+                hit["corrections"] = {layout_fixes[word]: word for word in matched if word in layout_fixes}
+                hit["corrections"].update((word, corrections[word]) for word in matched if word in corrections)
+                hits.append(hit)
+                seen.add(faq_id)
+            if hits and not exact_match:
+                logger.info(f"Найдено совпадение по ключевым словам: {hits[0]['faq']['id']}")
+
+        # 3. Поиск по сходству (fuzzy search)
+        if fuzzy and len(hits) < k:
+            word_grams = [(word, self.trigram_index.encode(word)) for word in query_words]
+            scores = self._similarity_scores(query_lower, query_words, doc_ids)
+            top = heapq.nlargest(k + len(seen), scores.items(), key=lambda item: item[1])
+            for faq_id, score in top:
+                if len(hits) >= k or score <= self.SUGGESTION_THRESHOLD:
+                    break
+                if faq_id in seen:
+                    continue
+                matched = self._matched_keywords(word_grams, self._keyword_grams[faq_id])
+                hits.append(make_hit(self._faq_by_id[faq_id], score, "fuzzy", matched,
+                                     calibrate(score, self.SIMILARITY_THRESHOLD)))
+                seen.add(faq_id)
+
+        if not hits and fuzzy:
+            logger.info("Совпадений не найдено")
+        elif hits and hits[0]["stage"] == "fuzzy":
+            logger.info(f"Найдено совпадение по сходству: {hits[0]['faq']['id']} (скор {hits[0]['score']:.3f})")
+        return hits
+
+    def _fix_layout(self, query_lower: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Замена фрагментов запроса, набранных в английской раскладке вместе с
+        клавишами знаков препинания, на слова индекса ("j,hf,jnre" -> "обработку")
+
+        Args:
+            query_lower: Запрос в нижнем регистре
+
+        Returns:
+            Пара (запрос с исправленными фрагментами, {исправленное слово: фрагмент запроса})
+        """
+        fixes = {}
+
+        def fix(match) -> str:
+            fragment = match.group()
+            # Точка или запятая в конце - скорее знак препинания, чем "ю" или "б"
+            for candidate in dict.fromkeys((fragment, fragment.rstrip(".,"))):
+                word = layout_word(candidate)
+                if word and self.search_index.get(normalize_tokens([word])[0]):
+                    fixes[word] = candidate
+                    return word + fragment[len(candidate):]
+            return fragment
+
+        return _FRAGMENT_PATTERN.sub(fix, query_lower), fixes
+
+    def _query_weights(self, query_words: List[str], query_terms: List[str]) -> List[float]:
+        """
+        Вес (IDF) каждого слова запроса для оценки уверенности
+
+        Частые слова весят мало, служебные (CONFIDENCE_STOP_WORDS) не весят
+        ничего, слова, которых нет в базе, - как самые редкие: запрос из
+        посторонних слов получает низкую уверенность.
+
+        Args:
+            query_words: Слова запроса
+            query_terms: Нормализованные (исправленные) слова запроса
+
+        Returns:
+            Веса по позициям слов запроса (0 - слово не учитывается)
+        """
+        total_docs = len(self._faq_by_id)
+        weights = []
+        for word, term in zip(query_words, query_terms):
+            if len(word) < self.KEYWORD_MIN_LENGTH or word in self.CONFIDENCE_STOP_WORDS:
+                weights.append(0.0)
+                continue
+            doc_freq = len(self.search_index.get(term))
+            weights.append(math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5)))
+        return weights
+
+    def _keyword_confidence(self, weights: List[float], query_terms: List[str],
+                            phrases: List[Tuple[int, int, str]], document_terms: Set[str]) -> float:
+        """
+        Доля веса слов запроса, найденных в записи (словом или ключевой фразой)
+
+        Доля умножается на _weight_factor: запрос из одних частых слов не дает
+        полной уверенности, даже если все его слова есть в записи.
+
+        Args:
+            weights: Веса слов запроса (_query_weights)
+            query_terms: Нормализованные слова запроса
+            phrases: Ключевые фразы запроса (начало, конец, фраза)
+            document_terms: Термины записи
+
+        Returns:
+            Уверенность от 0 до 1
+        """
+        total = sum(weights)
+        if not total:
+            return 0.0
+        covered = [term in document_terms for term in query_terms]
+        for start, end, phrase in phrases:
+            if phrase in document_terms:
+                covered[start:end] = [True] * (end - start)
+        coverage = sum(weight for weight, found in zip(weights, covered) if found) / total
+        return coverage * self._weight_factor(weights)
+
+    def _weight_factor(self, weights: List[float]) -> float:
+        """Множитель уверенности по сумме весов слов запроса (1 - не меньше KEYWORD_MIN_WEIGHT)"""
+        return min(1.0, sum(weights) / self.KEYWORD_MIN_WEIGHT)
+
+    def _find_exact_match(self, query: str, doc_ids: Optional[Set[int]] = None) -> Tuple[Optional[Dict], bool]:
+        """
+        Поиск точного совпадения целыми словами (первого среди doc_ids, если они заданы)
+
+        Returns:
+            Запись (None - совпадения нет) и совпал ли запрос со всем вопросом
+            (без учета знаков препинания в конце)
+        """
+        if not query or self._QUESTION_SEPARATOR in query:
+            return None, False
+
+        questions_text, offsets, faqs = self._questions_text, self._question_offsets, self._question_faqs
+        overlay = self._exact_overlay
+        found = None
+        position = self._find_words(questions_text, query)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            faq = faqs[index]
+            # Удаленные и измененные после построения строки записи пропускаются
+            if faq["id"] in self._faq_by_id and faq["id"] not in overlay and \
+                    (doc_ids is None or faq["id"] in doc_ids):
+                next_offset = offsets[index + 1] if index + 1 < len(offsets) else len(questions_text) + 1
+                found = (index, faq, questions_text[offsets[index]:next_offset - len(self._QUESTION_SEPARATOR)])
+                break
+            position = self._find_words(questions_text, query, position + 1)
+
+        # Правки поверх строки: побеждает запись, которая раньше в порядке базы
+        for faq_id, (order, question, faq) in overlay.items():
+            if (found is None or order < found[0]) and (doc_ids is None or faq_id in doc_ids) and \
+                    self._find_words(question, query) != -1:
+                found = (order, faq, question)
+
+        if found is None:
+            return None, False
+        _, faq, question = found
+        return faq, question.rstrip("?!. ") == query.rstrip("?!. ")
+
+    @staticmethod
+    def _find_words(text: str, query: str, start: int = 0) -> int:
+        """Позиция первого вхождения query в text целыми словами ("а" в "такое" не находится) или -1"""
+        position = text.find(query, start)
+        while position != -1:
+            end = position + len(query)
+            if not (position and text[position - 1].isalnum() and query[0].isalnum()) and \
+                    not (end < len(text) and text[end].isalnum() and query[-1].isalnum()):
+                return position
+            position = text.find(query, position + 1)
+        return -1
+
+    def _similarity_scores(self, query: str, query_words: List[str],
+                           doc_ids: Optional[Set[int]] = None) -> Dict[int, float]:
+        """
+        Нечеткое сходство запроса с FAQ по триграммам
+
+        Оцениваются только FAQ, имеющие с запросом общие триграммы
+        в вопросе или ключевых словах (или FAQ из doc_ids, если они заданы).
+
+        Args:
+            query: Запрос в нижнем регистре
+            query_words: Слова запроса
+            doc_ids: Оценивать только эти FAQ
+
+        Returns:
+            Словарь {ID FAQ: скор сходства}
+        """
+        query_grams = self.trigram_index.encode(query)
+        word_grams = [(word, self.trigram_index.encode(word)) for word in query_words]
+
+        scores = {}
+        candidates = self.trigram_index.candidates(query_grams) if doc_ids is None else doc_ids
+        for faq_id in candidates:
+            # Сравниваем с вопросом
+            question_score = TrigramIndex.dice(query_grams, self._question_grams[faq_id])
+
+            # Сравниваем с ключевыми словами
+            keyword_score = self._calculate_keyword_similarity(word_grams, self._keyword_grams[faq_id])
+
+            # Общий скор
+            scores[faq_id] = (question_score * 0.6) + (keyword_score * 0.4)
+
+        return scores
+
+    def _calculate_keyword_similarity(self, word_grams: List[Tuple[str, FrozenSet[int]]],
+                                      keyword_grams: Tuple[Tuple[str, array], ...]) -> float:
+        """
+        Вычисление сходства по ключевым словам
+
+        Args:
+            word_grams: Слова запроса и их триграммы
+            keyword_grams: Ключевые слова FAQ в нижнем регистре и их триграммы
+
+        Returns:
+            Доля ключевых слов, совпавших хотя бы с одним словом запроса
+        """
+        if not keyword_grams or not word_grams:
+            return 0.0
+
+        return len(self._matched_keywords(word_grams, keyword_grams)) / len(keyword_grams)
+
+    def _matched_keywords(self, word_grams: List[Tuple[str, FrozenSet[int]]],
+                          keyword_grams: Tuple[Tuple[str, array], ...]) -> List[str]:
+        """
+        Ключевые слова FAQ, совпавшие хотя бы с одним словом запроса
+
+        Args:
+            word_grams: Слова запроса и их триграммы
+            keyword_grams: Ключевые слова FAQ в нижнем регистре и их триграммы
+
+        Returns:
+            Список совпавших ключевых слов
+        """
+        matched = []
+
+        for keyword_lower, keyword_set in keyword_grams:
+            for word, word_set in word_grams:
+                # Проверяем различные варианты совпадений
+                if (keyword_lower in word or
+                    word in keyword_lower or
+                    TrigramIndex.dice(word_set, keyword_set) > self.KEYWORD_SIMILARITY_THRESHOLD):
+                    matched.append(keyword_lower)
+                    break
+
+        return matched
+
+    def similar(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Похожие вопросы выбранным движком сходства
+
+        Args:
+            query: Поисковый запрос
+            limit: Максимальное количество результатов
+
+        Returns:
+            Пары (ID FAQ, скор) выше SUGGESTION_THRESHOLD по убыванию скора
+        """
+        query_lower = normalize_query(query)
+
+        if self._vector_indexes_dirty:
+            self._build_vector_indexes()
+
+        if self.tfidf_matrix is not None:
+            # Одно умножение разреженной матрицы на вектор запроса
+            top = self.tfidf_matrix.search(normalize_tokens(tokenize_query(query_lower)), k=limit)
+        elif self.semantic_index is not None:
+            top = self.semantic_index.search(query_lower, k=limit)
+        else:
+            scores = self._similarity_scores(query_lower, tokenize_query(query_lower))
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+        # Топ результатов выше минимального порога
+        return [(faq_id, score) for faq_id, score in top if score > self.SUGGESTION_THRESHOLD]
+
+    def statistics(self) -> Dict[str, Any]:
+        """Размер индекса"""
+        return {"search_index_size": len(self.search_index)}
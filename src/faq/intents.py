@@ -0,0 +1,87 @@
+"""
+Intent classifier module for OptFM AI Bot
+Намерение сообщения (приветствие, прощание, вопрос) за один проход по словам
+"""
+from typing import List, NamedTuple, Sequence, Tuple
+
+from .phrase_matcher import PhraseMatcher
+from .tokenizer import normalize_query, tokenize, tokenize_query
+
+# Намерения сообщения
+GREETING = "greeting"
+FAREWELL = "farewell"
+UNCLEAR = "unclear"
+FAQ = "faq"
+
+# Словари намерений: слова и фразы сравниваются целыми словами
+GREETINGS = ("привет", "здравствуйте", "добрый день", "добрый вечер", "доброе утро", "hi", "hello")
+FAREWELLS = ("пока", "до свидания", "до встречи", "спасибо", "благодарю", "bye", "goodbye")
+QUESTION_WORDS = ("что", "как", "где", "когда", "почему", "зачем", "какой", "какая", "какие", "сколько")
+
+# Сообщение короче стольких слов без признаков вопроса считается непонятным
+MIN_STATEMENT_WORDS = 3
+
+# Порядок проверки намерений: приветствие важнее прощания
+_PRIORITY = (GREETING, FAREWELL)
+
+
+class MessageIntent(NamedTuple):
+    """Результат классификации сообщения"""
+    intent: str
+    is_question: bool
+    # Сообщение без крайних пробелов в нижнем регистре и его слова (normalize_query, tokenize_query)
+    text: str
+    words: List[str]
+
+
+class IntentClassifier:
+    """
+    Классификатор намерений сообщения
+
+    Все словари собираются в один автомат Ахо-Корасик над словами при
+    создании классификатора; сообщение нормализуется один раз и разбивается
+    на слова тем же tokenize_query, что и запрос поиска по FAQ (разбор
+    кэшируется), и сканируется один раз. Совпадения
+    только целыми словами: "как" не находится в "какао".
+    """
+
+    def __init__(self, greetings: Sequence[str] = GREETINGS, farewells: Sequence[str] = FAREWELLS,
+                 question_words: Sequence[str] = QUESTION_WORDS):
+        """
+        Компиляция словарей
+
+        Args:
+            greetings: Приветствия
+            farewells: Прощания
+            question_words: Вопросительные слова
+        """
+        lexicons: Tuple[Tuple[str, Sequence[str]], ...] = (
+            (GREETING, greetings), (FAREWELL, farewells), (FAQ, question_words)
+        )
+        self.matcher = PhraseMatcher()
+        self.matcher.build(
+            (tokenize(phrase), intent) for intent, phrases in lexicons for phrase in phrases
+        )
+
+    def classify(self, message: str) -> MessageIntent:
+        """
+        Намерение сообщения
+
+        Args:
+            message: Текст сообщения пользователя
+
+        Returns:
+            MessageIntent: GREETING, FAREWELL, UNCLEAR (короткое сообщение без
+            вопроса) или FAQ (поиск ответа в базе)
+        """
+        text = normalize_query(message)
+        words = tokenize_query(text)
+        found = {intent for _, _, intent in self.matcher.find(words)}
+        is_question = FAQ in found or "?" in text
+
+        for intent in _PRIORITY:
+            if intent in found:
+                return MessageIntent(intent, is_question, text, words)
+        if not is_question and len(words) < MIN_STATEMENT_WORDS:
+            return MessageIntent(UNCLEAR, is_question, text, words)
+        return MessageIntent(FAQ, is_question, text, words)
@@ -0,0 +1,156 @@
+"""
+FAQ persistence module for OptFM AI Bot
+Отложенная атомарная запись базы FAQ: изменения копятся и сохраняются одной записью
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import weakref
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Задержка повторной записи после ошибки, если отложенная запись отключена (delay=0)
+RETRY_DELAY = 5.0
+
+# Активные записи: несохраненные изменения записываются при завершении процесса
+_writers: "weakref.WeakSet[FAQWriter]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    """Запись несохраненных изменений всех FAQWriter при выходе"""
+    for writer in list(_writers):
+        writer.flush()
+
+
+def atomic_write(path: Path, content: bytes):
+    """
+    Запись файла через временный файл, fsync и переименование
+
+    При сбое на диске остается либо прежняя, либо новая версия файла целиком.
+
+    Args:
+        path: Путь к файлу
+        content: Содержимое
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Переименование становится надежным после fsync каталога (в Windows недоступно)
+    try:
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError as e:
+        logger.warning(f"Не удалось выполнить fsync каталога {path.parent}: {e}")
+    finally:
+        os.close(dir_fd)
+
+
+class FAQWriter:
+    """
+    Отложенная запись FAQ в JSON файл
+
+    Изменение помечает базу как "грязную" и запоминает ее снимок; запись
+    выполняется в фоновом потоке через delay секунд после первого изменения,
+    поэтому серия правок дает одну запись файла.
+    """
+
+    def __init__(self, path: Path, delay: float = 1.0, compact: bool = False,
+                 on_saved: Optional[Callable[[bytes], None]] = None):
+        """
+        Инициализация записи
+
+        Args:
+            path: Путь к JSON файлу FAQ
+            delay: Задержка записи в секундах (0 - запись сразу при изменении)
+            compact: Записывать JSON без отступов (меньше и быстрее)
+            on_saved: Вызывается с записанным содержимым после успешной записи
+        """
+        self.path = Path(path)
+        self.delay = delay
+        self.compact = compact
+        self.on_saved = on_saved
+        self.writes = 0
+        self._pending: Optional[Sequence] = None
+        self._writing = False
+        self._timer: Optional[threading.Timer] = None
+        self._state_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        _writers.add(self)
+
+    @property
+    def dirty(self) -> bool:
+        """Есть ли изменения, еще не записанные на диск"""
+        return self._pending is not None or self._writing
+
+    def schedule(self, faq_data: Sequence):
+        """
+        Пометка базы как измененной
+
+        Args:
+            faq_data: Неизменяемый снимок FAQ записей для сохранения
+        """
+        with self._state_lock:
+            self._pending = faq_data
+            if self.delay > 0 and self._timer is None:
+                self._start_timer(self.delay)
+        if self.delay <= 0:
+            self.flush()
+
+    def _start_timer(self, delay: float):
+        """Запуск отложенной записи (вызывается под _state_lock)"""
+        # Поток-демон не задерживает выход: остаток записывается обработчиком atexit
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> bool:
+        """
+        Немедленная запись накопленных изменений
+
+        Returns:
+            True если изменений нет или они записаны успешно
+        """
+        with self._write_lock:
+            with self._state_lock:
+                faq_data, self._pending = self._pending, None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if faq_data is None:
+                    return True
+                self._writing = True
+
+            try:
+                indent = None if self.compact else 2
+                content = json.dumps(list(faq_data), ensure_ascii=False, indent=indent).encode("utf-8")
+                atomic_write(self.path, content)
+                self.writes += 1
+                if self.on_saved:
+                    self.on_saved(content)
+                logger.info(f"FAQ сохранен в {self.path} ({len(faq_data)} записей)")
+                return True
+            except Exception as e:
+                logger.error(f"Ошибка сохранения FAQ: {e}")
+                # Не теряем изменения: запись повторяется по таймеру, пока не удастся
+                with self._state_lock:
+                    if self._pending is None:
+                        self._pending = faq_data
+                    if self._timer is None:
+                        self._start_timer(self.delay if self.delay > 0 else RETRY_DELAY)
+                return False
+            finally:
+                self._writing = False
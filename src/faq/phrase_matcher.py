@@ -0,0 +1,126 @@
+"""
+Phrase matcher module for OptFM AI Bot
+Автомат Ахо-Корасик для поиска многословных ключевых фраз в запросе за один проход
+"""
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Sequence, Set, Tuple
+
+
+class PhraseMatcher:
+    """
+    Автомат Ахо-Корасик над последовательностями слов
+
+    Алфавит автомата - слова (основы), а не символы: фраза совпадает только
+    целыми словами, а число переходов при сканировании равно длине запроса.
+    Фразы, добавленные после построения (add), ищутся прямым сравнением до
+    следующей перестройки автомата.
+    """
+
+    def __init__(self):
+        """Инициализация пустого автомата"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Для каждого состояния - фразы, заканчивающиеся в нем: (длина в словах, значение)
+        self._outputs: List[List[Tuple[int, Hashable]]] = [[]]
+        # Значения всех фраз и фразы, добавленные после построения автомата
+        self._values: Set[Hashable] = set()
+        self._pending: List[Tuple[Tuple[str, ...], Hashable]] = []
+        self.size = 0
+
+    def build(self, phrases: Iterable[Tuple[Sequence[str], Hashable]]):
+        """
+        Построение автомата с нуля
+
+        Args:
+            phrases: Пары (слова фразы, значение, возвращаемое при совпадении)
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self._values = set()
+        self._pending = []
+        self.size = 0
+
+        # Бор фраз
+        for words, value in phrases:
+            if not words:
+                continue
+            state = 0
+            for word in words:
+                next_state = self._goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][word] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append((len(words), value))
+            self._values.add(value)
+            self.size += 1
+
+        # Суффиксные ссылки обходом в ширину; выходы наследуются по ним,
+        # чтобы вложенные фразы находились без дополнительных переходов
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(word, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                if self._outputs[self._fail[next_state]]:
+                    self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def add(self, words: Sequence[str], value: Hashable) -> bool:
+        """
+        Добавление фразы без перестройки автомата
+
+        Args:
+            words: Слова фразы
+            value: Значение, возвращаемое при совпадении (одно значение - одна фраза)
+
+        Returns:
+            True если фраза добавлена (False - пустая фраза или значение уже есть)
+        """
+        if not words or value in self._values:
+            return False
+        self._values.add(value)
+        self._pending.append((tuple(words), value))
+        self.size += 1
+        return True
+
+    @property
+    def pending(self) -> int:
+        """Количество фраз, добавленных после построения автомата"""
+        return len(self._pending)
+
+    def find(self, words: Sequence[str]) -> List[Tuple[int, int, Hashable]]:
+        """
+        Все вхождения фраз в последовательность слов
+
+        Args:
+            words: Слова запроса (в той же нормализации, что и фразы)
+
+        Returns:
+            Список (начало, конец, значение) в порядке окончания вхождений
+        """
+        matches = []
+        state = 0
+        for end, word in enumerate(words, 1):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            for length, value in self._outputs[state]:
+                matches.append((end - length, end, value))
+
+        if self._pending:
+            for phrase, value in self._pending:
+                length = len(phrase)
+                for start in range(len(words) - length + 1):
+                    if tuple(words[start:start + length]) == phrase:
+                        matches.append((start, start + length, value))
+            matches.sort(key=lambda match: match[1])
+        return matches
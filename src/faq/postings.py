@@ -0,0 +1,166 @@
+"""
+Postings module for OptFM AI Bot
+Компактные постинг-листы: отсортированные массивы array('I') и словарь терминов
+"""
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Тип элементов постинг-листов: беззнаковые 32-битные ID
+TYPECODE = "I"
+
+# Наибольший ID документа, который помещается в постинг-лист
+MAX_ID = 0xFFFFFFFF
+
+
+def new_postings(doc_ids: Iterable[int] = ()) -> array:
+    """
+    Постинг-лист из ID документов
+
+    Args:
+        doc_ids: ID документов (без повторов, в любом порядке)
+
+    Returns:
+        Отсортированный массив ID
+    """
+    return array(TYPECODE, sorted(doc_ids))
+
+
+def find_posting(postings: Sequence[int], doc_id: int) -> int:
+    """
+    Позиция документа в постинг-листе двоичным поиском
+
+    Returns:
+        Позиция или -1, если документа в списке нет
+    """
+    position = bisect_left(postings, doc_id)
+    if position < len(postings) and postings[position] == doc_id:
+        return position
+    return -1
+
+
+def insert_posting(postings: array, doc_id: int) -> Optional[int]:
+    """
+    Добавление документа в постинг-лист с сохранением порядка
+
+    Args:
+        postings: Отсортированный массив ID
+        doc_id: ID документа
+
+    Returns:
+        Позиция вставки или None, если документ уже в списке
+    """
+    position = bisect_left(postings, doc_id)
+    if position < len(postings) and postings[position] == doc_id:
+        return None
+    postings.insert(position, doc_id)
+    return position
+
+
+def remove_posting(postings: array, doc_id: int) -> Optional[int]:
+    """
+    Удаление документа из постинг-листа
+
+    Args:
+        postings: Отсортированный массив ID
+        doc_id: ID документа
+
+    Returns:
+        Позиция удаленного документа или None, если его не было в списке
+    """
+    position = find_posting(postings, doc_id)
+    if position == -1:
+        return None
+    del postings[position]
+    return position
+
+
+class TermIndex:
+    """
+    Инвертированный индекс терминов со словарем термин -> целочисленный ID
+
+    Постинг-листы - отсортированные массивы array('I') вместо множеств
+    Python-объектов int, термины документов хранятся массивами ID терминов.
+    ID терминов не меняются: опустевшие постинг-листы остаются пустыми
+    массивами, и массивы терминов документов не нужно перекодировать.
+    """
+
+    def __init__(self):
+        """Инициализация пустого индекса"""
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.postings: List[array] = []
+
+    def encode(self, terms: Iterable[str]) -> array:
+        """
+        ID терминов (новые термины добавляются в словарь)
+
+        Args:
+            terms: Термины документа
+
+        Returns:
+            Массив ID терминов в порядке терминов
+        """
+        ids = array(TYPECODE)
+        for term in terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_id = self.vocabulary[term] = len(self.terms)
+                self.terms.append(term)
+                self.postings.append(new_postings())
+            ids.append(term_id)
+        return ids
+
+    def decode(self, term_ids: Iterable[int]) -> List[str]:
+        """Термины по их ID"""
+        terms = self.terms
+        return [terms[term_id] for term_id in term_ids]
+
+    def add(self, doc_id: int, term_ids: Iterable[int]):
+        """
+        Добавление документа в постинг-листы его терминов
+
+        Args:
+            doc_id: ID документа
+            term_ids: ID терминов документа (encode)
+        """
+        for term_id in set(term_ids):
+            insert_posting(self.postings[term_id], doc_id)
+
+    def remove(self, doc_id: int, term_ids: Iterable[int]):
+        """
+        Удаление документа из постинг-листов его терминов
+
+        Args:
+            doc_id: ID документа
+            term_ids: ID терминов документа (те же, что при добавлении)
+        """
+        for term_id in set(term_ids):
+            remove_posting(self.postings[term_id], doc_id)
+
+    def get(self, term: str) -> Sequence[int]:
+        """
+        Постинг-лист термина
+
+        Args:
+            term: Нормализованный термин
+
+        Returns:
+            Отсортированные ID документов (пустой кортеж для неизвестного термина)
+        """
+        term_id = self.vocabulary.get(term)
+        return self.postings[term_id] if term_id is not None else ()
+
+    def items(self) -> Iterator[Tuple[str, array]]:
+        """Термины с непустыми постинг-листами"""
+        return ((term, postings) for term, postings in zip(self.terms, self.postings) if postings)
+
+    def __len__(self) -> int:
+        """Количество терминов с непустыми постинг-листами"""
+        return sum(1 for postings in self.postings if postings)
+
+    def __eq__(self, other) -> bool:
+        """Одинаковые непустые постинг-листы у одинаковых терминов (ID терминов могут отличаться)"""
+        if not isinstance(other, TermIndex):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
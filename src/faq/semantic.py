@@ -0,0 +1,265 @@
+"""
+Semantic search module for OptFM AI Bot
+Поиск FAQ по векторным представлениям с кэшем векторов на диске (требует numpy)
+"""
+import hashlib
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+from .ann import IVFIndex
+from .tokenizer import normalize_tokens, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def is_available() -> bool:
+    """Проверка наличия numpy для семантического поиска"""
+    return np is not None
+
+
+class HashingEmbedder:
+    """
+    Детерминированный эмбеддер без загрузки моделей
+
+    Основы слов и символьные триграммы хэшируются в вектор фиксированной
+    размерности. Любой другой эмбеддер должен иметь атрибут name (входит в ключ
+    кэша) и метод embed(texts) -> np.ndarray формы (len(texts), dim).
+    """
+
+    def __init__(self, dim: int = 512):
+        """
+        Инициализация эмбеддера
+
+        Args:
+            dim: Размерность векторов
+        """
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        """Признаки текста: основы слов (вес 1) и их триграммы (вес 0.5)"""
+        features = []
+        for word in normalize_tokens(tokenize(text)):
+            features.append((word, 1.0))
+            padded = f" {word} "
+            features.extend((padded[i:i + 3], 0.5) for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """
+        Векторизация текстов
+
+        Args:
+            texts: Список текстов
+
+        Returns:
+            Матрица L2-нормализованных векторов (float32)
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                # crc32 стабилен между запусками, в отличие от встроенного hash()
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dim] += sign * weight
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorCache:
+    """Кэш векторов в .npy файле (memory-map), ключ строки - хэш содержимого"""
+
+    def __init__(self, path: Path, embedder):
+        """
+        Инициализация кэша
+
+        Args:
+            path: Путь к .npy файлу; рядом хранится .json со списком хэшей строк
+            embedder: Эмбеддер для вычисления отсутствующих векторов
+        """
+        self.path = Path(path)
+        self.keys_path = self.path.with_suffix(".json")
+        self.embedder = embedder
+        self.hashes: List[str] = []
+
+    def content_hash(self, text: str) -> str:
+        """Хэш текста записи с учетом эмбеддера"""
+        return hashlib.sha256(f"{self.embedder.name}\n{text}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> Tuple[Dict[str, int], Optional["np.ndarray"]]:
+        """Загрузка сохраненных векторов (memory-map) и индекса хэшей"""
+        try:
+            if not self.path.exists() or not self.keys_path.exists():
+                return {}, None
+            with open(self.keys_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("embedder") != self.embedder.name:
+                return {}, None
+            vectors = np.load(self.path, mmap_mode="r")
+            return {key: row for row, key in enumerate(meta["hashes"])}, vectors
+        except Exception as e:
+            logger.error(f"Ошибка загрузки кэша векторов {self.path}: {e}")
+            return {}, None
+
+    def _save(self, hashes: List[str], vectors: "np.ndarray"):
+        """Сохранение векторов и хэшей через временные файлы"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_vectors = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_vectors, 'wb') as f:
+                np.save(f, vectors)
+            os.replace(tmp_vectors, self.path)
+
+            tmp_keys = self.keys_path.with_name(self.keys_path.name + ".tmp")
+            with open(tmp_keys, 'w', encoding='utf-8') as f:
+                json.dump({"embedder": self.embedder.name, "hashes": hashes}, f)
+            os.replace(tmp_keys, self.keys_path)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения кэша векторов {self.path}: {e}")
+
+    def get_vectors(self, texts: List[str]) -> "np.ndarray":
+        """
+        Векторы текстов: из кэша для неизмененных, эмбеддер - для новых
+
+        Args:
+            texts: Тексты записей
+
+        Returns:
+            Матрица векторов в порядке texts
+        """
+        hashes = [self.content_hash(text) for text in texts]
+        self.hashes = hashes
+        cached_rows, cached = self._load()
+
+        missing = [i for i, key in enumerate(hashes) if key not in cached_rows]
+        if not missing and cached is not None and len(cached_rows) == len(hashes) \
+                and all(cached_rows[key] == i for i, key in enumerate(hashes)):
+            logger.info(f"Векторы FAQ загружены из кэша: {self.path}")
+            return cached
+
+        new_vectors = self.embedder.embed([texts[i] for i in missing]) if missing else None
+        dim = new_vectors.shape[1] if new_vectors is not None else cached.shape[1]
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, key in enumerate(hashes):
+            if key in cached_rows:
+                vectors[i] = cached[cached_rows[key]]
+        for position, i in enumerate(missing):
+            vectors[i] = new_vectors[position]
+
+        self._save(hashes, vectors)
+        logger.info(f"Векторы FAQ: {len(missing)} вычислено, {len(texts) - len(missing)} из кэша")
+        return vectors
+
+
+class SemanticIndex:
+    """
+    Поиск ближайших векторов скалярным произведением
+
+    Для больших корпусов (от ann_min_size документов) используется
+    приближенный поиск по IVF-индексу, который сохраняется рядом с кэшем векторов.
+    """
+
+    def __init__(self, embedder=None, cache_path: Optional[str] = None,
+                 ann_min_size: int = 10000, ann_n_probe: int = 8):
+        """
+        Инициализация индекса
+
+        Args:
+            embedder: Эмбеддер (по умолчанию HashingEmbedder)
+            cache_path: Путь к .npy кэшу векторов (None - без кэша)
+            ann_min_size: Размер корпуса, начиная с которого используется IVF-индекс
+            ann_n_probe: Количество просматриваемых кластеров IVF (баланс полноты и скорости)
+        """
+        if not is_available():
+            raise ImportError("Для семантического поиска требуется numpy")
+
+        self.embedder = embedder or HashingEmbedder()
+        self.cache = VectorCache(Path(cache_path), self.embedder) if cache_path else None
+        self.ann_min_size = ann_min_size
+        self.ann_n_probe = ann_n_probe
+        self.ann_index: Optional[IVFIndex] = None
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def build(self, documents: List[Tuple[int, str]]):
+        """
+        Векторизация документов (с использованием кэша)
+
+        Args:
+            documents: Пары (ID документа, текст документа)
+        """
+        texts = [text for _, text in documents]
+        self.doc_ids = np.asarray([doc_id for doc_id, _ in documents], dtype=np.int64)
+        if not texts:
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+        elif self.cache is not None:
+            self.vectors = self.cache.get_vectors(texts)
+        else:
+            self.vectors = self.embedder.embed(texts)
+
+        self.ann_index = self._build_ann() if len(texts) >= self.ann_min_size else None
+
+    def _build_ann(self) -> IVFIndex:
+        """Загрузка сохраненного IVF-индекса или построение нового"""
+        if self.cache is None:
+            index = IVFIndex(n_probe=self.ann_n_probe)
+            index.build(self.doc_ids, self.vectors)
+            return index
+
+        # Индекс актуален, если не изменились ни записи, ни их порядок
+        key = hashlib.sha256(repr(list(zip(self.doc_ids.tolist(), self.cache.hashes))).encode("utf-8")).hexdigest()
+        ann_path = self.cache.path.with_suffix(".ivf.npz")
+        if ann_path.exists():
+            try:
+                index = IVFIndex.load(ann_path, n_probe=self.ann_n_probe)
+                if index.key == key:
+                    logger.info(f"IVF-индекс загружен из {ann_path}")
+                    return index
+            except Exception as e:
+                logger.error(f"Ошибка загрузки IVF-индекса {ann_path}: {e}")
+
+        index = IVFIndex(n_probe=self.ann_n_probe)
+        index.build(self.doc_ids, self.vectors, key=key)
+        try:
+            index.save(ann_path)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения IVF-индекса {ann_path}: {e}")
+        return index
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Поиск top-k документов по косинусному сходству
+
+        Args:
+            query: Текст запроса
+            k: Количество результатов
+
+        Returns:
+            Список пар (ID документа, скор), отсортированный по убыванию скора
+        """
+        if not len(self.doc_ids):
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        if self.ann_index is not None:
+            return self.ann_index.search(query_vector, k)
+
+        scores = np.asarray(self.vectors @ query_vector).ravel()
+
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in top if scores[i] > 0]
@@ -0,0 +1,181 @@
+"""
+Sharded FAQ search module for OptFM AI Bot
+Поиск по базе FAQ, разделенной на шарды в отдельных процессах (использует все ядра)
+"""
+import asyncio
+import heapq
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import compiled_index, confidence
+from .enhanced_faq_manager import EnhancedFAQManager
+from .persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Порядок этапов поиска при объединении результатов шардов
+_STAGE_PRIORITY = {"exact": 0, "keyword": 1, "fuzzy": 2}
+
+# Менеджер шарда в процессе-обработчике (создается инициализатором пула)
+_shard_manager: Optional[EnhancedFAQManager] = None
+
+
+def _load_shard(shard_file: str, manager_kwargs: Dict[str, Any]):
+    """Загрузка шарда в процессе-обработчике (из скомпилированного снимка, если он актуален)"""
+    global _shard_manager
+    _shard_manager = EnhancedFAQManager(shard_file, **manager_kwargs)
+
+
+def _shard_size() -> int:
+    """Количество записей шарда"""
+    return len(_shard_manager.faq_data)
+
+
+def _search_shard(query: str, k: int, category: Optional[str]) -> List[Dict]:
+    """Поиск top-k по шарду"""
+    return _shard_manager.search(query, k, category)
+
+
+def merge_hits(shard_hits: Iterable[List[Dict]], k: int) -> List[Dict]:
+    """
+    Объединение top-k результатов шардов
+
+    Результаты упорядочиваются как в EnhancedFAQManager.search: сначала по этапу
+    (точное совпадение, ключевые слова, сходство), затем по убыванию скора.
+
+    Args:
+        shard_hits: Результаты search каждого шарда
+        k: Максимальное количество результатов
+
+    Returns:
+        Общий top-k
+    """
+    hits = [hit for hits in shard_hits for hit in hits]
+    return heapq.nsmallest(k, hits, key=lambda hit: (_STAGE_PRIORITY[hit["stage"]], -hit["score"]))
+
+
+class ShardedFAQSearch:
+    """
+    Поиск по FAQ, разделенному на N шардов, каждый - в своем процессе
+
+    Записи распределяются по шардам по кругу; каждый шард сохраняется в
+    отдельный JSON файл со скомпилированным снимком индекса, поэтому при
+    повторном запуске процессы загружают готовый индекс и не разбирают JSON.
+    Запрос рассылается всем шардам, их top-k объединяются.
+
+    BM25 считается по статистике своего шарда, поэтому скоры ключевых слов
+    немного отличаются от поиска по всей базе в одном процессе.
+
+    Шарды окупаются при нескольких свободных ядрах, большой базе (десятки тысяч
+    записей) и параллельных запросах; на малой базе пересылка запроса между
+    процессами дороже самого поиска. Менеджер бота шарды не использует:
+    подключение - явный выбор после замера benchmark_faq_search.py --mode sharded.
+    """
+
+    def __init__(self, faq_file: str = "data/faq_enhanced.json", n_shards: Optional[int] = None,
+                 shard_dir: Optional[str] = None, **manager_kwargs):
+        """
+        Инициализация и запуск процессов шардов
+
+        Args:
+            faq_file: Путь к файлу с FAQ данными
+            n_shards: Количество шардов и процессов (по умолчанию - число ядер)
+            shard_dir: Каталог файлов шардов (по умолчанию рядом с файлом FAQ)
+            **manager_kwargs: Параметры EnhancedFAQManager каждого шарда
+        """
+        self.faq_file = Path(faq_file)
+        self.n_shards = n_shards or os.cpu_count() or 1
+        self.shard_dir = Path(shard_dir) if shard_dir else self.faq_file.with_suffix(".shards")
+        # Шарды только читают базу: пул потоков внутри процесса не нужен
+        self.manager_kwargs = dict(manager_kwargs, search_workers=0)
+        # Порог ответа - как у менеджеров шардов (подсказки ниже порога шарды отбрасывают сами)
+        self.answer_policy = confidence.AnswerPolicy(
+            manager_kwargs.get("answer_threshold", confidence.ANSWER_THRESHOLD),
+            manager_kwargs.get("suggest_threshold", confidence.SUGGEST_THRESHOLD),
+        )
+        self.total_faq = 0
+        self._executors: List[ProcessPoolExecutor] = []
+        self.start()
+
+    def _write_shards(self) -> List[Path]:
+        """
+        Разбиение файла FAQ на файлы шардов (только если файл FAQ изменился)
+
+        Returns:
+            Пути к JSON файлам шардов
+        """
+        shard_files = [self.shard_dir / f"shard-{i}.json" for i in range(self.n_shards)]
+        manifest_file = self.shard_dir / "manifest.json"
+        source = compiled_index.source_hash(self.faq_file, self.n_shards)
+        try:
+            manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            manifest = None
+        if source is not None and manifest == {"source": source} and all(path.exists() for path in shard_files):
+            return shard_files
+
+        with open(self.faq_file, 'r', encoding='utf-8') as f:
+            faq_data = json.load(f)
+        for i, path in enumerate(shard_files):
+            atomic_write(path, json.dumps(faq_data[i::self.n_shards], ensure_ascii=False).encode("utf-8"))
+
+        # Файлы шардов от запуска с большим числом шардов больше не нужны; у текущих
+        # шардов сохраняются все снимки, включая снимки других движков
+        for path in self.shard_dir.glob("shard-*"):
+            number = path.name.split(".", 1)[0][len("shard-"):]
+            if number.isdigit() and int(number) >= self.n_shards:
+                path.unlink()
+
+        atomic_write(manifest_file, json.dumps({"source": source}).encode("utf-8"))
+        logger.info(f"База FAQ {self.faq_file} разбита на {self.n_shards} шардов в {self.shard_dir}")
+        return shard_files
+
+    def start(self):
+        """Запуск процессов шардов (индексы строятся или загружаются параллельно)"""
+        self.close()
+        context = multiprocessing.get_context("spawn")
+        self._executors = [
+            ProcessPoolExecutor(1, mp_context=context, initializer=_load_shard,
+                                initargs=(str(path), self.manager_kwargs))
+            for path in self._write_shards()
+        ]
+        sizes = [executor.submit(_shard_size) for executor in self._executors]
+        self.total_faq = sum(future.result() for future in sizes)
+        logger.info(f"Запущено {self.n_shards} шардов поиска FAQ ({self.total_faq} записей)")
+
+    def search(self, query: str, k: int = 3, category: Optional[str] = None) -> List[Dict]:
+        """
+        Поиск по всем шардам
+
+        Args:
+            query: Поисковый запрос пользователя
+            k: Максимальное количество результатов
+            category: Искать только в этой категории
+
+        Returns:
+            Список результатов в формате EnhancedFAQManager.search
+        """
+        futures = [executor.submit(_search_shard, query, k, category) for executor in self._executors]
+        return merge_hits((future.result() for future in futures), k)
+
+    async def asearch(self, query: str, k: int = 3, category: Optional[str] = None) -> List[Dict]:
+        """Поиск по всем шардам без блокировки цикла событий"""
+        shard_hits = await asyncio.gather(*(
+            asyncio.wrap_future(executor.submit(_search_shard, query, k, category)) for executor in self._executors
+        ))
+        return merge_hits(shard_hits, k)
+
+    def is_answer(self, hit: Dict) -> bool:
+        """Достаточно ли результат надежен для ответа (как EnhancedFAQManager.is_answer)"""
+        return self.answer_policy.is_answer(hit)
+
+    def close(self):
+        """Остановка процессов шардов"""
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._executors = []
@@ -0,0 +1,41 @@
+"""
+FAQ snapshot module for OptFM AI Bot
+Неизменяемый снимок базы FAQ для чтения без копирования списка
+"""
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator
+
+
+class FAQSnapshot(Sequence):
+    """
+    Неизменяемая последовательность FAQ записей на момент создания
+
+    Менеджер создает снимок один раз после изменения базы и отдает его всем
+    читателям. Записи внутри снимка не изменяются: update_faq заменяет запись
+    новым словарем (copy-on-write), поэтому ранее выданный снимок остается согласованным.
+    """
+
+    __slots__ = ("_entries",)
+
+    def __init__(self, entries: Iterable[Dict] = ()):
+        """
+        Инициализация снимка
+
+        Args:
+            entries: FAQ записи в порядке базы
+        """
+        self._entries = tuple(entries)
+
+    def __getitem__(self, index):
+        """Запись по позиции или срез (срез возвращается кортежем)"""
+        return self._entries[index]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._entries)
+
+    def __repr__(self) -> str:
+        return f"FAQSnapshot({len(self._entries)} записей)"
+
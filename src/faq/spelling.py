@@ -0,0 +1,124 @@
+"""
+Spelling correction module for OptFM AI Bot
+Исправление опечаток в словах запроса по словарю удалений (алгоритм SymSpell)
+"""
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+def edit_distance(first: str, second: str, max_distance: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (с перестановкой соседних букв) с ранним выходом
+
+    Args:
+        first: Первое слово
+        second: Второе слово
+        max_distance: Порог: при превышении вычисление прекращается
+
+    Returns:
+        Расстояние или max_distance + 1, если оно больше порога
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+
+    previous_previous: List[int] = []
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+class SymSpell:
+    """
+    Словарь симметричных удалений для поиска ближайшего слова словаря
+
+    Для каждого слова словаря заранее сохраняются все варианты с удалением
+    до max_distance букв (из первых prefix_length букв). При поиске такие же
+    удаления строятся для слова запроса: кандидаты находятся обращениями к
+    словарю, без перебора словаря, и проверяются точным расстоянием.
+    """
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7):
+        """
+        Инициализация словаря
+
+        Args:
+            max_distance: Максимальное расстояние редактирования
+            prefix_length: Длина префикса, по которому строятся удаления
+                (меньше - компактнее словарь, больше - меньше кандидатов)
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # Слово словаря -> форма для показа пользователю
+        self.words: Dict[str, str] = {}
+        self.deletes: Dict[str, List[str]] = {}
+
+    def _deletes(self, word: str, distance: int) -> Set[str]:
+        """Все варианты префикса слова с удалением до distance букв (включая сам префикс)"""
+        word = word[:self.prefix_length]
+        result = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+            result |= frontier
+        return result
+
+    def add(self, word: str, display: Optional[str] = None):
+        """
+        Добавление слова в словарь
+
+        Args:
+            word: Слово (термин индекса)
+            display: Форма слова для отчета об исправлении (по умолчанию само слово)
+        """
+        if word in self.words:
+            return
+        self.words[word] = display or word
+        for delete in self._deletes(word, self.max_distance):
+            self.deletes.setdefault(delete, []).append(word)
+
+    def lookup(self, word: str, max_distance: Optional[int] = None,
+               weight: Optional[Callable[[str], int]] = None) -> Optional[Tuple[str, int]]:
+        """
+        Ближайшее слово словаря
+
+        Args:
+            word: Слово запроса
+            max_distance: Допустимое расстояние (не больше заданного при построении)
+            weight: Вес слова словаря (например, число документов с ним);
+                слова с нулевым весом пропускаются. При равном расстоянии
+                выбирается слово с большим весом
+
+        Returns:
+            Пара (слово словаря, расстояние) или None
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        if word in self.words and (weight is None or weight(word)):
+            return word, 0
+
+        best: Optional[Tuple[str, int]] = None
+        best_key = None
+        checked = set()
+        for delete in self._deletes(word, max_distance):
+            for candidate in self.deletes.get(delete, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                distance = edit_distance(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                candidate_weight = weight(candidate) if weight else 1
+                if not candidate_weight:
+                    continue
+                key = (distance, -candidate_weight, candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = (candidate, distance), key
+        return best
@@ -0,0 +1,193 @@
+"""
+Russian stemmer module for OptFM AI Bot
+Реализация алгоритма Snowball (Porter) для русского языка без внешних зависимостей
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+VOWELS = frozenset("аеиоуыэюя")
+
+# Окончания первой группы допустимы только после "а" или "я"
+PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")
+PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+
+ADJECTIVE = (
+    "ими", "ыми", "его", "ого", "ему", "ому",
+    "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+)
+
+PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")
+PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+
+REFLEXIVE = ("ся", "сь")
+
+VERB_1 = (
+    "ете", "йте", "ешь", "нно",
+    "ла", "на", "ли", "ем", "ло", "но", "ет", "ют", "ны", "ть",
+    "й", "л", "н",
+)
+VERB_2 = (
+    "ейте", "уйте",
+    "ила", "ыла", "ена", "ите", "или", "ыли", "ило", "ыло", "ено", "ует", "уют", "ены", "ить", "ыть", "ишь",
+    "ей", "уй", "ил", "ыл", "им", "ым", "ен", "ят", "ит", "ыт", "ую",
+    "ю",
+)
+
+NOUN = (
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях",
+    "ев", "ов", "ие", "ье", "еи", "ии", "ей", "ой", "ий", "ям", "ем", "ам", "ом", "ах", "ях", "ию", "ью", "ия", "ья",
+    "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я",
+)
+
+DERIVATIONAL = ("ость", "ост")
+
+SUPERLATIVE = ("ейше", "ейш")
+
+
+def _regions(word: str) -> Tuple[int, int]:
+    """
+    Вычисление начала областей RV и R2
+
+    Args:
+        word: Слово в нижнем регистре
+
+    Returns:
+        Пара (начало RV, начало R2)
+    """
+    length = len(word)
+    rv = length
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start: int) -> int:
+        for i in range(start + 1, length):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return length
+
+    r1 = next_region(0)
+    r2 = next_region(r1) if r1 < length else length
+    return rv, r2
+
+
+def _find_suffix(word: str, start: int, *groups: Tuple[str, ...]) -> Optional[Tuple[str, int]]:
+    """
+    Поиск самого длинного окончания внутри области слова
+
+    Args:
+        word: Слово
+        start: Начало области, в которой должно лежать окончание
+        groups: Группы окончаний
+
+    Returns:
+        Пара (окончание, номер группы) или None
+    """
+    best = None
+    for group_index, suffixes in enumerate(groups):
+        for suffix in suffixes:
+            if word.endswith(suffix) and len(word) - len(suffix) >= start:
+                if best is None or len(suffix) > len(best[0]):
+                    best = (suffix, group_index)
+    return best
+
+
+def _remove_grouped(word: str, start: int, group_1: Tuple[str, ...], group_2: Tuple[str, ...]) -> Optional[str]:
+    """
+    Удаление окончания, где первая группа допустима только после "а"/"я"
+
+    Returns:
+        Слово без окончания или None, если окончание не найдено
+    """
+    found = _find_suffix(word, start, group_1, group_2)
+    if found is None:
+        return None
+
+    suffix, group_index = found
+    stem = word[:-len(suffix)]
+    if group_index == 0 and not (len(stem) > start and stem[-1] in "ая"):
+        return None
+    return stem
+
+
+def _remove_adjectival(word: str, start: int) -> Optional[str]:
+    """Удаление прилагательного окончания (с возможным суффиксом причастия)"""
+    found = _find_suffix(word, start, ADJECTIVE)
+    if found is None:
+        return None
+
+    stem = word[:-len(found[0])]
+    participle_stem = _remove_grouped(stem, start, PARTICIPLE_1, PARTICIPLE_2)
+    return participle_stem if participle_stem is not None else stem
+
+
+def _remove_plain(word: str, start: int, suffixes: Tuple[str, ...]) -> Optional[str]:
+    """Удаление окончания из списка без дополнительных условий"""
+    found = _find_suffix(word, start, suffixes)
+    return word[:-len(found[0])] if found else None
+
+
+def stem_word(word: str) -> str:
+    """
+    Вычисление основы русского слова по алгоритму Snowball
+
+    Args:
+        word: Слово (регистр не важен)
+
+    Returns:
+        Основа слова; слова без русских гласных возвращаются без изменений
+    """
+    word = word.lower().replace("ё", "е")
+    rv, r2 = _regions(word)
+    if rv >= len(word):
+        return word
+
+    # Шаг 1: деепричастие, либо возвратная частица и прилагательное/глагол/существительное
+    stem = _remove_grouped(word, rv, PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2)
+    if stem is None:
+        stem = _remove_plain(word, rv, REFLEXIVE) or word
+        for remover in (
+            lambda w: _remove_adjectival(w, rv),
+            lambda w: _remove_grouped(w, rv, VERB_1, VERB_2),
+            lambda w: _remove_plain(w, rv, NOUN),
+        ):
+            result = remover(stem)
+            if result is not None:
+                stem = result
+                break
+
+    # Шаг 2: окончание "и"
+    if stem.endswith("и") and len(stem) - 1 >= rv:
+        stem = stem[:-1]
+
+    # Шаг 3: словообразовательный суффикс в области R2
+    derivational = _remove_plain(stem, r2, DERIVATIONAL)
+    if derivational is not None:
+        stem = derivational
+
+    # Шаг 4: превосходная степень, двойное "н", мягкий знак
+    superlative = _remove_plain(stem, rv, SUPERLATIVE)
+    if superlative is not None:
+        stem = superlative
+    if stem.endswith("нн") and len(stem) - 2 >= rv:
+        stem = stem[:-1]
+    elif superlative is None and stem.endswith("ь") and len(stem) - 1 >= rv:
+        stem = stem[:-1]
+
+    return stem
+
+
+@lru_cache(maxsize=50000)
+def stem(token: str) -> str:
+    """
+    Мемоизированное вычисление основы токена
+
+    Args:
+        token: Токен в нижнем регистре
+
+    Returns:
+        Основа токена
+    """
+    return stem_word(token)
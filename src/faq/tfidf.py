@@ -0,0 +1,118 @@
+"""
+TF-IDF matrix module for OptFM AI Bot
+Векторизованный поиск похожих вопросов (опционально: numpy, scipy)
+"""
+import logging
+import math
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:  # pragma: no cover - зависит от окружения
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+
+def is_available() -> bool:
+    """Проверка наличия numpy для векторизованного поиска"""
+    return np is not None
+
+
+class TfidfMatrix:
+    """Матрица TF-IDF документов с L2-нормализованными строками"""
+
+    def __init__(self):
+        """Инициализация пустой матрицы"""
+        if not is_available():
+            raise ImportError("Для TF-IDF поиска требуется numpy")
+
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0)
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.matrix = None
+
+    def build(self, documents: Iterable[Tuple[int, List[str]]]):
+        """
+        Построение матрицы с нуля
+
+        Args:
+            documents: Пары (ID документа, список терминов документа)
+        """
+        self.vocabulary = {}
+        doc_ids = []
+        rows, cols, counts = [], [], []
+
+        for row, (doc_id, terms) in enumerate(documents):
+            doc_ids.append(doc_id)
+            term_counts: Dict[int, int] = {}
+            for term in terms:
+                col = self.vocabulary.setdefault(term, len(self.vocabulary))
+                term_counts[col] = term_counts.get(col, 0) + 1
+            for col, count in term_counts.items():
+                rows.append(row)
+                cols.append(col)
+                counts.append(count)
+
+        n_docs, n_terms = len(doc_ids), len(self.vocabulary)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+
+        # Сглаженный IDF и сублинейный TF
+        df = np.bincount(cols, minlength=n_terms)
+        self.idf = np.log((1 + n_docs) / (1 + df)) + 1
+        weights = (1 + np.log(np.asarray(counts, dtype=np.float64))) * self.idf[cols]
+
+        # L2-нормализация строк: скалярное произведение сразу дает косинус
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_docs))
+        weights /= np.maximum(norms[rows], 1e-12)
+
+        if sparse is not None:
+            self.matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(n_docs, n_terms))
+        else:
+            self.matrix = np.zeros((n_docs, n_terms))
+            self.matrix[rows, cols] = weights
+
+        logger.info(f"TF-IDF матрица: {n_docs} документов x {n_terms} терминов "
+                    f"({'scipy.sparse' if sparse is not None else 'numpy'})")
+
+    def search(self, terms: Iterable[str], k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Поиск top-k документов по косинусному сходству
+
+        Args:
+            terms: Термины запроса
+            k: Количество результатов
+
+        Returns:
+            Список пар (ID документа, скор), отсортированный по убыванию скора
+        """
+        query_counts: Dict[int, int] = {}
+        for term in terms:
+            col = self.vocabulary.get(term)
+            if col is not None:
+                query_counts[col] = query_counts.get(col, 0) + 1
+        if not query_counts or not len(self.doc_ids):
+            return []
+
+        query = np.zeros(len(self.vocabulary))
+        for col, count in query_counts.items():
+            query[col] = (1 + math.log(count)) * self.idf[col]
+        query /= np.linalg.norm(query)
+
+        scores = np.asarray(self.matrix @ query).ravel()
+
+        # argpartition выбирает top-k за O(N) без полной сортировки
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in top if scores[i] > 0]
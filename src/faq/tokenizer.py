@@ -0,0 +1,88 @@
+"""
+Tokenizer module for OptFM AI Bot
+Разбиение текста на токены и морфологическая нормализация для поиска по FAQ
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+from .stemmer import stem
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Разбиение текста на слова в нижнем регистре
+
+    Не кэшируется: так разбираются вопросы и ключевые слова при построении
+    индекса, каждый текст один раз. Запросы пользователей - tokenize_query.
+
+    Args:
+        text: Исходный текст
+
+    Returns:
+        Список слов
+    """
+    return WORD_PATTERN.findall(text.lower())
+
+
+def normalize_query(text: str) -> str:
+    """
+    Нормализация запроса пользователя: нижний регистр без крайних пробелов
+
+    Args:
+        text: Сообщение или поисковый запрос
+
+    Returns:
+        Нормализованный запрос (ключ кэша поиска и вход tokenize_query)
+    """
+    return text.strip().lower()
+
+
+@lru_cache(maxsize=4096)
+def _split_query(text: str) -> Tuple[str, ...]:
+    """Слова нормализованного запроса (кэш только запросов: индексация его не вытесняет)"""
+    return tuple(WORD_PATTERN.findall(text))
+
+
+def tokenize_query(text: str) -> List[str]:
+    """
+    Слова запроса пользователя, уже нормализованного normalize_query
+
+    Разбор кэшируется: сообщение, разобранное классификатором намерений,
+    движок поиска FAQ повторно не разбирает.
+
+    Args:
+        text: Нормализованный запрос
+
+    Returns:
+        Список слов (новый список при каждом вызове)
+    """
+    return list(_split_query(text))
+
+
+def normalize_tokens(tokens: Iterable[str]) -> List[str]:
+    """
+    Приведение токенов к основам (результат для каждого токена кэшируется)
+
+    Args:
+        tokens: Токены в нижнем регистре
+
+    Returns:
+        Список основ
+    """
+    return [stem(token) for token in tokens]
+
+
+def normalize_phrase(phrase: str) -> str:
+    """
+    Нормализация ключевой фразы: основы слов через пробел
+
+    Args:
+        phrase: Ключевое слово или фраза
+
+    Returns:
+        Нормализованная фраза (например, "условия доставки" -> "услов доставк")
+    """
+    return " ".join(normalize_tokens(tokenize(phrase)))
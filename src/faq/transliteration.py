@@ -0,0 +1,107 @@
+"""
+Transliteration module for OptFM AI Bot
+Варианты слова запроса, набранного в другой раскладке клавиатуры или латиницей
+"""
+from functools import lru_cache
+from itertools import islice, product
+from typing import Optional, Tuple
+
+# Клавиши английской раскладки и буквы русской раскладки на тех же местах
+_LATIN_KEYS = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_CYRILLIC_KEYS = "йцукенгшщзхъфывапролджэячсмитьбюё"
+LATIN_TO_CYRILLIC_LAYOUT = str.maketrans(_LATIN_KEYS, _CYRILLIC_KEYS)
+CYRILLIC_TO_LATIN_LAYOUT = str.maketrans(_CYRILLIC_KEYS, _LATIN_KEYS)
+
+LATIN_LETTERS = frozenset("abcdefghijklmnopqrstuvwxyz")
+CYRILLIC_LETTERS = frozenset("абвгдеёжзийклмнопрстуфхцчшщъыьэюя")
+
+# Клавиши знаков препинания, на месте которых в русской раскладке буквы (х, ъ, ж, э, б, ю, ё)
+LAYOUT_PUNCTUATION = frozenset("[];',.`")
+
+# Транслитерация латиницы: сочетания букв (самые длинные проверяются первыми)
+# и варианты для неоднозначных букв, первый вариант - наиболее частый
+TRANSLIT_RULES = {
+    "shch": ("щ",), "sch": ("щ",),
+    "zh": ("ж",), "kh": ("х",), "ts": ("ц",), "tz": ("ц",), "ch": ("ч",), "sh": ("ш",),
+    "yu": ("ю",), "iu": ("ю", "ию"), "ju": ("ю",), "ya": ("я",), "ia": ("я", "ия"), "ja": ("я",),
+    "yo": ("ё", "йо"), "jo": ("ё",), "ye": ("е",), "je": ("е",), "ph": ("ф",), "ck": ("к",),
+    "a": ("а",), "b": ("б",), "c": ("ц", "к"), "d": ("д",), "e": ("е", "э"), "f": ("ф",),
+    "g": ("г",), "h": ("х",), "i": ("и", "й"), "j": ("й", "дж"), "k": ("к",), "l": ("л",),
+    "m": ("м",), "n": ("н",), "o": ("о",), "p": ("п",), "q": ("к",), "r": ("р",), "s": ("с",),
+    "t": ("т",), "u": ("у",), "v": ("в",), "w": ("в",), "x": ("кс",), "y": ("ы", "й"), "z": ("з",),
+}
+_MAX_RULE_LENGTH = max(len(rule) for rule in TRANSLIT_RULES)
+
+# Ограничение числа вариантов транслитерации одного слова
+MAX_TRANSLIT_VARIANTS = 16
+
+
+def transliterate(word: str) -> Tuple[str, ...]:
+    """
+    Варианты записи латинского слова кириллицей ("garantiya" -> "гарантия")
+
+    Args:
+        word: Слово латиницей в нижнем регистре
+
+    Returns:
+        Варианты, начиная с наиболее вероятного
+    """
+    choices = []
+    position = 0
+    while position < len(word):
+        for length in range(min(_MAX_RULE_LENGTH, len(word) - position), 0, -1):
+            letters = TRANSLIT_RULES.get(word[position:position + length])
+            if letters:
+                choices.append(letters)
+                position += length
+                break
+        else:
+            return ()
+    return tuple("".join(variant) for variant in islice(product(*choices), MAX_TRANSLIT_VARIANTS))
+
+
+def layout_word(fragment: str) -> Optional[str]:
+    """
+    Слово русской раскладки из фрагмента запроса с клавишами знаков препинания ("j,hfnyj" -> "обратно")
+
+    tokenize разбивает такой фрагмент на части по знакам препинания, поэтому
+    вариант строится по фрагменту запроса (без пробелов) до разбиения на слова.
+
+    Args:
+        fragment: Фрагмент запроса в нижнем регистре
+
+    Returns:
+        Слово кириллицей или None, если во фрагменте нет латинских букв и
+        клавиш знаков препинания одновременно или есть другие символы
+    """
+    characters = set(fragment)
+    if characters & LATIN_LETTERS and characters & LAYOUT_PUNCTUATION and \
+            characters <= LATIN_LETTERS | LAYOUT_PUNCTUATION:
+        return fragment.translate(LATIN_TO_CYRILLIC_LAYOUT)
+    return None
+
+
+@lru_cache(maxsize=65536)
+def token_variants(word: str) -> Tuple[str, ...]:
+    """
+    Варианты слова, набранного не в той раскладке или латиницей (результат кэшируется)
+
+    Латинское слово дает русскую раскладку ("ljcnfdrf" -> "доставка") и варианты
+    транслитерации ("dostavka" -> "доставка"), русское - английскую раскладку
+    ("щзеаь" -> "optfm"). Слова со смешанными или другими символами вариантов не имеют.
+
+    Args:
+        word: Слово в нижнем регистре
+
+    Returns:
+        Варианты слова по убыванию вероятности
+    """
+    letters = set(word)
+    if letters <= LATIN_LETTERS:
+        variants = (word.translate(LATIN_TO_CYRILLIC_LAYOUT),) + transliterate(word)
+    elif letters <= CYRILLIC_LETTERS:
+        variants = (word.translate(CYRILLIC_TO_LATIN_LAYOUT),)
+    else:
+        return ()
+    # Клавиши знаков препинания дают не буквы: такие варианты отбрасываются
+    return tuple(dict.fromkeys(variant for variant in variants if variant.isalpha() and variant != word))
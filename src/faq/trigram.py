@@ -0,0 +1,157 @@
+"""
+Trigram index module for OptFM AI Bot
+Индекс символьных n-грамм для нечеткого поиска, устойчивого к опечаткам
+"""
+from array import array
+from typing import Collection, Dict, FrozenSet, Iterable, List, Tuple
+
+from .postings import insert_posting, new_postings, remove_posting
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс символьных n-грамм с целочисленным кодированием
+
+    Постинг-листы n-грамм - отсортированные массивы array('I') с ID документов.
+    """
+
+    def __init__(self, n: int = 3):
+        """
+        Инициализация индекса
+
+        Args:
+            n: Длина n-граммы
+        """
+        self.n = n
+        self.vocabulary: Dict[str, int] = {}
+        self.postings: Dict[int, array] = {}
+
+    def ngrams(self, text: str) -> List[str]:
+        """
+        Символьные n-граммы текста с пробелами по краям слов
+
+        Args:
+            text: Текст в нижнем регистре
+
+        Returns:
+            Список n-грамм
+        """
+        padded = f" {' '.join(text.split())} "
+        return [padded[i:i + self.n] for i in range(len(padded) - self.n + 1)]
+
+    def encode(self, text: str, register: bool = False) -> FrozenSet[int]:
+        """
+        Кодирование текста в множество целочисленных ID n-грамм
+
+        Args:
+            text: Текст в нижнем регистре
+            register: Добавлять ли новые n-граммы в словарь (при индексации).
+                Для запросов неизвестные n-граммы получают отрицательные ID:
+                они не пересекаются с индексом, но учитываются в размере множества
+
+        Returns:
+            Множество ID n-грамм
+        """
+        ids = set()
+        unknown = 0
+        for gram in self.ngrams(text):
+            gram_id = self.vocabulary.get(gram)
+            if gram_id is None:
+                if register:
+                    gram_id = self.vocabulary[gram] = len(self.vocabulary)
+                else:
+                    unknown -= 1
+                    gram_id = unknown
+            ids.add(gram_id)
+        return frozenset(ids)
+
+    @staticmethod
+    def pack(grams: Iterable[int]) -> array:
+        """
+        Компактное хранение n-грамм документа
+
+        Args:
+            grams: ID n-грамм (без повторов)
+
+        Returns:
+            Отсортированный массив array('I')
+        """
+        return new_postings(grams)
+
+    def build(self, documents: Iterable[Tuple[int, Collection[int]]]):
+        """
+        Построение постинг-листов с нуля
+
+        Args:
+            documents: Пары (ID документа, множество ID n-грамм)
+        """
+        doc_lists: Dict[int, List[int]] = {}
+        for doc_id, grams in documents:
+            for gram_id in grams:
+                doc_lists.setdefault(gram_id, []).append(doc_id)
+        self.postings = {gram_id: new_postings(doc_ids) for gram_id, doc_ids in doc_lists.items()}
+
+    def add(self, doc_id: int, grams: Collection[int]):
+        """
+        Добавление документа в постинг-листы
+
+        Args:
+            doc_id: ID документа
+            grams: Множество ID n-грамм документа
+        """
+        for gram_id in grams:
+            postings = self.postings.get(gram_id)
+            if postings is None:
+                self.postings[gram_id] = new_postings((doc_id,))
+            else:
+                insert_posting(postings, doc_id)
+
+    def remove(self, doc_id: int, grams: Collection[int]):
+        """
+        Удаление документа из постинг-листов
+
+        Опустевшие постинг-листы остаются до вызова compact().
+
+        Args:
+            doc_id: ID документа
+            grams: Множество ID n-грамм документа
+        """
+        for gram_id in grams:
+            postings = self.postings.get(gram_id)
+            if postings:
+                remove_posting(postings, doc_id)
+
+    def compact(self):
+        """Удаление опустевших постинг-листов"""
+        self.postings = {gram_id: postings for gram_id, postings in self.postings.items() if postings}
+
+    def candidates(self, grams: FrozenSet[int]) -> Dict[int, int]:
+        """
+        Документы, имеющие хотя бы одну общую n-грамму с запросом
+
+        Args:
+            grams: Множество ID n-грамм запроса
+
+        Returns:
+            Словарь {ID документа: число общих n-грамм}
+        """
+        overlaps: Dict[int, int] = {}
+        for gram_id in grams:
+            for doc_id in self.postings.get(gram_id, ()):
+                overlaps[doc_id] = overlaps.get(doc_id, 0) + 1
+        return overlaps
+
+    @staticmethod
+    def dice(first: FrozenSet[int], second: Collection[int]) -> float:
+        """
+        Коэффициент Дайса для двух множеств n-грамм
+
+        Args:
+            first: Множество ID n-грамм (обычно запроса)
+            second: ID n-грамм без повторов: множество или массив pack
+
+        Returns:
+            Сходство от 0 до 1
+        """
+        total = len(first) + len(second)
+        return 2 * len(first.intersection(second)) / total if total else 0.0
@@ -0,0 +1,85 @@
+"""
+FAQ file watcher module for OptFM AI Bot
+Горячая перезагрузка базы FAQ при изменении файла без перезапуска бота
+"""
+import asyncio
+import logging
+import os
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FAQFileWatcher:
+    """
+    Фоновая задача asyncio, опрашивающая время изменения и размер файла FAQ
+
+    Новый индекс строится в пуле потоков (менеджер продолжает отвечать по
+    старому), а заменяется в цикле событий одной операцией.
+    """
+
+    def __init__(self, faq_manager, interval: float = 5.0):
+        """
+        Инициализация наблюдателя
+
+        Args:
+            faq_manager: Менеджер FAQ с методами prepare_reload и apply_reload
+            interval: Период опроса файла в секундах
+        """
+        self.faq_manager = faq_manager
+        self.interval = interval
+        self._signature = self._stat()
+        self._task: Optional[asyncio.Task] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        """Время изменения и размер файла FAQ (None, если файл недоступен)"""
+        try:
+            stat = os.stat(self.faq_manager.faq_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self) -> asyncio.Task:
+        """Запуск опроса в текущем цикле событий"""
+        if self._task is None or self._task.done():
+            self._signature = self._stat()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Отслеживание изменений {self.faq_manager.faq_file} каждые {self.interval} с")
+        return self._task
+
+    async def stop(self):
+        """Остановка опроса"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """Цикл опроса файла"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Ошибка горячей перезагрузки FAQ: {e}")
+
+    async def check(self) -> bool:
+        """
+        Проверка файла и перезагрузка при изменении
+
+        Returns:
+            True если индекс заменен
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+
+        loop = asyncio.get_running_loop()
+        state = await loop.run_in_executor(None, self.faq_manager.prepare_reload)
+        if state is None:
+            return False
+        return self.faq_manager.apply_reload(state)
@@ -0,0 +1,938 @@
+#!/usr/bin/env python3
+"""
+Тесты поискового движка FAQ (ранжирование, индексы, нормализация)
+"""
+import json
+import shutil
+import sys
+import os
+import time
+from array import array
+from pathlib import Path
+
+import pytest
+
+# Добавляем src в путь для импортов
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from faq.bm25 import BM25Index
+from faq.enhanced_faq_manager import EnhancedFAQManager
+from faq.stemmer import stem, stem_word
+from faq.tokenizer import normalize_phrase
+from faq.trigram import TrigramIndex
+
+FAQ_FILE = Path(__file__).parent / "data" / "faq_enhanced.json"
+
+
+def make_manager(tmp_path: Path, **kwargs) -> EnhancedFAQManager:
+    """Менеджер на временной копии базы FAQ (тесты не меняют data/)"""
+    faq_file = tmp_path / "faq.json"
+    shutil.copy(FAQ_FILE, faq_file)
+    return EnhancedFAQManager(str(faq_file), **kwargs)
+
+
+def test_bm25_prefers_rare_terms():
+    """Редкий термин весит больше частого, короткий документ выше длинного"""
+    index = BM25Index()
+    index.build([
+        (1, ["доставка", "оплата"]),
+        (2, ["доставка", "гарантия", "сервис", "ремонт"]),
+        (3, ["оплата", "счет"]),
+    ])
+
+    assert index.search(["гарантия"], k=3)[0][0] == 2
+    assert [doc_id for doc_id, _ in index.search(["доставка"], k=3)] == [1, 2]
+    assert index.search(["неизвестно"]) == []
+
+
+def test_bm25_top_k_limit():
+    """search возвращает не больше k результатов по убыванию скора"""
+    index = BM25Index()
+    index.build([(i, ["товар"] * (i % 3 + 1)) for i in range(1, 101)])
+
+    top = index.search(["товар"], k=5)
+    assert len(top) == 5
+    assert [score for _, score in top] == sorted((score for _, score in top), reverse=True)
+
+
+def test_search_faq_ranking(tmp_path):
+    """Ключевые слова ранжируются по BM25, а не по числу совпадений"""
+    manager = make_manager(tmp_path)
+
+    assert manager.search_faq("условия оплаты")["id"] == 7
+    assert manager.search_faq("что продаете")["id"] == 2
+    assert manager.search_faq("где склад")["id"] == 3
+
+
+def test_exact_match(tmp_path):
+    """Подстрока вопроса находится на первом этапе"""
+    manager = make_manager(tmp_path)
+
+    assert manager.search_faq("как отписаться от рассылки")["id"] == 18
+    assert manager.backend._find_exact_match("") == (None, False)
+
+
+
+def test_exact_match_after_edits(tmp_path):
+    """Правки учитываются точным совпадением без перестройки строки вопросов"""
+    manager = make_manager(tmp_path)
+    backend = manager.backend
+    builds = []
+    original_build = backend._build_exact_index
+    backend._build_exact_index = lambda: builds.append(1) or original_build()
+
+    manager.add_faq("Есть ли доставка в Вологду?", "Да", ["вологда"])
+    manager.update_faq(11, question="Есть ли акции?")
+    manager.delete_faq(18)
+
+    def check():
+        assert backend._find_exact_match("есть ли доставка в вологду?") == (manager.get_faq_by_id(24), True)
+        # Измененная запись сохраняет место в порядке базы
+        assert backend._find_exact_match("есть ли")[0]["id"] == 11
+        assert backend._find_exact_match("специальные предложения")[0] is None
+        assert backend._find_exact_match("как отписаться")[0] is None
+
+    check()
+    assert builds == []
+    # Уплотнение переносит правки в строку вопросов
+    backend._compact_index()
+    assert builds == [1] and backend._exact_overlay == {}
+    check()
+
+def test_stemmer_word_forms():
+    """Словоформы приводятся к общей основе"""
+    assert {stem_word(w) for w in ["доставка", "доставки", "доставкой", "доставку"]} == {"доставк"}
+    assert stem_word("противоестественном") == "противоестествен"
+    assert stem_word("важнейшие") == "важн"
+    assert stem_word("Ёлки") == "елк"
+    assert stem_word("optfm") == "optfm"
+
+
+def test_stem_is_memoized():
+    """Основа токена кэшируется"""
+    stem.cache_clear()
+    stem("гарантии")
+    stem("гарантии")
+    assert stem.cache_info().hits == 1
+
+
+def test_morphology_in_search(tmp_path):
+    """Падежные формы находятся через индекс, а не через нечеткий поиск"""
+    manager = make_manager(tmp_path)
+
+    assert normalize_phrase("Условия доставки") == "услов доставк"
+    assert manager.search("доставкой", k=1)[0]["faq"]["id"] == 8
+    assert manager.search_faq("связаться с менеджером")["id"] == 23
+
+
+def test_trigram_dice():
+    """Опечатка сохраняет большую часть триграмм"""
+    index = TrigramIndex()
+    known = index.encode("гарантия", register=True)
+
+    assert TrigramIndex.dice(known, index.encode("гаранития")) > 0.6
+    assert TrigramIndex.dice(known, index.encode("доставка")) < 0.2
+    assert TrigramIndex.dice(known, index.encode("гарантия")) == 1.0
+
+
+def test_fuzzy_search_typos(tmp_path):
+    """Запросы с опечатками находятся нечетким поиском по триграммам"""
+    manager = make_manager(tmp_path)
+
+    assert manager.search_faq("дотавка")["id"] == 8
+    assert manager.search_faq("гаранития")["id"] == 15
+    assert [faq["id"] for faq in manager.search_similar_questions("как с вами связаться", limit=2)] == [16, 5]
+
+
+def test_tfidf_backend(tmp_path):
+    """Векторизованный поиск похожих вопросов (только при наличии numpy)"""
+    pytest.importorskip("numpy")
+    manager = make_manager(tmp_path, similarity_backend="tfidf")
+
+    assert manager.backend.tfidf_matrix is not None
+    assert [faq["id"] for faq in manager.search_similar_questions("возврат брака", limit=1)] == [14]
+    assert manager.search_similar_questions("zzz") == []
+
+
+def test_semantic_backend_vector_cache(tmp_path):
+    """Векторы неизмененных записей берутся из кэша после перезапуска"""
+    pytest.importorskip("numpy")
+    manager = make_manager(tmp_path, similarity_backend="semantic")
+
+    assert (tmp_path / "faq.vectors.npy").exists()
+    assert manager.search_similar_questions("связаться с менеджером", limit=1)[0]["id"] == 23
+
+    embedded = []
+    embedder = manager.backend.semantic_index.embedder
+    original_embed = embedder.embed
+    embedder.embed = lambda texts: embedded.extend(texts) or original_embed(texts)
+    restarted = EnhancedFAQManager(str(tmp_path / "faq.json"), similarity_backend="semantic", embedder=embedder)
+    assert embedded == []
+
+    # Векторы перестраиваются лениво, при следующем поиске похожих вопросов
+    restarted.update_faq(3, question="Где ваш склад?")
+    assert embedded == []
+    restarted.search_similar_questions("склад")
+    assert embedded[:-1] == ["Где ваш склад? " + " ".join(restarted.get_faq_by_id(3)["keywords"])]
+
+
+def test_ivf_index_recall_and_persistence(tmp_path):
+    """IVF-индекс при полном просмотре совпадает с точным поиском и переживает сохранение"""
+    np = pytest.importorskip("numpy")
+    from faq.ann import IVFIndex
+
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    doc_ids = np.arange(1, 501)
+    index = IVFIndex(n_lists=10, n_probe=2)
+    index.build(doc_ids, vectors, key="test")
+
+    query = vectors[42]
+    exact = [int(doc_ids[i]) for i in np.argsort(-(vectors @ query))[:5]]
+    assert [doc_id for doc_id, _ in index.search(query, 5, n_probe=10)] == exact
+    assert index.search(query, 1)[0][0] == 43
+
+    index.save(tmp_path / "index.npz")
+    loaded = IVFIndex.load(tmp_path / "index.npz", n_probe=10)
+    assert loaded.key == "test"
+    assert [doc_id for doc_id, _ in loaded.search(query, 5)] == exact
+
+
+def test_query_cache(tmp_path):
+    """Повторный запрос берется из кэша, изменение FAQ инвалидирует кэш"""
+    manager = make_manager(tmp_path)
+
+    first = manager.search_faq("Доставка в Вологду")
+    assert manager.search_faq("  доставка в вологду ") is first
+    stats = manager.get_statistics()
+    assert (stats["cache_hits"], stats["cache_misses"]) == (1, 1)
+
+    # Словоформы с разными результатами точного совпадения кэшируются раздельно
+    assert manager.search_faq("доставка")["id"] == 9
+    assert manager.search_faq("доставкой")["id"] == 8
+
+    manager.add_faq("Сколько стоит доставка в Вологду?", "От 300 рублей", ["вологда"])
+    assert manager.search_faq("доставка в вологду")["id"] == 24
+    assert manager.get_statistics()["cache_misses"] == 4
+
+
+def test_query_cache_keeps_punctuation(tmp_path):
+    """Запросы, различающиеся только пунктуацией, не получают результат друг друга из кэша"""
+    expected = {query: make_manager(tmp_path, cache_size=0).search_faq(query)["id"]
+                for query in ("доставка", "доставка!")}
+    assert expected == {"доставка": 9, "доставка!": 8}
+
+    manager = make_manager(tmp_path)
+    for query in ("доставка!", "доставка", "доставка!", "доставка"):
+        assert manager.search_faq(query)["id"] == expected[query]
+    stats = manager.get_statistics()
+    assert (stats["cache_hits"], stats["cache_misses"]) == (2, 2)
+
+
+def test_query_cache_returns_copies(tmp_path):
+    """Изменение результата вызывающим не портит ответ из кэша"""
+    manager = make_manager(tmp_path)
+    hits = manager.search("доставка", k=2)
+    expected = [(hit["faq"]["id"], hit["confidence"], list(hit["matched_terms"])) for hit in hits]
+    hits[0]["confidence"] = 0.0
+    hits[0]["matched_terms"].append("лишнее")
+    hits.pop()
+
+    cached = manager.search("доставка", k=2)
+    assert manager.get_statistics()["cache_hits"] == 1
+    assert [(hit["faq"]["id"], hit["confidence"], hit["matched_terms"]) for hit in cached] == expected
+
+
+def test_query_cache_ttl_and_lru():
+    """Записи кэша вытесняются по размеру и устаревают по TTL"""
+    from faq.cache import QueryCache
+
+    cache = QueryCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", None)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+
+    expired = QueryCache(ttl=-1)
+    expired.put("a", 1)
+    assert expired.get("a") == (False, None)
+
+
+def test_incremental_index_matches_full_rebuild(tmp_path):
+    """Инкрементальные изменения дают тот же индекс, что и полная перестройка"""
+    manager = make_manager(tmp_path)
+    manager.add_faq("Есть ли доставка в Вологду?", "Да, из филиала", ["вологда", "филиал"])
+    manager.update_faq(8, question="Какие условия отправки?", keywords=["отправка", "курьер"])
+    manager.delete_faq(3)
+    manager.flush()
+
+    rebuilt = EnhancedFAQManager(str(tmp_path / "faq.json"))
+    manager.backend._compact_index()
+
+    assert manager.backend.search_index == rebuilt.backend.search_index
+    assert manager.backend.ranker.postings == rebuilt.backend.ranker.postings
+    assert manager.backend.ranker.doc_lengths == rebuilt.backend.ranker.doc_lengths
+    for query in ["вологда", "курьер", "доставка", "склад", "филиал"]:
+        assert manager.backend.ranker.search(normalize_phrase(query).split(), k=3) == \
+            rebuilt.backend.ranker.search(normalize_phrase(query).split(), k=3)
+    assert manager.search_faq("где склад") == rebuilt.search_faq("где склад")
+    assert manager.search_faq("дотавка") == rebuilt.search_faq("дотавка")
+
+
+def test_bm25_remove_document():
+    """Удаление документа убирает его из постинг-листов, compact - пустые списки"""
+    index = BM25Index()
+    index.build([(1, ["доставка"]), (2, ["доставка", "оплата"])])
+    index.remove_document(2, ["доставка", "оплата"])
+
+    assert index.search(["оплата"]) == []
+    assert index.postings["оплата"] == (array("I"), array("I"))
+    index.compact()
+    assert "оплата" not in index.postings
+    index.add_document(3, ["оплата"])
+    assert index.search(["оплата"])[0][0] == 3
+
+
+def test_id_map_and_snapshot(tmp_path):
+    """Поиск по ID без перебора и неизменяемый снимок базы"""
+    manager = make_manager(tmp_path)
+    snapshot = manager.get_all_faq()
+    assert manager.get_all_faq() is snapshot
+    assert len(snapshot) == len(manager.faq_data)
+    assert [faq["id"] for faq in snapshot[:3]] == [1, 2, 3]
+    old_question = manager.get_faq_by_id(8)["question"]
+
+    manager.update_faq(8, question="Какие условия отправки?")
+    manager.delete_faq(3)
+    manager.add_faq("Есть ли доставка в Вологду?", "Да", ["вологда"])
+
+    # Выданный ранее снимок не меняется
+    assert snapshot[7]["question"] == old_question
+    assert [faq["id"] for faq in snapshot[:3]] == [1, 2, 3]
+    with pytest.raises(TypeError):
+        snapshot[0] = {}
+
+    current = manager.get_all_faq()
+    assert current is not snapshot
+    assert manager.get_faq_by_id(3) is None
+    assert manager.get_faq_by_id(8)["question"] == "Какие условия отправки?"
+    for position, faq in enumerate(manager.faq_data):
+        assert manager.get_faq_by_id(faq["id"]) is faq
+        assert manager._faq_positions[faq["id"]] == position
+
+
+def test_search_top_k_hits(tmp_path):
+    """Один проход дает основной ответ, альтернативы, скоры и объяснение"""
+    manager = make_manager(tmp_path)
+
+    hits = manager.search("доставкой", k=3)
+    assert [hit["stage"] for hit in hits] == ["keyword", "keyword", "fuzzy"]
+    assert hits[0]["faq"] == manager.search_faq("доставкой")
+    assert hits[0]["matched_terms"] == ["доставкой"]
+    assert hits[0]["score"] >= hits[1]["score"]
+    assert len({hit["faq"]["id"] for hit in hits}) == 3
+
+    # Без порога подсказки видны и слабые альтернативы
+    exact = make_manager(tmp_path, suggest_threshold=0.0).search("как отписаться от рассылки", k=2)
+    assert exact[0]["stage"] == "exact" and exact[0]["faq"]["id"] == 18
+    assert exact[1]["faq"]["id"] != 18
+
+    fuzzy = make_manager(tmp_path, spell_distance=0).search("гаранития", k=2)
+    assert fuzzy[0]["stage"] == "fuzzy"
+    assert "гарантия" in fuzzy[0]["matched_terms"]
+    assert manager.is_answer(fuzzy[0])
+    assert manager.search("", k=3) == []
+
+
+def test_phrase_matcher():
+    """Автомат находит все вхождения фраз, включая вложенные и перекрывающиеся"""
+    from faq.phrase_matcher import PhraseMatcher
+
+    matcher = PhraseMatcher()
+    matcher.build([(["a", "b"], "ab"), (["b", "c"], "bc"), (["a", "b", "c", "d"], "abcd"), (["c"], "c")])
+    assert matcher.size == 4
+    assert matcher.find(["x", "a", "b", "c", "d"]) == [(1, 3, "ab"), (2, 4, "bc"), (3, 4, "c"), (1, 5, "abcd")]
+    assert matcher.find(["a", "x", "b"]) == []
+
+    # Фразы, добавленные после построения, находятся до перестройки автомата
+    assert matcher.add(["x", "a"], "xa") and not matcher.add(["a", "b"], "ab")
+    assert matcher.size == 5 and matcher.pending == 1
+    assert matcher.find(["x", "a", "b"]) == [(0, 2, "xa"), (1, 3, "ab")]
+
+
+def test_phrase_keywords_in_search(tmp_path):
+    """Многословные ключевые слова совпадают с запросом как фразы"""
+    manager = make_manager(tmp_path)
+
+    assert manager.search_faq("fashion mobile")["id"] == 1
+    assert manager.search_faq("оптовые цены")["id"] == 4
+    assert manager.get_phrase_matches("Fashion Mobile")["fashion mobile"] == [1]
+    assert "оптовые цены" in manager.search("оптовые цены", k=1)[0]["matched_terms"]
+
+    # Фразы новых записей доступны сразу после добавления, без перестройки автомата
+    matcher = manager.backend.phrase_matcher
+    manager.add_faq("Есть ли доставка в Вологду?", "Да", ["доставка в вологду"])
+    assert manager.get_phrase_matches("нужна доставка в вологду")["доставка в вологду"] == [24]
+    assert manager.backend.phrase_matcher is matcher and matcher.pending == 1
+    # Фразы удаленных записей не находятся
+    manager.delete_faq(24)
+    assert manager.get_phrase_matches("нужна доставка в вологду") == {}
+    manager.backend._compact_index()
+    assert manager.backend.phrase_matcher.pending == 0
+
+
+def test_compiled_index_startup(tmp_path, monkeypatch):
+    """Повторный запуск загружает скомпилированный индекс, изменение JSON его инвалидирует"""
+    manager = make_manager(tmp_path)
+    assert (tmp_path / "faq.index.pkl").exists()
+
+    # Перестройка индекса при запуске со снимком не нужна
+    with monkeypatch.context() as patch:
+        patch.setattr(EnhancedFAQManager, "_build_search_index", None)
+        loaded = EnhancedFAQManager(str(tmp_path / "faq.json"))
+    assert loaded.backend.search_index == manager.backend.search_index
+    assert loaded.search_faq("fashion mobile")["id"] == 1
+    assert loaded.search_faq("дотавка")["id"] == 8
+    assert loaded.get_faq_by_id(8) is loaded.faq_data[7]
+
+    manager.add_faq("Есть ли доставка в Вологду?", "Да", ["вологда"])
+    manager.flush()
+    restarted = EnhancedFAQManager(str(tmp_path / "faq.json"))
+    assert restarted.search_faq("вологда")["id"] == 24
+
+
+def test_hot_reload(tmp_path):
+    """Измененный файл FAQ подхватывается без перезапуска, ошибки не ломают рабочую базу"""
+    import asyncio
+    import json
+    from faq.watcher import FAQFileWatcher
+
+    manager = make_manager(tmp_path)
+    faq_file = tmp_path / "faq.json"
+    old_snapshot = manager.get_all_faq()
+    assert not manager.reload()  # файл не менялся
+
+    # Несохраненные и собственные записанные изменения не вызывают перезагрузку
+    manager.add_faq("Есть ли доставка в Вологду?", "Да", ["вологда"])
+    assert not manager.reload()
+    manager.flush()
+    assert not manager.reload()
+
+    data = json.loads(faq_file.read_text(encoding="utf-8"))
+    data.append({"id": 100, "question": "Работаете ли вы в выходные?", "answer": "Нет", "keywords": ["выходные"]})
+    faq_file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    async def watch():
+        watcher = FAQFileWatcher(manager, interval=0.01)
+        watcher._signature = None
+        return await watcher.check()
+
+    assert asyncio.run(watch())
+    assert manager.search_faq("выходные")["id"] == 100
+    assert manager.last_reload["total_faq"] == len(data)
+    assert len(old_snapshot) == len(data) - 2
+
+    # Поврежденный файл оставляет прежний индекс
+    faq_file.write_text("[{", encoding="utf-8")
+    assert not manager.reload()
+    assert manager.search_faq("выходные")["id"] == 100
+
+
+def test_write_behind_persistence(tmp_path):
+    """Серия изменений записывается одной атомарной записью"""
+    import json
+
+    manager = make_manager(tmp_path, save_delay=60, compact_json=True)
+    faq_file = tmp_path / "faq.json"
+    original = faq_file.read_bytes()
+
+    for i in range(5):
+        manager.add_faq(f"Вопрос {i}?", "Ответ", ["тест"])
+    manager.delete_faq(1)
+    assert faq_file.read_bytes() == original
+    assert manager._writer.dirty
+
+    assert manager.flush()
+    assert manager._writer.writes == 1
+    assert not manager._writer.dirty
+    assert not (tmp_path / "faq.json.tmp").exists()
+    saved = json.loads(faq_file.read_text(encoding="utf-8"))
+    assert [faq["id"] for faq in saved] == [faq["id"] for faq in manager.get_all_faq()]
+    assert b"\n" not in faq_file.read_bytes()
+
+    # Фоновая запись по таймеру
+    writer = manager._writer
+    writer.delay = 0.01
+    manager.update_faq(2, answer="Новый ответ")
+    for _ in range(100):
+        if writer.writes == 2:
+            break
+        time.sleep(0.01)
+    assert writer.writes == 2
+    assert json.loads(faq_file.read_text(encoding="utf-8"))[0]["answer"] == "Новый ответ"
+
+
+def test_write_behind_retries_failed_write(tmp_path, monkeypatch):
+    """Неудачная запись повторяется по таймеру, флаг dirty не залипает"""
+    from faq import persistence
+
+    manager = make_manager(tmp_path, save_delay=60)
+    writer = manager._writer
+    real_write = persistence.atomic_write
+    failures = []
+
+    def failing_write(path, content):
+        if not failures:
+            failures.append(path)
+            raise OSError("диск недоступен")
+        real_write(path, content)
+
+    monkeypatch.setattr(persistence, "atomic_write", failing_write)
+    manager.add_faq("Работаете в праздники?", "Да", ["праздники"])
+    writer.delay = 0.01
+    assert not manager.flush()
+    assert writer.dirty
+    for _ in range(100):
+        if not writer.dirty:
+            break
+        time.sleep(0.01)
+    assert failures and writer.writes == 1 and not writer.dirty
+    saved = json.loads((tmp_path / "faq.json").read_text(encoding="utf-8"))
+    assert saved[-1]["question"] == "Работаете в праздники?"
+
+
+def test_bulk_import_export(tmp_path, monkeypatch):
+    """Импорт Markdown и JSON Lines одной перестройкой индекса, экспорт без потерь"""
+    import io
+    from faq.exchange import read_jsonl, read_markdown
+
+    manager = make_manager(tmp_path, save_delay=60)
+    builds = []
+    original_build = EnhancedFAQManager._build_search_index
+    monkeypatch.setattr(EnhancedFAQManager, "_build_search_index",
+                        lambda self: builds.append(1) or original_build(self))
+
+    with open(FAQ_FILE.parent / "faq_combined.md", encoding="utf-8") as f:
+        stats = manager.import_faq(read_markdown(f))
+    assert stats == {"added": 0, "updated": 22, "total": 23}
+    assert builds == [1]
+    assert manager.get_faq_by_id(22)["keywords"] == ["скидки", "опт", "оптовые", "специальные условия"]
+    assert manager.get_faq_by_id(1)["answer"].startswith("OptFM (Fashion Mobile)")
+
+    stats = manager.import_faq([
+        {"question": "Работаете ли вы в выходные?", "answer": "Нет", "keywords": ["выходные"]},
+        {"id": 50, "question": "Есть ли доставка в Вологду?", "answer": "Да"},
+    ])
+    assert stats == {"added": 2, "updated": 0, "total": 25}
+    assert manager.search_faq("выходные")["id"] == 51
+    assert manager.search_faq("доставка в вологду")["id"] == 50
+
+    # Ошибка в любой записи отклоняет весь импорт
+    with pytest.raises(ValueError):
+        manager.import_faq([{"question": "Вопрос?", "answer": "Ответ"}, {"id": 1, "question": ""}])
+    with pytest.raises(ValueError):
+        manager.import_faq([{"id": 7, "question": "a", "answer": "b"}, {"id": 7, "question": "c", "answer": "d"}])
+    with pytest.raises(ValueError):
+        manager.import_faq([{"id": 2 ** 32, "question": "a", "answer": "b"}])
+    # Сбой построения индекса оставляет прежние данные и индекс
+    with monkeypatch.context() as patch:
+        patch.setattr(type(manager.backend), "build", lambda self, faq_data: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            manager.import_faq([{"question": "Вопрос?", "answer": "Ответ"}])
+    assert len(manager.get_all_faq()) == 25
+    assert manager._max_id == 51 and manager.get_faq_by_id(52) is None
+    assert manager.search_faq("выходные")["id"] == 51
+
+    for file_format, reader in (("jsonl", read_jsonl), ("markdown", read_markdown)):
+        stream = io.StringIO()
+        assert manager.export_faq(stream, file_format) == 25
+        stream.seek(0)
+        assert list(reader(stream)) == list(manager.get_all_faq())
+
+    stream.seek(0)
+    copy = EnhancedFAQManager(str(tmp_path / "copy.json"), save_delay=60)
+    assert copy.import_faq(read_markdown(stream), replace=True)["total"] == 25
+    assert copy.search_faq("выходные")["id"] == 51
+    assert manager._writer.writes == 0
+
+    # ID вне постинг-листов при загрузке файла пропускается, а не ломает индекс
+    big_file = tmp_path / "big.json"
+    big_file.write_text(json.dumps([
+        {"id": 2 ** 32, "question": "Большой ID?", "answer": "Нет"},
+        {"id": 1, "question": "Работаете ли вы в выходные?", "answer": "Нет", "keywords": ["выходные"]},
+    ], ensure_ascii=False), encoding="utf-8")
+    big = EnhancedFAQManager(str(big_file), use_compiled_index=False)
+    assert big.backend.term_ids("выходн") == {1}
+    assert big.get_faq_by_id(2 ** 32) is None and big._max_id == 1
+
+
+def test_category_index(tmp_path):
+    """Категории ищутся по индексу и поддерживаются при изменениях"""
+    manager = make_manager(tmp_path, save_delay=60)
+
+    assert [faq["id"] for faq in manager.get_faq_by_category("доставка")] == [8, 9]
+    assert [faq["id"] for faq in manager.get_faq_by_category("Контакты и связь")] == [16, 23]
+    assert [faq["id"] for faq in manager.get_faq_by_category("гарантии")] == [14, 15]
+    # Без такой категории используется ключевое слово
+    assert 22 in [faq["id"] for faq in manager.get_faq_by_category("опт")]
+    assert manager.get_faq_by_category("космос") == []
+    assert manager.get_categories()["Ассортимент и наличие"] == 4
+
+    # Поиск внутри категории
+    assert manager.search("сколько стоит доставка", k=1)[0]["faq"]["category"] == "Доставка и самовывоз"
+    hits = manager.search("сколько стоит доставка", k=3, category="оплата")
+    assert [hit["faq"]["id"] for hit in hits] == [7]
+    assert manager.search("доставка", category="космос") == []
+
+    manager.add_faq("Есть ли доставка в Вологду?", "Да", ["вологда"], category="Доставка и самовывоз")
+    manager.update_faq(7, category="Прочие вопросы")
+    assert [faq["id"] for faq in manager.get_faq_by_category("доставка")] == [8, 9, 24]
+    assert "Оплата" not in manager.get_categories()
+    assert [faq["id"] for faq in manager.get_faq_by_category("оплата")] == [7]  # по ключевому слову
+    manager.delete_faq(24)
+    assert [faq["id"] for faq in manager.get_faq_by_category("самовывоз")] == [8, 9]
+    assert manager.search("вологда", category="доставка") == []
+
+    # Индекс категорий совпадает с полной перестройкой
+    incremental = dict(manager._category_members)
+    manager._build_search_index()
+    assert manager._category_members == incremental
+
+
+def test_async_search(tmp_path):
+    """asearch отвечает дешевые запросы сразу, а нечеткий поиск выполняет в пуле"""
+    import asyncio
+    import threading
+
+    manager = make_manager(tmp_path, search_timeout=0.5)
+    threads = []
+    backend_search = manager.backend.search
+
+    def tracked_search(query, k, doc_ids=None, fuzzy=True):
+        threads.append((threading.current_thread().name, fuzzy))
+        return backend_search(query, k, doc_ids, fuzzy)
+
+    manager.backend.search = tracked_search
+
+    # Ключевые слова дают k результатов: пул не нужен
+    hits = asyncio.run(manager.asearch("доставка", k=1))
+    assert hits == manager.search("доставка", 1) and threads == [("MainThread", False)]
+    assert manager._search_pool is None
+
+    # Нечеткий поиск - в пуле, с тем же результатом, что и синхронный;
+    # кэш проверяется один раз
+    manager.query_cache.clear()
+    misses = manager.query_cache.misses
+    hits = asyncio.run(manager.asearch("гарнтия"))
+    assert threads[-1][0].startswith("faq-search") and threads[-1][1]
+    assert manager.query_cache.misses == misses + 1
+    assert hits == manager.search("гарнтия")
+
+    # По таймауту возвращаются результаты дешевых этапов
+    manager.backend.search = lambda *args: (args[3] and time.sleep(1)) or backend_search(*args)
+    started = time.perf_counter()
+    hits = asyncio.run(manager.asearch("доставкой", k=3, timeout=0.1))
+    assert time.perf_counter() - started < 1
+    assert [hit["stage"] for hit in hits] == ["keyword", "keyword"]
+    manager.close()
+
+    # Движки без дешевых этапов не ищут в цикле событий: весь поиск - в пуле
+    manager = make_manager(tmp_path, backend="linear")
+    assert manager._search("доставка", 3, fuzzy=False) == ([], False)
+    threads.clear()
+    backend_search = manager.backend.search
+    manager.backend.search = tracked_search
+    hits = asyncio.run(manager.asearch("доставка"))
+    assert [name.startswith("faq-search") for name, fuzzy in threads if fuzzy] == [True]
+    assert hits and hits == manager.search("доставка")
+    manager.close()
+
+
+def test_sharded_search(tmp_path):
+    """Поиск по шардам в отдельных процессах совпадает с поиском по всей базе"""
+    from faq.sharded import ShardedFAQSearch, merge_hits
+
+    manager = make_manager(tmp_path)
+    queries = ["Что такое OptFM?", "доставкой", "гарнтия", "условия возврата товара", "космос"]
+
+    sharded = ShardedFAQSearch(manager.faq_file, n_shards=2)
+    try:
+        assert sharded.total_faq == len(manager.faq_data)
+        for query in queries:
+            assert [hit["faq"]["id"] for hit in sharded.search(query, k=1)] == \
+                [hit["faq"]["id"] for hit in manager.search(query, k=1)]
+    finally:
+        sharded.close()
+
+    # Повторный запуск берет файлы шардов и их снимки индекса с диска
+    shard_files = sorted(sharded.shard_dir.glob("shard-*"))
+    assert [path.name for path in shard_files] == \
+        ["shard-0.index.pkl", "shard-0.json", "shard-1.index.pkl", "shard-1.json"]
+    mtimes = [path.stat().st_mtime_ns for path in shard_files]
+    ShardedFAQSearch(manager.faq_file, n_shards=2).close()
+    assert [path.stat().st_mtime_ns for path in shard_files] == mtimes
+
+    # Перераспределение удаляет лишние шарды, но не снимки других движков
+    (sharded.shard_dir / "shard-0.tfidf.index.pkl").write_bytes(b"")
+    ShardedFAQSearch(manager.faq_file, n_shards=1).close()
+    assert sorted(path.name for path in sharded.shard_dir.glob("shard-*")) == \
+        ["shard-0.index.pkl", "shard-0.json", "shard-0.tfidf.index.pkl"]
+
+    hits = merge_hits([
+        [{"stage": "fuzzy", "score": 0.9, "faq": 1}],
+        [{"stage": "keyword", "score": 1.2, "faq": 2}, {"stage": "keyword", "score": 3.4, "faq": 3}],
+    ], k=2)
+    assert [hit["faq"] for hit in hits] == [3, 2]
+
+
+def test_spelling_correction(tmp_path):
+    """Опечатки исправляются по словарю удалений до поиска по ключевым словам"""
+    from faq.spelling import SymSpell, edit_distance
+
+    assert edit_distance("дотавк", "доставк", 2) == 1
+    assert edit_distance("гарнат", "гарант", 2) == 1  # перестановка соседних букв
+    assert edit_distance("скидк", "доставк", 2) == 3
+
+    speller = SymSpell(max_distance=2)
+    for word in ["доставк", "гарант", "возврат"]:
+        speller.add(word)
+    assert speller.lookup("дотавк") == ("доставк", 1)
+    assert speller.lookup("вазврт") == ("возврат", 2)
+    assert speller.lookup("вазврт", max_distance=1) is None
+
+    manager = make_manager(tmp_path)
+    # Словарь строится вместе с индексом (и при загрузке снимка), а не первым запросом
+    speller = manager.backend.speller
+    assert speller.words["доставк"] == "доставка"
+    assert make_manager(tmp_path).backend.speller.words["доставк"] == "доставка"
+    hits = manager.search("возрат товара", k=2)
+    assert manager.backend.speller is speller
+    assert hits[0]["stage"] == "keyword" and hits[0]["faq"]["id"] == 14
+    assert hits[0]["corrections"] == {"возрат": "возврат"}
+    assert hits[1]["corrections"] == {}
+    assert manager.search("гаранития", k=1)[0]["corrections"] == {"гаранития": "гарантия"}
+    # Короткие незнакомые слова не "исправляются" в случайные слова словаря
+    assert all(hit["stage"] == "fuzzy" for hit in manager.search("космос"))
+
+    # Слова новых записей попадают в словарь
+    manager.add_faq("Есть ли доставка в Вологду?", "Да", ["вологда"])
+    assert manager.search("валогда", k=1)[0]["faq"]["id"] == 24
+
+
+def test_layout_and_transliteration(tmp_path):
+    """Слова в другой раскладке и латиницей находятся через индекс до нечеткого поиска"""
+    from faq.transliteration import layout_word, token_variants, transliterate
+
+    assert token_variants("ljcnfdrf")[0] == "доставка"
+    assert layout_word("j,hfnyj") == "обратно"
+    assert layout_word("dostavka") is None
+    assert token_variants("щзеаь") == ("optfm",)
+    assert "менеджер" in transliterate("menedzher")
+    assert token_variants("доставка1") == ()
+    token_variants.cache_clear()
+    token_variants("dostavka")
+    token_variants("dostavka")
+    assert token_variants.cache_info().hits == 1
+
+    manager = make_manager(tmp_path)
+    for query, expected_id, correction in [
+        ("ljcnfdrf", 8, "доставка"), ("dostavka", 8, "доставка"),
+        ("garantia", 15, "гарантия"), ("щзеаь", 1, "optfm"),
+    ]:
+        hit = manager.search(query, k=1)[0]
+        assert (hit["faq"]["id"], hit["stage"]) == (expected_id, "keyword")
+        assert hit["corrections"] == {query: correction}
+
+    # Клавиши знаков препинания ("," - "б", "[" - "х") исправляются до разбиения на слова
+    hit = manager.search("j,hf,jnre", k=1)[0]
+    assert (hit["faq"]["id"], hit["corrections"]) == (19, {"j,hf,jnre": "обработку"})
+    assert manager.search("gthcjyfkmys[ lfyys[", k=1)[0]["faq"]["id"] == 19
+
+    assert make_manager(tmp_path, transliterate=False).search("dostavka", k=1) == []
+
+
+def test_search_backends(tmp_path, caplog):
+    """Движки поиска выбираются по имени и одинаково поддерживают изменения базы"""
+    from faq import backends
+    from faq.faq_manager import FAQManager
+
+    assert {"index", "linear", "tfidf", "semantic"} <= set(backends.BACKENDS)
+    with pytest.raises(ValueError):
+        make_manager(tmp_path, backend="unknown")
+
+    # Прежний менеджер - линейный движок без строки лога на каждую запись
+    legacy = FAQManager(str(tmp_path / "legacy.json"))
+    assert legacy.backend_name == "linear"
+    caplog.clear()
+    with caplog.at_level("INFO", logger="faq"):
+        assert legacy.search_faq("есть ли доставка")["id"] == 4
+        assert legacy.search_faq("юридические лица")["id"] == 6
+    assert len(caplog.records) == 4
+    assert legacy.search_faq("космос") is None
+
+    names = ["index", "linear"] + [name for name in ("tfidf", "semantic") if backends.BACKENDS[name].is_available()]
+    for name in names:
+        manager = make_manager(tmp_path, backend=name)
+        assert manager.index_file.name == ("faq.index.pkl" if name == "index" else f"faq.{name}.index.pkl")
+        assert manager.index_file.exists()
+        assert manager.search("возврат товара", k=1)[0]["faq"]["id"] == 14
+        assert manager.search("ремонт телефонов", k=1, category="Прочие вопросы")[0]["faq"]["id"] == 20
+
+        manager.add_faq("Можно ли заказать гравировку?", "Да", ["гравировка"])
+        manager.update_faq(14, question="Как вернуть бракованный товар?", keywords=["брак"])
+        manager.delete_faq(20)
+        assert manager.search("гравировка", k=1)[0]["faq"]["id"] == 24
+        assert all(hit["faq"]["id"] != 20 for hit in manager.search("ремонт телефонов", k=3))
+        assert manager.get_statistics()["search_backend"] == name
+
+        # Изменения сохраняются и находятся после перезапуска
+        manager.flush()
+        restarted = EnhancedFAQManager(str(tmp_path / "faq.json"), backend=name)
+        assert restarted.search("гравировка", k=1)[0]["faq"]["id"] == 24
+
+
+def test_relevance_benchmark():
+    """Размеченные запросы: качество основного движка не ниже зафиксированного уровня"""
+    import benchmark_faq_search as benchmark
+
+    report = benchmark.run_relevance([0, 100], ["index", "linear"], repeat=1, k=3)
+    assert report["queries"] == len(json.loads(Path(benchmark.QUERIES_FILE).read_text(encoding="utf-8")))
+    results = {(result["backend"], result["size"]): result for result in report["results"]}
+    assert set(results) == {("index", 23), ("linear", 23), ("index", 100), ("linear", 100)}
+    for result in results.values():
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p95"] <= result["latency_ms"]["p99"]
+        assert result["qps"] > 0 and result["memory_mb"] > 0
+
+    base = results[("index", 23)]
+    assert base["precision_at_1"] >= 0.85 and base["recall_at_3"] >= 0.9
+    assert base["precision_at_1"] > results[("linear", 23)]["precision_at_1"]
+
+
+def test_term_index_postings():
+    """Словарь терминов и постинг-листы array('I'): ID терминов стабильны, списки отсортированы"""
+    from faq.postings import TermIndex
+
+    index = TermIndex()
+    first, second = index.encode(["оплата", "доставка", "оплата"]), index.encode(["доставка", "склад"])
+    assert first == array("I", [0, 1, 0]) and index.decode(second) == ["доставка", "склад"]
+    index.add(7, first)
+    index.add(3, second)
+    assert index.get("доставка") == array("I", [3, 7]) and index.get("нет") == ()
+
+    index.remove(7, first)
+    assert index.get("оплата") == array("I") and len(index) == 2
+    assert dict(index.items()) == {"доставка": array("I", [3]), "склад": array("I", [3])}
+    assert index.encode(["оплата"]) == array("I", [0])
+
+
+def test_compact_index_structures(tmp_path):
+    """Термины и триграммы записей хранятся массивами, ключевые слова - общими кортежами"""
+    manager = make_manager(tmp_path)
+    backend = manager.backend
+    assert isinstance(backend._document_terms[8], array) and isinstance(backend._question_grams[8], array)
+    assert all(isinstance(postings, array) for postings in backend.trigram_index.postings.values())
+    assert isinstance(backend._keyword_grams[8], tuple)
+    assert backend._keyword_grams[8][0][0] == backend._keyword_grams[8][0][0].lower()
+
+    # Одинаковые ключевые слова разных записей - один объект
+    manager.add_faq("Доставка по области?", "Да", ["Доставка"])
+    assert backend._keyword_grams[24][0] is backend._keyword_gram_pairs["доставка"]
+    assert manager.search("доставка по области", k=1)[0]["faq"]["id"] == 24
+
+
+def test_answer_confidence(tmp_path):
+    """Калиброванная уверенность: одно частое слово - не ответ, пороги настраиваются"""
+    from faq.confidence import ANSWER, REJECT, SUGGEST, AnswerPolicy, calibrate
+    import tune_faq_thresholds
+
+    assert calibrate(0.15, 0.15) == 0.5 and calibrate(0.0, 0.3) == 0.0 and calibrate(1.0, 0.3) == 1.0
+    with pytest.raises(ValueError):
+        AnswerPolicy(answer_threshold=0.2, suggest_threshold=0.5)
+    policy = AnswerPolicy(0.6, 0.3)
+    assert [policy.decide({"confidence": value}) for value in (0.7, 0.4, 0.1)] == [ANSWER, SUGGEST, REJECT]
+
+    manager = make_manager(tmp_path, suggest_threshold=0.0)
+    exact = manager.search("как отписаться от рассылки", k=1)[0]
+    assert exact["confidence"] == 1.0
+    # Запрос целиком из слов базы уверенней, чем запрос с одним общим словом
+    full = manager.search("сроки доставки", k=1)[0]
+    partial = manager.search("есть ли доставка на марс", k=1)[0]
+    assert full["confidence"] > partial["confidence"]
+    assert all(0.0 <= hit["confidence"] <= 1.0 for hit in manager.search("гаранития", k=3))
+
+    # Вопрос вне тематики: слабые совпадения отбрасываются порогом подсказки
+    assert manager.search("какая завтра погода", k=3)
+    assert make_manager(tmp_path).search("какая завтра погода", k=3) == []
+    assert make_manager(tmp_path).search_faq("какая завтра погода") is None
+
+    # Запросы из одних служебных слов не дают ответа ни точным совпадением, ни по ключевым словам
+    default = make_manager(tmp_path)
+    for query in ("есть?", "у вас есть?", "есть у вас", "как?", "что?", "где?", "сколько?", "а", "есть ли у вас"):
+        assert all(hit["confidence"] < default.answer_policy.answer_threshold for hit in manager.search(query, k=3))
+        assert default.search_faq(query) is None
+    # Точное совпадение - только целыми словами, полная уверенность - у части вопроса со значимыми словами
+    assert manager.backend._find_exact_match("а") == (None, False)
+    assert manager.search("есть ли у вас", k=1)[0]["stage"] == "exact"
+    assert manager.search("доставка", k=1)[0]["confidence"] == 1.0
+
+    strict = make_manager(tmp_path, answer_threshold=1.0)
+    assert strict.search_faq("есть ли доставка на марс") is None
+    assert strict.search_faq("как отписаться от рассылки")["id"] == 18
+
+    # Перебор порогов: с ростом порога отвечается меньше вопросов
+    labeled = tune_faq_thresholds.load_labeled_queries(str(Path(__file__).parent / "data" / "faq_queries.json"))
+    rows = tune_faq_thresholds.sweep_thresholds(manager, labeled, k=3, step=0.25)
+    assert [row["threshold"] for row in rows] == [0.0, 0.25, 0.5, 0.75, 1.0]
+    assert all(first["answered"] >= second["answered"] for first, second in zip(rows, rows[1:]))
+    thresholds = tune_faq_thresholds.recommend(rows, target_precision=0.9, target_recall=0.9)
+    assert 0.0 <= thresholds["suggest_threshold"] <= thresholds["answer_threshold"] <= 1.0
+
+
+def test_intent_classifier(tmp_path):
+    """Намерение сообщения целыми словами за один проход; разбор общий с поиском"""
+    from faq import intents
+    from faq.tokenizer import _split_query
+
+    classifier = intents.IntentClassifier()
+    assert classifier.classify("Добрый   день!").intent == intents.GREETING
+    assert classifier.classify("Привет, спасибо").intent == intents.GREETING
+    assert classifier.classify("До свидания").intent == intents.FAREWELL
+    # Слова словарей не находятся внутри других слов
+    assert classifier.classify("какао").intent == intents.UNCLEAR
+    assert classifier.classify("thin").intent == intents.UNCLEAR
+    assert classifier.classify("Хочу купить чехлы оптом").intent == intents.FAQ
+
+    message = classifier.classify("  Как оформить ВОЗВРАТ  ")
+    assert (message.intent, message.is_question) == (intents.FAQ, True)
+    assert message.text == "как оформить возврат" and message.words == ["как", "оформить", "возврат"]
+    assert classifier.classify("доставка?").is_question
+
+    # Поиск по тексту сообщения не разбирает его на слова повторно, а построение
+    # индекса не вытесняет сообщения из кэша разбора
+    message = classifier.classify("Сколько стоит доставка до Мурманска?")
+    cache_info = _split_query.cache_info()
+    manager = make_manager(tmp_path, use_compiled_index=False)
+    assert _split_query.cache_info() == cache_info
+    assert manager.search(message.text, k=1)[0]["faq"]["id"] in (8, 9)
+    assert _split_query.cache_info().misses == cache_info.misses
+
+
+
+def test_compile_index_reuses_built_index(tmp_path):
+    """Компиляция снимка из только что построенного индекса не перестраивает его"""
+    manager = make_manager(tmp_path, use_compiled_index=False)
+    builds = []
+    original_build = manager._build_search_index
+    manager._build_search_index = lambda: builds.append(1) or original_build()
+    manager.use_compiled_index = True
+
+    assert manager.compile_index(rebuild=False).exists() and builds == []
+    manager.compile_index()
+    assert builds == [1]
+    assert EnhancedFAQManager(str(tmp_path / "faq.json")).search_faq("дотавка")["id"] == 8
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
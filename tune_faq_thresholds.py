@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Подбор порогов уверенности ответа и подсказки по размеченному журналу запросов
+
+Для каждого порога ответа считаются точность (доля верных среди ответов,
+включая ответы на вопросы вне тематики) и покрытие (доля вопросов с ответом
+в базе, получивших верный ответ); для порога подсказки - доля вопросов,
+у которых верная запись есть среди top-k подсказок, и число лишних подсказок.
+Рекомендуются порог ответа с наибольшим покрытием при заданной точности и
+наибольший порог подсказки, сохраняющий заданную полноту.
+
+Журнал - JSON список или JSON Lines (.jsonl) с записями {"query": ..., "expected": [ID]};
+пустой expected означает вопрос, на который в базе нет ответа.
+
+Запуск:
+    python tune_faq_thresholds.py
+    python tune_faq_thresholds.py --queries logs/labeled.jsonl --backend tfidf --output thresholds.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List
+
+# Добавляем src в путь для импортов
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from faq import backends
+from faq.enhanced_faq_manager import EnhancedFAQManager
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_labeled_queries(path: str) -> List[Dict]:
+    """
+    Загрузка размеченного журнала запросов
+
+    Args:
+        path: JSON файл со списком записей или JSON Lines (.jsonl)
+
+    Returns:
+        Записи {"query", "expected"}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def sweep_thresholds(manager: EnhancedFAQManager, labeled: List[Dict], k: int = 3,
+                     step: float = 0.05) -> List[Dict]:
+    """
+    Точность и покрытие при разных порогах уверенности
+
+    Args:
+        manager: Менеджер с suggest_threshold=0 (результаты не отбрасываются)
+        labeled: Размеченные запросы {"query", "expected"}
+        k: Количество подсказок
+        step: Шаг порога
+
+    Returns:
+        Строки {"threshold", "answered", "precision", "coverage", "wrong_answers",
+        "suggestion_recall", "suggestion_noise"} по возрастанию порога
+    """
+    positives = sum(1 for item in labeled if item["expected"])
+    # Для каждого запроса: уверенность первого результата, верен ли он,
+    # уверенности верных и лишних подсказок
+    outcomes = []
+    for item in labeled:
+        hits = manager.search(item["query"], k)
+        expected = set(item["expected"])
+        relevant = [hit["confidence"] for hit in hits if hit["faq"]["id"] in expected]
+        irrelevant = [hit["confidence"] for hit in hits if hit["faq"]["id"] not in expected]
+        top = hits[0] if hits else None
+        outcomes.append((top["confidence"] if top else -1.0, bool(top) and top["faq"]["id"] in expected,
+                         max(relevant, default=-1.0), irrelevant))
+
+    rows = []
+    for i in range(int(round(1 / step)) + 1):
+        threshold = round(i * step, 4)
+        answered = [correct for confidence, correct, _, _ in outcomes if confidence >= threshold]
+        correct = sum(answered)
+        rows.append({
+            "threshold": threshold,
+            "answered": round(len(answered) / max(len(outcomes), 1), 4),
+            "precision": round(correct / len(answered), 4) if answered else 1.0,
+            "coverage": round(correct / max(positives, 1), 4),
+            "wrong_answers": len(answered) - correct,
+            "suggestion_recall": round(
+                sum(1 for _, _, best, _ in outcomes if best >= threshold) / max(positives, 1), 4
+            ),
+            "suggestion_noise": round(
+                sum(sum(1 for confidence in noise if confidence >= threshold) for *_, noise in outcomes)
+                / max(len(outcomes), 1), 4
+            ),
+        })
+    return rows
+
+
+def recommend(rows: List[Dict], target_precision: float, target_recall: float) -> Dict[str, float]:
+    """
+    Рекомендуемые пороги
+
+    Args:
+        rows: Результат sweep_thresholds
+        target_precision: Минимальная точность ответов
+        target_recall: Минимальная доля вопросов с верной подсказкой
+
+    Returns:
+        {"answer_threshold", "suggest_threshold"} (при недостижимой точности - наибольший порог)
+    """
+    accepted = [row for row in rows if row["precision"] >= target_precision and row["coverage"] > 0]
+    answer = max(accepted, key=lambda row: (row["coverage"], -row["threshold"]))["threshold"] if accepted else 1.0
+    recalled = [row["threshold"] for row in rows if row["suggestion_recall"] >= target_recall and row["threshold"] <= answer]
+    return {"answer_threshold": answer, "suggest_threshold": max(recalled, default=0.0)}
+
+
+def main():
+    """Перебор порогов и вывод рекомендации"""
+    parser = argparse.ArgumentParser(description="Подбор порогов уверенности ответа FAQ")
+    parser.add_argument("--faq-file", default="data/faq_enhanced.json", help="JSON файл базы FAQ")
+    parser.add_argument("--queries", default="data/faq_queries.json", help="Размеченный журнал запросов")
+    parser.add_argument("--backend", default=backends.DEFAULT_BACKEND, choices=sorted(backends.BACKENDS),
+                        help="Движок поиска")
+    parser.add_argument("--k", type=int, default=3, help="Количество подсказок")
+    parser.add_argument("--step", type=float, default=0.05, help="Шаг порога")
+    parser.add_argument("--target-precision", type=float, default=0.9, help="Минимальная точность ответов")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="Минимальная полнота подсказок")
+    parser.add_argument("--output", help="JSON файл отчета")
+    args = parser.parse_args()
+
+    labeled = load_labeled_queries(args.queries)
+    manager = EnhancedFAQManager(args.faq_file, backend=args.backend, cache_size=0, use_compiled_index=False,
+                                 search_workers=0, answer_threshold=1.0, suggest_threshold=0.0)
+    rows = sweep_thresholds(manager, labeled, args.k, args.step)
+    thresholds = recommend(rows, args.target_precision, args.target_recall)
+
+    print(f"{'Порог':>6} {'Ответы':>7} {'Точность':>9} {'Покрытие':>9} {'Ошибки':>7} "
+          f"{'Подсказки: полнота':>19} {'лишние':>7}")
+    for row in rows:
+        print(f"{row['threshold']:>6.2f} {row['answered']:>7.2f} {row['precision']:>9.3f} {row['coverage']:>9.3f} "
+              f"{row['wrong_answers']:>7} {row['suggestion_recall']:>19.3f} {row['suggestion_noise']:>7.2f}")
+    print(f"\nДвижок {manager.backend_name}, запросов {len(labeled)}: "
+          f"FAQ_ANSWER_THRESHOLD={thresholds['answer_threshold']} FAQ_SUGGEST_THRESHOLD={thresholds['suggest_threshold']}")
+
+    if args.output:
+        report = {"backend": manager.backend_name, "queries": len(labeled), "k": args.k, "rows": rows, **thresholds}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчет сохранен в {args.output}")
+
+
+if __name__ == "__main__":
+    main()